@@ -1,8 +1,18 @@
 import os
+import sys
+import orjson
 from strands import Agent
+from strands.models import BedrockModel
 import boto3
+from botocore.config import Config
 import asyncio
 import re
+import time
+import uuid
+import functools
+import threading
+from datetime import datetime
+from pydantic import BaseModel, Field
 from bedrock_agentcore.runtime import BedrockAgentCoreApp, BedrockAgentCoreContext
 from bedrock_agentcore.services.identity import IdentityClient
 from bedrock_agentcore.identity.auth import requires_access_token
@@ -41,6 +51,14 @@ OAUTH_SCOPE = _parse_scopes(get_parameter_value("SCOPE"))
 TABLE_NAME = get_parameter_value("SC_POC_ACTION_TABLE")
 ACTION_SCHEMA_COLUMNS = get_parameter_value("SC_POC_ACTION_TABLE_SCHEMA")
 
+
+def _schema_columns(schema_description: str) -> list[str]:
+    """Split the schema description from SSM into one column spec per entry."""
+    if not schema_description:
+        return []
+    sep = "\n" if "\n" in schema_description.strip() else ","
+    return [c.strip() for c in schema_description.split(sep) if c.strip()]
+
 # ---------------------------------------------------
 # 1) Identity & Access Bootstrap
 # ---------------------------------------------------
@@ -87,179 +105,355 @@ def get_full_tools_list(client):
 
 
 # ---------------------------------------------------
-# 2) Agent Definition
+# 2) Bundle model and deterministic row -> bundle mapping
 # ---------------------------------------------------
-def create_agent():
-    """
-    ActionAgent:
-    Turns action_items_json into:
-      - tasks
-      - hub referral object
-      - sample requests
-      - crm update payload
-      - calendar event payload
-    """
-    access_token = asyncio.run(fetch_m2m_token(access_token=""))
-    mcp_client = MCPClient(lambda: create_streamable_http_transport(MCP_GATEWAY_URL, access_token))
-    mcp_client.__enter__()
-    return Agent(
-        system_prompt=f"""
-            You are the ActionAgent.
+class Task(BaseModel):
+    task_type: str
+    owner: str = ""
+    due_date: str = Field("", description="Due date as YYYY-MM-DD, empty if unknown")
+    priority: int = 0
+    status: str = "READY_FOR_CREATION"
+    metadata: dict = Field(default_factory=dict)
+
+
+class SampleRequest(BaseModel):
+    required: bool = False
+    qty: int = 0
+
+
+class HubReferral(BaseModel):
+    required: bool = False
+
+
+class CalendarEvent(BaseModel):
+    required: bool = False
+    minutes: int = 0
+
+
+class CrmUpdate(BaseModel):
+    ready: bool = False
+    payload: dict = Field(default_factory=dict)
+
+
+class ActionBundle(BaseModel):
+    """Task bundle built from a call's extracted action items."""
+    call_id: str = ""
+    hcp_id: str = ""
+    tasks: list[Task] = Field(default_factory=list)
+    sample_request: SampleRequest = Field(default_factory=SampleRequest)
+    hub_referral: HubReferral = Field(default_factory=HubReferral)
+    calendar_event: CalendarEvent = Field(default_factory=CalendarEvent)
+    crm_update: CrmUpdate = Field(default_factory=CrmUpdate)
+
+
+# Columns _build_action_bundle reads; the generated SQL always selects them
+ACTION_ROW_COLUMNS = (
+    "call_id", "hcp_id", "action_items_json",
+    "sample_request_qty", "hub_referral_flag", "calendar_block_minutes",
+)
+# Owner used when an action item names none, by normalized task type
+OWNER_DEFAULTS = {
+    "sample": "sales_rep",
+    "sample_request": "sales_rep",
+    "pa_support": "hub",
+    "hub_referral": "hub",
+    "mi_response": "medical_information",
+}
+DEFAULT_OWNER = "sales_rep"
+_DUE_DATE_FORMATS = ("%m/%d/%Y", "%d-%b-%Y", "%b %d, %Y")
+_TRUE_FLAGS = {"yes", "y", "true", "1"}
+
+
+def _to_int(value) -> int:
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return 0
+
+
+def _normalize_due_date(value) -> str:
+    """ISO date (YYYY-MM-DD) for the usual date spellings; "" if unparseable."""
+    text = str(value or "").strip()
+    if not text:
+        return ""
+    try:
+        return datetime.fromisoformat(text.replace("Z", "+00:00")).date().isoformat()
+    except ValueError:
+        pass
+    for fmt in _DUE_DATE_FORMATS:
+        try:
+            return datetime.strptime(text, fmt).date().isoformat()
+        except ValueError:
+            pass
+    return ""
+
+
+def _build_task(item: dict) -> Task:
+    item = dict(item)
+    raw_type = item.pop("action_type", None) or item.pop("type", None) or ""
+    task_type = re.sub(r"\W+", "_", str(raw_type)).strip("_").lower()
+    owner = str(item.pop("owner", "") or "").strip()
+    due_date = _normalize_due_date(item.pop("due_date", None))
+    priority = _to_int(item.pop("priority_score", item.pop("priority", 0)))
+    return Task(
+        task_type=task_type,
+        owner=owner or OWNER_DEFAULTS.get(task_type, DEFAULT_OWNER),
+        due_date=due_date,
+        priority=priority,
+        metadata=item,
+    )
+
+
+def _build_action_bundle(row: dict) -> dict:
+    """Map one action extraction row to the task bundle (no LLM involved)."""
+    items = row.get("action_items_json") or []
+    if isinstance(items, (str, bytes)):
+        try:
+            items = orjson.loads(items)
+        except orjson.JSONDecodeError:
+            items = []
+    if isinstance(items, dict):
+        items = [items]
+    tasks = [_build_task(item) for item in items if isinstance(item, dict)]
+
+    sample_qty = _to_int(row.get("sample_request_qty"))
+    minutes = _to_int(row.get("calendar_block_minutes"))
+    hub_flag = row.get("hub_referral_flag")
+    call_id = str(row.get("call_id") or "")
+    hcp_id = str(row.get("hcp_id") or "")
+    bundle = ActionBundle(
+        call_id=call_id,
+        hcp_id=hcp_id,
+        tasks=tasks,
+        sample_request=SampleRequest(required=sample_qty > 0, qty=sample_qty),
+        hub_referral=HubReferral(required=hub_flag is True or str(hub_flag).strip().lower() in _TRUE_FLAGS),
+        calendar_event=CalendarEvent(required=minutes > 0, minutes=minutes),
+        crm_update=CrmUpdate(
+            ready=bool(tasks),
+            payload={"call_id": call_id, "hcp_id": hcp_id, "task_types": [t.task_type for t in tasks]} if tasks else {},
+        ),
+    )
+    return bundle.model_dump()
+
 
-            Your job is to convert post-call extracted action items into structured task payloads.
-            You do NOT write to DynamoDB or CRM. You only produce the final JSON task bundle.
+# ---------------------------------------------------
+# 3) Agent Definition: the LLM only writes the SQL
+# ---------------------------------------------------
+class ActionSQL(BaseModel):
+    """SQL generated for an action-items request."""
+    sql_query: str = Field(description="Single PostgreSQL SELECT statement fetching the action rows")
 
-            You have only one tool: `execute_redshift_query`.
-            Use it to fetch the action extraction row from Redshift.
 
-            ------------------------------------------------------------
-            1. HOW INPUTS WORK
-            ------------------------------------------------------------
+ACTION_AGENT_PROMPT = f"""
+            You are the ActionAgent. Write the SQL that fetches the post-call action
+            extraction row(s) the user asks for. Do not answer the question yourself.
 
-            In the user instruction you may receive:
-            - A specific `call_id` (preferred)
-            - A specific `hcp_id` (optional)
-            - A structured note JSON (optional)
-            - A compliance result JSON (optional)
+            The user instruction may name a `call_id` (preferred) or an `hcp_id`.
 
-            Your first step:
-            ---------------------------------------------
             1. The table name is {TABLE_NAME}.
-            2. You must only use these allowed columns:
-            {", ".join(ACTION_SCHEMA_COLUMNS)}
-            3. Always produce a valid PostgreSQL SQL query.
-            4. Never guess values not mentioned. If value is unclear, use placeholders:
-                {{value}}
-            5. Just select specific columns needed to answer the prompt, do NOT use SELECT *.
-            6. stored this SQL query in the variable `sql_query`.
-            7. Pass created SQL query to the tool `execute_redshift_sql(sql_query)` for execution.
-
-            - Pass query to execte_redshift_sql tool
-        
-            ------------------------------------------------------------
-            2. WHAT YOU MUST DO
-            ------------------------------------------------------------
-
-            You must:
-            - Parse the action_items_json
-            - Normalize due_dates, owners, priorities
-            - Identify sample tasks
-            - Identify PA support tasks
-            - Identify MI response tasks
-            - Identify hub referral tasks
-            - Identify CRM update requirements
-            - Identify calendar event requirements
-
-            ------------------------------------------------------------
-            3. OUTPUT FORMAT (STRICT)
-            ------------------------------------------------------------
-
-            Your final output must be ONLY the following JSON:
-
-            {{
-            "call_id": "",
-            "hcp_id": "",
-            "tasks": [
-                {{
-                    "task_type": "",
-                    "owner": "",
-                    "due_date": "",
-                    "priority": 0,
-                    "status": "READY_FOR_CREATION",
-                    "metadata": {{}}
-                }}
-            ],
-            "sample_request": {{
-                "required": true/false,
-                "qty": 0
-            }},
-            "hub_referral": {{
-                "required": true/false
-            }},
-            "calendar_event": {{
-                "required": true/false,
-                "minutes": 0
-            }},
-            "crm_update": {{
-                "ready": true/false,
-                "payload": {{}}
-            }}
-            }}
-
-            Rules:
-            - Do NOT include SQL or logs in the final JSON.
-            - Do NOT hallucinate values.
-            - If something is missing, leave it empty but do not guess.
-            - If no record found, respond:
-            {{ "error": "No action records found." }}
-
-            ------------------------------------------------------------
-            4. WORKFLOW
-            ------------------------------------------------------------
-
-            1. Parse the user instruction:
-            - detect call_id if present
-            - detect optional structured note JSON
-            - detect optional compliance JSON (if provided)
-
-            2. Build SQL query string exactly as above.
-
-            3. Call:
-            result = execute_redshift_query(sql, True)
-
-            4. If result is empty:
-            return error JSON.
-
-            5. Otherwise:
-            - Extract row
-            - Parse action_items_json (list)
-            - For each:
-                - Normalize: type, owner, due date, priority
-                - Build a task entry:
-                        {{
-                        "task_type": action_type,
-                        "owner": owner,
-                        "due_date": <due_date>,
-                        "priority": priority_score,
-                        "status": "READY_FOR_CREATION",
-                        "metadata": {{}}
-                        }}
-
-            6. Sample request:
-            - required if sample_request_qty > 0
-
-            7. Hub referral:
-            - required if hub_referral_flag == "Yes" or True
-
-            8. Calendar:
-            - required if calendar_block_minutes > 0
-
-            9. CRM update:
-            - always ready if tasks exist
-
-            Return ONLY the JSON defined above.
-        """,
-        tools= get_full_tools_list(mcp_client),
+            2. Always select these columns: {", ".join(ACTION_ROW_COLUMNS)}
+            3. You must only use these allowed columns:
+            {", ".join(_schema_columns(ACTION_SCHEMA_COLUMNS))}
+            4. Always produce a valid PostgreSQL SQL query. Never use SELECT *.
+            5. Filter on the call_id or hcp_id from the instruction; never guess values.
+        """
+
+
+# The system prompt (table name + schema rules) is static and the request is
+# only ever sent as the user message, so a cache point after the system prompt
+# lets Bedrock reuse the cached prefix instead of re-reading the schema.
+# Shared session and pooled client config for the model
+BOTO_CONFIG = Config(
+    max_pool_connections=50,
+    retries={"max_attempts": 3, "mode": "adaptive"},
+    tcp_keepalive=True,
+)
+boto_session = boto3.Session()
+model = BedrockModel(cache_prompt="default", boto_session=boto_session, boto_client_config=BOTO_CONFIG)
+
+
+def create_agent():
+    """ActionAgent: turns the request into SQL for the action extraction table."""
+    return Agent(model=model, system_prompt=ACTION_AGENT_PROMPT)
+
+
+@functools.lru_cache(maxsize=1)
+def _get_mcp_session():
+    """Open the MCP gateway session once; returns (client, execute_redshift_sql tool name)."""
+    access_token = asyncio.run(fetch_m2m_token(access_token=""))
+    mcp_client = MCPClient(lambda: create_streamable_http_transport(MCP_GATEWAY_URL, access_token))
+    mcp_client.__enter__()
+    # Gateway tool names carry a target prefix ("<target>___execute_redshift_sql")
+    tool_name = next(
+        (t.mcp_tool.name for t in get_full_tools_list(mcp_client)
+         if t.mcp_tool.name.endswith("execute_redshift_sql")),
+        "execute_redshift_sql",
+    )
+    return mcp_client, tool_name
+
+
+def execute_redshift_sql(sql_query: str) -> dict:
+    """Run SQL through the gateway's execute_redshift_sql tool and return its body."""
+    mcp_client, tool_name = _get_mcp_session()
+    result = mcp_client.call_tool_sync(
+        tool_use_id=f"action-{uuid.uuid4()}",
+        name=tool_name,
+        arguments={"sql_query": sql_query, "return_results": True},
     )
+    text = "".join(c.get("text", "") for c in result.get("content", []))
+    response = orjson.loads(text) if text else {}
+    # The Lambda wraps its payload as {"statusCode": ..., "body": "<json>"}
+    body = response.get("body", response)
+    return orjson.loads(body) if isinstance(body, str) else body
+
 
 # ---------------------------------------------------
-# 3) Main Runner
+# 4) Main Runner
 # ---------------------------------------------------
 agent = create_agent()
 
+# The action extraction row of a call is written once, so the task bundle
+# for a given call_id does not change; repeated requests for the same call
+# are answered from this cache instead of another LLM + Redshift round.
+ACTION_CACHE_TTL_SECONDS = int(os.getenv("ACTION_CACHE_TTL_SECONDS", "900"))
+ACTION_CACHE_MAXSIZE = int(os.getenv("ACTION_CACHE_MAXSIZE", "1024"))
+# Only id-shaped tokens (containing a digit) count, so "the call id and ..."
+# or "call id of HCP1002" do not produce a call_id of "and" / "of"
+_CALL_ID_RE = re.compile(r"\bcall[_ ]id\b\W{0,3}([A-Za-z_-]*\d[\w-]*)", re.IGNORECASE)
+_action_cache = {}
+_action_cache_lock = threading.Lock()
+# call_ids are interpolated into the batch SQL, so only plain ids are accepted
+_SAFE_ID_RE = re.compile(r"^[\w-]+$")
+# Largest IN (...) list sent in one statement
+BATCH_MAX_CALL_IDS = int(os.getenv("ACTION_BATCH_MAX_CALL_IDS", "200"))
+
+
+def _action_cache_get(call_id: str):
+    with _action_cache_lock:
+        entry = _action_cache.get(call_id)
+    if entry is not None and entry[0] >= time.monotonic():
+        return entry[1]
+    return None
+
+
+def _action_cache_put(call_id: str, result) -> None:
+    with _action_cache_lock:
+        _action_cache.pop(call_id, None)
+        while len(_action_cache) >= ACTION_CACHE_MAXSIZE:
+            del _action_cache[next(iter(_action_cache))]
+        _action_cache[call_id] = (time.monotonic() + ACTION_CACHE_TTL_SECONDS, result)
+
+
+def build_batch_action_sql(call_ids: list[str]) -> str:
+    """One SELECT for all call_ids; the ids must already match _SAFE_ID_RE."""
+    id_list = ", ".join(f"'{call_id}'" for call_id in call_ids)
+    return (
+        f"SELECT {', '.join(ACTION_ROW_COLUMNS)} FROM {TABLE_NAME} "
+        f"WHERE call_id IN ({id_list})"
+    )
+
+
+def run_main_agent_batch(call_ids: list[str]) -> dict:
+    """
+    Build the task bundles for several calls with a single Redshift query.
+
+    The SQL is built in Python (no LLM), so N post-call reports cost one
+    gateway round trip instead of N agent + Redshift rounds. Cached calls
+    are served from the call_id cache and left out of the query.
+
+    Args:
+        call_ids (list[str]): Call ids to fetch, at most BATCH_MAX_CALL_IDS.
+
+    Returns:
+        dict: call_id -> bundle (a list when a call has several rows), or an
+              error entry for ids that are invalid or have no action row.
+    """
+    ordered = list(dict.fromkeys(str(c).strip() for c in call_ids))
+    results = {}
+    pending = []
+    for call_id in ordered:
+        if not _SAFE_ID_RE.match(call_id):
+            results[call_id] = {"error": "Invalid call_id."}
+            continue
+        cached = _action_cache_get(call_id)
+        if cached is not None:
+            results[call_id] = cached
+        else:
+            pending.append(call_id)
+    if len(pending) > BATCH_MAX_CALL_IDS:
+        return {"status": "error", "message": f"At most {BATCH_MAX_CALL_IDS} call_ids per batch"}
+
+    if pending:
+        try:
+            response = execute_redshift_sql(build_batch_action_sql(pending))
+        except Exception as e:
+            return {"status": "error", "message": "execute_redshift_sql call failed", "error": str(e)}
+        if response.get("status") != "finished":
+            return {"status": "error", "message": response.get("message") or response.get("error")}
+
+        grouped = {}
+        for row in response.get("rows", []):
+            grouped.setdefault(str(row.get("call_id") or ""), []).append(_build_action_bundle(row))
+        for call_id in pending:
+            bundles = grouped.get(call_id)
+            if not bundles:
+                results[call_id] = {"error": "No action records found."}
+                continue
+            results[call_id] = bundles[0] if len(bundles) == 1 else bundles
+            _action_cache_put(call_id, results[call_id])
+
+    return {call_id: results[call_id] for call_id in ordered}
+
 # ---------------------------------------------------
-# 4) Main Workflow
+# 5) Main Workflow
 # ------------------------------------------------
 @app.entrypoint
 def run_main_agent(payload: dict = {}):
+    # {"call_ids": [...]} skips the LLM and fetches every call in one query
+    call_ids = payload.get("call_ids")
+    if call_ids is not None:
+        # A bare string would otherwise be read one character per call_id
+        if not isinstance(call_ids, list):
+            return {"status": "error", "statusCode": 400, "message": "call_ids must be a list of call ids"}
+        return run_main_agent_batch(call_ids)
+
     payload = payload.get("prompt", "Give me action items for hcp_id 'HCP1001'")
-    agent_result = agent(payload)
+    match = _CALL_ID_RE.search(payload)
+    call_id = match.group(1) if match else None
+    if call_id:
+        cached = _action_cache_get(call_id)
+        if cached is not None:
+            return cached
+
+    try:
+        sql_query = agent(payload, structured_output_model=ActionSQL).structured_output.sql_query
+    except Exception as e:
+        return {"status": "error", "message": "Agent did not return a SQL query", "error": str(e)}
+    try:
+        response = execute_redshift_sql(sql_query)
+    except Exception as e:
+        return {"status": "error", "message": "execute_redshift_sql call failed", "error": str(e)}
+    if response.get("status") != "finished":
+        return {"status": "error", "message": response.get("message") or response.get("error")}
+    rows = response.get("rows", [])
+    if not rows:
+        return {"error": "No action records found."}
+
+    bundles = [_build_action_bundle(row) for row in rows]
+    agent_result = bundles[0] if len(bundles) == 1 else bundles
+    # Cache only a single bundle that really belongs to the requested call
+    if call_id and len(bundles) == 1 and bundles[0]["call_id"] == call_id:
+        _action_cache_put(call_id, agent_result)
     return agent_result
 
 
 # ---------------------------------------------------
-# 5) Run Locally
+# 6) Run Locally
 # ---------------------------------------------------
 if __name__ == "__main__":
-    app.run()
+    # python action_agent.py CALL-1 CALL-2 ... prints the batch bundles instead of serving
+    if len(sys.argv) > 1:
+        print(orjson.dumps(run_main_agent_batch(sys.argv[1:]), option=orjson.OPT_INDENT_2).decode())
+    else:
+        app.run()
     #run_main_agent()
\ No newline at end of file
@@ -160,8 +160,8 @@ def create_agent():
             - No other columns except those requested,No SQL, no logs.
 
         3. Query Patterns:
-            - For general retrieval: SELECT * FROM {TABLE_NAME} LIMIT 50;
-            - For filtering: SELECT * FROM {TABLE_NAME} WHERE <condition>;
+            - For general retrieval: SELECT <col1>, <col2> FROM {TABLE_NAME} LIMIT 50;
+            - For filtering: SELECT <col1>, <col2> FROM {TABLE_NAME} WHERE <condition>;
             - For sorting: ORDER BY <column> ASC/DESC;
             - For aggregations: SELECT <col>, COUNT(*) FROM {TABLE_NAME} GROUP BY <col>;
             - Multi-condition: Use AND / OR explicitly.
@@ -1,4 +1,5 @@
 import json
+import orjson
 from strands import Agent,tool
 import boto3
 from typing import Dict, Any
@@ -45,26 +46,41 @@ CSV_BUCKET=get_parameter_value("SC_POC_SA_TA_BUCKET")
 DEFAULT_SQL_LIMIT = 1000
 SQL_POLL_INTERVAL_SECONDS = 0.5
 SQL_POLL_MAX_SECONDS = 30.0
+redshift_client = boto3.client("redshift-data")
+
+# The HCP ID is bound as a Data API parameter rather than interpolated, so the
+# statement text is identical on every call and no quoting is needed.
+TRANSCRIPT_SQL = f"""
+    SELECT *
+    FROM {TRANSCRIPT_TABLE}
+    WHERE hcp_id = :hcp_id
+    LIMIT 1;
+    """.strip()
 # ----------------------
 # Helper: Redshift Data API tool
 # ----------------------
 
-def execute_redshift_sql(sql_query: str, return_results: bool = True) -> Dict[str, Any]:
+def execute_redshift_sql(sql_query: str, return_results: bool = True, parameters: Dict[str, str] = None) -> Dict[str, Any]:
     """
     Execute arbitrary SQL against Redshift Serverless Data API (workgroup mode).
     Returns a dict: {"status":"finished","rows":[{col:val,...}, ...]} or error structure.
 
     - sql_query: SQL string to execute (caller is responsible for safety/validation).
     - return_results: when False, only returns execution status.
+    - parameters: optional values for :name placeholders in sql_query. Keeping the
+      SQL text constant lets Redshift reuse the compiled plan across calls.
     """
-    client = boto3.client("redshift-data")
+    client = redshift_client
+    statement = {
+        "WorkgroupName": WORKGROUP,
+        "Database": DATABASE,
+        "SecretArn": SECRET_ARN,
+        "Sql": sql_query,
+    }
+    if parameters:
+        statement["Parameters"] = [{"name": k, "value": str(v)} for k, v in parameters.items()]
     try:
-        resp = client.execute_statement(
-            WorkgroupName=WORKGROUP,
-            Database=DATABASE,
-            SecretArn=SECRET_ARN,
-            Sql=sql_query
-        )
+        resp = client.execute_statement(**statement)
         stmt_id = resp["Id"]
     except Exception as e:
         return {"status": "error", "message": f"execute_statement error: {str(e)}"}
@@ -140,7 +156,8 @@ def save_structured_note(key: str, note: Dict[str, Any]) -> str:
     s3.put_object(
         Bucket=RESULT_BUCKET,
         Key=result_key,
-        Body=json.dumps(note, indent=2),
+        # orjson writes bytes directly: no indent pass and no str -> UTF-8 re-encode
+        Body=orjson.dumps(note),
         ContentType="application/json"
     )
     return f"Saved to s3://{RESULT_BUCKET}/{result_key}"
@@ -161,24 +178,13 @@ def load_transcription_data_from_redshift(hcp_id: str) -> str:
     Returns:
         JSON string: either the row dict or {"error": "..."}.
     """
-    # Basic sanitization to reduce risk of SQL injection; prefer parameterized execution if available
     if hcp_id is None:
         return json.dumps({"error": "hcp_id is required"})
 
-    # Escape single quotes (simple mitigation)
-    safe_hcp_id = str(hcp_id).replace("'", "''")
-
-    sql = f"""
-    SELECT *
-    FROM {TRANSCRIPT_TABLE}
-    WHERE hcp_id = '{safe_hcp_id}'
-    LIMIT 1;
-    """.strip()
-
     print(f"Querying Redshift table {TRANSCRIPT_TABLE} for HCP ID: {hcp_id}")
 
     try:
-        resp = execute_redshift_sql(sql, return_results=True)
+        resp = execute_redshift_sql(TRANSCRIPT_SQL, return_results=True, parameters={"hcp_id": hcp_id})
     except Exception as e:
         return json.dumps({"error": f"execute_redshift_sql call failed: {str(e)}"})
 
@@ -7,12 +7,14 @@ post-call analysis including transcription, structure, compliance,
 actions, and sentiment analysis.
 """
 
-import json
+import orjson
 import uuid
 import boto3
 import time
+from botocore.config import Config
 from enum import Enum
 from strands import Agent, tool
+from strands.models import BedrockModel
 from bedrock_agentcore.runtime import BedrockAgentCoreApp
 
 
@@ -20,7 +22,14 @@ from bedrock_agentcore.runtime import BedrockAgentCoreApp
 # AWS Configuration
 # =============================================================================
 AWS_REGION = "us-east-1"
-agentcore_client = boto3.client("bedrock-agentcore", region_name=AWS_REGION)
+# Shared session and pooled client config for the model and AgentCore client
+BOTO_CONFIG = Config(
+    max_pool_connections=50,
+    retries={"max_attempts": 3, "mode": "adaptive"},
+    tcp_keepalive=True,
+)
+boto_session = boto3.Session(region_name=AWS_REGION)
+agentcore_client = boto_session.client("bedrock-agentcore", config=BOTO_CONFIG)
 app = BedrockAgentCoreApp()
 
 
@@ -295,7 +304,7 @@ def action_agent_tool(intent: str) -> dict:
               Or error details in case of failure.
     """
     session_id = f"nl-{uuid.uuid4().hex}{uuid.uuid4().hex[:8]}"
-    payload = json.dumps({"prompt": intent, "session_id": session_id})
+    payload = orjson.dumps({"prompt": intent, "session_id": session_id})
     
     kwargs = {
         "agentRuntimeArn": SC_PRC_ACTION_AGENT_RUNTIME_ARN,
@@ -307,7 +316,7 @@ def action_agent_tool(intent: str) -> dict:
     try:
         resp = agentcore_client.invoke_agent_runtime(**kwargs)
         body = resp["response"].read()
-        return json.loads(body.decode("utf-8") if isinstance(body, (bytes, bytearray)) else body)
+        return orjson.loads(body)
     except Exception:
         if body:
             return {"result": body.decode("utf-8") if isinstance(body, (bytes, bytearray)) else str(body)}
@@ -337,7 +346,7 @@ def sentiment_agent_tool(intent: str) -> dict:
               Or error details in case of failure.
     """
     session_id = f"nl-{uuid.uuid4().hex}{uuid.uuid4().hex[:8]}"
-    payload = json.dumps({"prompt": intent, "session_id": session_id})
+    payload = orjson.dumps({"prompt": intent, "session_id": session_id})
     
     kwargs = {
         "agentRuntimeArn": SC_PRC_SENTIMENT_AGENT_RUNTIME_ARN,
@@ -349,7 +358,7 @@ def sentiment_agent_tool(intent: str) -> dict:
     try:
         resp = agentcore_client.invoke_agent_runtime(**kwargs)
         body = resp["response"].read()
-        return json.loads(body.decode("utf-8") if isinstance(body, (bytes, bytearray)) else body)
+        return orjson.loads(body)
     except Exception:
         if body:
             return {"result": body.decode("utf-8") if isinstance(body, (bytes, bytearray)) else str(body)}
@@ -379,7 +388,7 @@ def structure_agent_tool(intent: str) -> dict:
               Or error details in case of failure.
     """
     session_id = f"nl-{uuid.uuid4().hex}{uuid.uuid4().hex[:8]}"
-    payload = json.dumps({"prompt": intent, "session_id": session_id})
+    payload = orjson.dumps({"prompt": intent, "session_id": session_id})
     
     kwargs = {
         "agentRuntimeArn": SC_PRC_STRUCTURE_AGENT_RUNTIME_ARN,
@@ -391,7 +400,7 @@ def structure_agent_tool(intent: str) -> dict:
     try:
         resp = agentcore_client.invoke_agent_runtime(**kwargs)
         body = resp["response"].read()
-        return json.loads(body.decode("utf-8") if isinstance(body, (bytes, bytearray)) else body)
+        return orjson.loads(body)
     except Exception:
         if body:
             return {"result": body.decode("utf-8") if isinstance(body, (bytes, bytearray)) else str(body)}
@@ -423,7 +432,7 @@ def compilance_agent_tool(intent: str) -> dict:
               Or error details in case of failure.
     """
     session_id = f"nl-{uuid.uuid4().hex}{uuid.uuid4().hex[:8]}"
-    payload = json.dumps({"prompt": intent, "session_id": session_id})
+    payload = orjson.dumps({"prompt": intent, "session_id": session_id})
     
     kwargs = {
         "agentRuntimeArn": SC_PRC_COMPILANCE_AGENT_RUNTIME_ARN,
@@ -435,7 +444,7 @@ def compilance_agent_tool(intent: str) -> dict:
     try:
         resp = agentcore_client.invoke_agent_runtime(**kwargs)
         body = resp["response"].read()
-        return json.loads(body.decode("utf-8") if isinstance(body, (bytes, bytearray)) else body)
+        return orjson.loads(body)
     except Exception:
         if body:
             return {"result": body.decode("utf-8") if isinstance(body, (bytes, bytearray)) else str(body)}
@@ -446,29 +455,27 @@ def compilance_agent_tool(intent: str) -> dict:
 # Utility Functions
 # =============================================================================
 
+# Built once at import; every supervisor agent shares the same tool tuple.
+SUPERVISOR_TOOLS = (
+    action_agent_tool,
+    sentiment_agent_tool,
+    structure_agent_tool,
+    compilance_agent_tool,
+)
+
+
 def _tools_list() -> list:
     """
-    Compile the complete list of available agent tools.
-    
-    Assembles all callable agent tool functions into a single list
-    for registration with the supervisor agent. This ensures all
-    specialized agents are available for delegation.
+    Return the agent tools registered with the supervisor agent.
 
     Returns:
-        list: Collection of all callable agent tool functions:
+        list: A copy of SUPERVISOR_TOOLS:
               - action_agent_tool
               - sentiment_agent_tool
               - structure_agent_tool
-              - transcription_agent_tool
               - compilance_agent_tool
     """
-    return [
-        action_agent_tool,
-        sentiment_agent_tool,
-        structure_agent_tool,
-
-        compilance_agent_tool
-    ]
+    return list(SUPERVISOR_TOOLS)
 
 
 # =============================================================================
@@ -489,6 +496,7 @@ def create_supervisor_agent() -> Agent:
                with system_prompt defining behavior and tools list for delegation.
     """
     return Agent(
+        model=BedrockModel(boto_session=boto_session, boto_client_config=BOTO_CONFIG),
         system_prompt=SUPERVISOR_AGENT_PROMPT,
         tools=_tools_list(),
     )
@@ -1,13 +1,20 @@
 from __future__ import annotations
 from strands import Agent,tool
 from typing import Optional, Dict, Any
+import io
 import os
-import json
+import orjson
 import time
 import uuid
 import random
+import threading
 import boto3
+import numpy as np
 import logging
+from concurrent.futures import ThreadPoolExecutor
+import urllib.request
+from urllib.parse import urlparse, unquote
+from boto3.s3.transfer import TransferConfig
 from bedrock_agentcore.runtime import BedrockAgentCoreApp
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(message)s")
 logger = logging.getLogger("transciption_agent")
@@ -32,10 +39,49 @@ def get_parameter_value(parameter_name):
         return None
     
 # Config values (change anytime)
-AUDIO_BUCKET = get_parameter_value("SC_POC_SA_TA_BUCKET")
+# One bucket holds the source audio, temp uploads and Transcribe output
+S3_BUCKET = get_parameter_value("SC_POC_SA_TA_BUCKET")
 AUDIO_PREFIX = get_parameter_value("SC_POC_TA_AUDIO_PREFIX")  # <-- your audio folder prefix
-TEMP_UPLOAD_BUCKET = get_parameter_value("SC_POC_SA_TA_BUCKET")
-TRANSCRIBE_OUTPUT_BUCKET = get_parameter_value("SC_POC_SA_TA_BUCKET")
+SUPPORTED_MEDIA_FORMATS = frozenset({"mp3", "wav", "mp4", "flac", "amr", "ogg", "webm", "m4a"})
+# Rough bytes per second of audio by format, used to size the status polling
+# interval from the file size (call recordings: 8-16 kHz mono, ~128 kbps lossy)
+AUDIO_BYTES_PER_SECOND = {"wav": 32000, "flac": 16000, "amr": 1600}
+DEFAULT_AUDIO_BYTES_PER_SECOND = 16000
+# Bounds of the status polling interval (before jitter)
+POLL_INTERVAL_START_MAX_SECONDS = 10.0
+POLL_INTERVAL_MAX_SECONDS = 60.0
+# Optional SQS queue receiving "Transcribe Job State Change" events from an
+# EventBridge rule, e.g.
+#   {"source": ["aws.transcribe"],
+#    "detail-type": ["Transcribe Job State Change"],
+#    "detail": {"TranscriptionJobName": [{"prefix": "transcribe-"}],
+#               "TranscriptionJobStatus": ["COMPLETED", "FAILED"]}}
+# When it is not set, job completion is detected by polling. The queue's
+# visibility timeout (default 30 s) paces how often unclaimed events reappear.
+TRANSCRIBE_EVENTS_QUEUE_URL = get_parameter_value("SC_POC_TA_TRANSCRIBE_EVENTS_QUEUE_URL")
+# While waiting for the event, the job status is still polled this often
+EVENT_STATUS_CHECK_SECONDS = 60.0
+# Events nobody in this container waits for are dropped after this many receives
+EVENT_MAX_RECEIVES = 5
+FINISHED_JOBS_MAXSIZE = 1024
+# job name -> threading.Event set by the receiver thread when its event arrives
+_job_waiters = {}
+# Jobs that finished in this container; late events for them are dropped
+_finished_jobs = {}
+_job_waiters_lock = threading.Lock()
+_event_receiver = None
+
+# Created once and shared by every transcribe_audio call (boto3 clients are
+# thread-safe), instead of building new clients per job.
+s3_client = boto3.client("s3", region_name="us-east-1")
+transcribe_client = boto3.client("transcribe", region_name="us-east-1")
+sqs_client = boto3.client("sqs", region_name="us-east-1")
+# Transcripts above the threshold are fetched as parallel ranged GETs
+TRANSCRIPT_TRANSFER_CONFIG = TransferConfig(
+    multipart_threshold=4 * 1024 * 1024,
+    multipart_chunksize=2 * 1024 * 1024,
+    max_concurrency=8,
+)
 
 app = BedrockAgentCoreApp()
 
@@ -53,20 +99,20 @@ def transcribe_audio(
     cleanup_temp: bool = False,
     enable_speaker_diarization: bool = False,
     max_speakers: int = 2,
+    save_columnar: bool = False,
 ) -> Dict[str, Any]:
     """
     Main transcription tool. Auto-builds S3 URI using only the HCP_ID and AUDIO_PREFIX.
+    With save_columnar, also writes the word items as a columnar .npz under
+    output_s3_prefix (see _structure_transcript_columnar).
     """
 
     if not (hcp_id or s3_audio_uri or local_audio_path):
         raise ValueError("Provide either hcp_id, s3_audio_uri, or local_audio_path")
 
-    s3_client = boto3.client("s3", region_name='us-east-1')
-    transcribe_client = boto3.client("transcribe", region_name='us-east-1')
-
     # Build S3 URI automatically if hcp_id is provided
     if hcp_id and not s3_audio_uri:
-        s3_audio_uri = f"s3://{AUDIO_BUCKET}/{AUDIO_PREFIX}{hcp_id}.{media_format}"
+        s3_audio_uri = f"s3://{S3_BUCKET}/{AUDIO_PREFIX}{hcp_id}.{media_format}"
 
     temp_key = None
     if local_audio_path:
@@ -74,8 +120,8 @@ def transcribe_audio(
             raise FileNotFoundError(local_audio_path)
         filename = os.path.basename(local_audio_path)
         temp_key = f"tmp/transcribe/{uuid.uuid4().hex}/{filename}"
-        s3_client.upload_file(local_audio_path, TEMP_UPLOAD_BUCKET, temp_key)
-        s3_audio_uri = f"s3://{TEMP_UPLOAD_BUCKET}/{temp_key}"
+        s3_client.upload_file(local_audio_path, S3_BUCKET, temp_key)
+        s3_audio_uri = f"s3://{S3_BUCKET}/{temp_key}"
 
     if not media_format:
         ext = os.path.splitext(s3_audio_uri)[1].lstrip(".").lower()#type:ignore
@@ -84,15 +130,12 @@ def transcribe_audio(
         else:
             raise ValueError("media_format missing & cannot be inferred.")
 
-    supported_formats = {"mp3", "wav", "mp4", "flac", "amr", "ogg", "webm", "m4a"}
-    if media_format.lower() not in supported_formats:#type:ignore
+    if media_format.lower() not in SUPPORTED_MEDIA_FORMATS:#type:ignore
         raise ValueError(f"Unsupported media format: {media_format}")
 
     job_name = f"transcribe-{uuid.uuid4().hex[:12]}"
     if not output_s3_prefix or not output_s3_prefix.startswith("s3://"):
-        output_s3_prefix = f"s3://{TEMP_UPLOAD_BUCKET}/{job_name}/"
-
-    output_bucket, output_prefix = _split_s3_prefix(output_s3_prefix)
+        output_s3_prefix = f"s3://{S3_BUCKET}/{job_name}/"
 
     media_settings = {
         "MediaFormat": media_format,
@@ -106,7 +149,7 @@ def transcribe_audio(
         "TranscriptionJobName": job_name,
         "LanguageCode": language_code,
         **media_settings,
-        "OutputBucketName": TRANSCRIBE_OUTPUT_BUCKET,
+        "OutputBucketName": S3_BUCKET,
     }
 
     if enable_speaker_diarization:
@@ -116,51 +159,33 @@ def transcribe_audio(
         }
 
     transcribe_client.start_transcription_job(**params)
-    get_status = lambda: transcribe_client.get_transcription_job(
-        TranscriptionJobName=job_name
-    )
-    extract_path = ("TranscriptionJob", "Transcript", "TranscriptFileUri")
-    status_path = ("TranscriptionJob", "TranscriptionJobStatus")
-
-    # -------------------------------
-    # Poll until done
-    # -------------------------------
-    start_time = time.time()
-    timeout_seconds = timeout_minutes * 60
-    attempt = 0
-    transcript_uri = None
-
-    while True:
-        if time.time() - start_time > timeout_seconds:
-            raise TimeoutError("Transcription job timed out.")
-
-        status_response = get_status()
-        job_status = _deep_get(status_response, status_path)
-
-        if job_status == "FAILED":
-            fail_reason = _deep_get(status_response, (*status_path[:-1], "FailureReason"))
-            raise RuntimeError(f"Transcribe job failed: {fail_reason}")
-
-        if job_status == "COMPLETED":
-            transcript_uri = _deep_get(status_response, extract_path)
-            break
-
-        time.sleep(min(60, 2 ** attempt) * random.uniform(0.5, 1.5))
-        attempt += 1
+    est_duration = _estimate_audio_duration(s3_audio_uri, local_audio_path, media_format)
+    job = _wait_for_transcription_job(transcribe_client, job_name, timeout_minutes * 60, est_duration)
+    transcript_uri = job.get("Transcript", {}).get("TranscriptFileUri")
 
     raw_json = _download_transcript(transcript_uri, s3_client)#type:ignore
     structured = _structure_transcript(raw_json)
 
     final_uri = f"{output_s3_prefix.rstrip('/')}/{job_name}-structured.json"
+    # Opt-in, so the default path does not wait on an extra S3 upload
+    columnar_uri = None
+    if save_columnar:
+        columnar_uri = f"{output_s3_prefix.rstrip('/')}/{job_name}-columnar.npz"
+        try:
+            _save_columnar(columnar_uri, _structure_transcript_columnar(raw_json))
+        except Exception as e:
+            logger.warning("Columnar transcript upload failed: %s", e)
+            columnar_uri = None
 
     if cleanup_temp and temp_key:
         try:
-            s3_client.delete_object(Bucket=TEMP_UPLOAD_BUCKET, Key=temp_key)
+            s3_client.delete_object(Bucket=S3_BUCKET, Key=temp_key)
         except Exception:
             print("[WARN] temp cleanup failed.")
 
     return {
         "transcript_s3_uri": final_uri,
+        "columnar_s3_uri": columnar_uri,
         "transcript_json": structured,
         "raw_transcribe_response": raw_json,
     }
@@ -169,26 +194,163 @@ def transcribe_audio(
 # -------------------------------
 # Helpers
 # -------------------------------
-def _split_s3_prefix(uri: str) -> tuple[str, str]:
-    assert uri.startswith("s3://")
-    without = uri[5:]
-    bucket, *rest = without.split("/", 1)
-    prefix = rest[0] if rest else ""
-    return bucket, prefix
+def _estimate_audio_duration(s3_audio_uri: Optional[str], local_audio_path: Optional[str],
+                             media_format: str) -> Optional[float]:
+    """Approximate audio length in seconds from the file size; None if unknown."""
+    try:
+        if local_audio_path:
+            size = os.path.getsize(local_audio_path)
+        else:
+            bucket, _, key = s3_audio_uri[len("s3://"):].partition("/")#type:ignore
+            size = s3_client.head_object(Bucket=bucket, Key=key)["ContentLength"]
+    except Exception:
+        return None
+    return size / AUDIO_BYTES_PER_SECOND.get(media_format.lower(), DEFAULT_AUDIO_BYTES_PER_SECOND)
+
+
+def _wait_for_transcription_job(transcribe_client, job_name: str, timeout_seconds: int,
+                                est_duration_sec: Optional[float] = None) -> dict:
+    """Block until the job finishes; returns its final "TranscriptionJob" record.
+
+    The polling interval scales with the estimated audio length: short clips
+    are checked about every second at first, long calls start at up to 10 s.
+    The interval never exceeds POLL_INTERVAL_MAX_SECONDS, so a finished job
+    is noticed at least as quickly as with the fixed 60 s cap.
+    """
+    deadline = time.time() + timeout_seconds
+    if est_duration_sec:
+        poll_min = min(POLL_INTERVAL_START_MAX_SECONDS, max(1.0, est_duration_sec / 60))
+        poll_max = min(POLL_INTERVAL_MAX_SECONDS, max(10.0, est_duration_sec / 5))
+    else:
+        poll_min, poll_max = 1.0, POLL_INTERVAL_MAX_SECONDS
+    if TRANSCRIBE_EVENTS_QUEUE_URL:
+        try:
+            _wait_for_job_event(job_name, deadline)
+        except Exception as e:
+            logger.warning("Transcribe event queue unavailable, polling instead: %s", e)
+
+    # One call when the event arrived (or the deadline passed while waiting
+    # for it); otherwise poll with backoff + jitter
+    attempt = 0
+    while True:
+        job = transcribe_client.get_transcription_job(TranscriptionJobName=job_name)["TranscriptionJob"]
+        job_status = job.get("TranscriptionJobStatus")
+        if job_status == "FAILED":
+            raise RuntimeError(f"Transcribe job failed: {job.get('FailureReason')}")
+        if job_status == "COMPLETED":
+            return job
+        if time.time() > deadline:
+            raise TimeoutError("Transcription job timed out.")
+        time.sleep(min(poll_max, poll_min * 1.5 ** attempt) * random.uniform(0.5, 1.5))
+        attempt += 1
+
+
+def _wait_for_job_event(job_name: str, deadline: float) -> None:
+    """Wait until the event receiver reports a final state event for job_name,
+    or the deadline passes.
+
+    The job status is also checked every EVENT_STATUS_CHECK_SECONDS, so a
+    missing rule or an event consumed elsewhere costs about a minute instead
+    of the whole timeout.
+    """
+    _ensure_event_receiver()
+    arrived = threading.Event()
+    with _job_waiters_lock:
+        _job_waiters[job_name] = arrived
+    try:
+        while time.time() < deadline:
+            if arrived.wait(timeout=min(EVENT_STATUS_CHECK_SECONDS, max(0.0, deadline - time.time()))):
+                return
+            job = transcribe_client.get_transcription_job(TranscriptionJobName=job_name)["TranscriptionJob"]
+            if job.get("TranscriptionJobStatus") in ("COMPLETED", "FAILED"):
+                logger.warning("No Transcribe event received for %s; found its final state by polling", job_name)
+                return
+    finally:
+        with _job_waiters_lock:
+            _job_waiters.pop(job_name, None)
+            _finished_jobs[job_name] = None
+            while len(_finished_jobs) > FINISHED_JOBS_MAXSIZE:
+                del _finished_jobs[next(iter(_finished_jobs))]
+
+
+def _ensure_event_receiver() -> None:
+    global _event_receiver
+    with _job_waiters_lock:
+        if _event_receiver is None:
+            _event_receiver = threading.Thread(target=_receive_job_events, name="transcribe-events", daemon=True)
+            _event_receiver.start()
+
+
+def _receive_job_events() -> None:
+    """Single long-poll loop per container feeding every local waiter.
+
+    Events for jobs waited on here, or already finished here, are deleted.
+    Others may belong to another container: they are left alone, so the
+    queue's visibility timeout hides them between receives (no busy loop),
+    and dropped once received EVENT_MAX_RECEIVES times without an owner.
+    """
+    backoff = 1.0
+    while True:
+        try:
+            response = sqs_client.receive_message(
+                QueueUrl=TRANSCRIBE_EVENTS_QUEUE_URL,
+                MaxNumberOfMessages=10,
+                WaitTimeSeconds=20,
+                AttributeNames=["ApproximateReceiveCount"],
+            )
+            backoff = 1.0
+        except Exception as e:
+            logger.warning("Transcribe events receive failed: %s", e)
+            time.sleep(backoff)
+            backoff = min(60.0, backoff * 2)
+            continue
+
+        to_delete = []
+        for message in response.get("Messages", []):
+            try:
+                job_name = orjson.loads(message["Body"]).get("detail", {}).get("TranscriptionJobName")
+            except orjson.JSONDecodeError:
+                job_name = None
+            with _job_waiters_lock:
+                waiter = _job_waiters.get(job_name)
+                finished = job_name in _finished_jobs
+            receive_count = int(message.get("Attributes", {}).get("ApproximateReceiveCount", "1"))
+            if waiter is not None:
+                waiter.set()
+            if waiter is not None or finished or not job_name or receive_count >= EVENT_MAX_RECEIVES:
+                to_delete.append({"Id": str(len(to_delete)), "ReceiptHandle": message["ReceiptHandle"]})
+        if to_delete:
+            try:
+                sqs_client.delete_message_batch(QueueUrl=TRANSCRIBE_EVENTS_QUEUE_URL, Entries=to_delete)
+            except Exception as e:
+                logger.warning("Transcribe events delete failed: %s", e)
 
 
 def _download_transcript(uri: str, s3_client):
-    from urllib.parse import urlparse
+    # The raw bytes are parsed directly by orjson, so a long transcript is
+    # not held a second time as a decoded str.
     parsed = urlparse(uri)
+    bucket = key = None
     if parsed.scheme == "s3":
         bucket = parsed.netloc
         key = parsed.path.lstrip("/")
-        obj = s3_client.get_object(Bucket=bucket, Key=key)
-        return json.loads(obj["Body"].read().decode("utf-8"))
+    elif parsed.netloc.endswith(".amazonaws.com") and not parsed.query:
+        # Transcribe reports OutputBucketName results as S3 https URLs:
+        # path style (s3.<region>.amazonaws.com/<bucket>/<key>) or virtual
+        # hosted (<bucket>.s3.<region>.amazonaws.com/<key>)
+        host = parsed.netloc
+        path = unquote(parsed.path).lstrip("/")
+        if host.startswith("s3.") or host.startswith("s3-"):
+            bucket, _, key = path.partition("/")
+        elif ".s3." in host or ".s3-" in host:
+            bucket, key = host.split(".s3", 1)[0], path
+    if bucket and key:
+        buf = io.BytesIO()
+        s3_client.download_fileobj(bucket, key, buf, Config=TRANSCRIPT_TRANSFER_CONFIG)
+        return orjson.loads(buf.getbuffer())
 
-    import urllib.request
     with urllib.request.urlopen(uri) as r:
-        return json.loads(r.read().decode("utf-8"))
+        return orjson.loads(r.read())
 
 
 def _structure_transcript(transcript_json: dict) -> dict:
@@ -196,16 +358,18 @@ def _structure_transcript(transcript_json: dict) -> dict:
     transcripts = results.get("transcripts", [])
     items = results.get("items", [])
 
-    if transcripts:
-        full_text = " ".join(t.get("transcript", "") for t in transcripts).strip()
-    else:
-        words = []
+    # Transcribe's own transcript text is the common case; the items are only
+    # walked when it is missing or empty.
+    full_text = " ".join(t.get("transcript", "") for t in transcripts).strip()
+    if not full_text and items:
+        # Punctuation attaches to the previous word; every other item is
+        # preceded by a space. One pass, one join.
+        parts = []
         for it in items:
-            if it.get("type") == "punctuation" and words:
-                words[-1] += it["alternatives"][0]["content"]
-            else:
-                words.append(it["alternatives"][0]["content"])
-        full_text = " ".join(words).strip()
+            if parts and it.get("type") != "punctuation":
+                parts.append(" ")
+            parts.append(it["alternatives"][0]["content"])
+        full_text = "".join(parts).strip()
 
     return {
         "jobName": transcript_json.get("jobName", ""),
@@ -217,14 +381,57 @@ def _structure_transcript(transcript_json: dict) -> dict:
     }
 
 
-def _deep_get(dct: dict, path: tuple[str, ...]):
-    cur = dct
-    for p in path:
-        if isinstance(cur, dict) and p in cur:
-            cur = cur[p]
-        else:
-            return None
-    return cur
+def _structure_transcript_columnar(transcript_json: dict) -> Dict[str, Any]:
+    """
+    Column-per-field layout of the Transcribe items for word-level scans.
+
+    Consumers filter with array masks (e.g. confidence < 0.7) instead of
+    looping over the per-item dicts. Punctuation items carry no timestamps,
+    so their start/end are NaN.
+    """
+    results = transcript_json.get("results", {})
+    items = results.get("items", [])
+    n = len(items)
+    start = np.full(n, np.nan, dtype=np.float32)
+    end = np.full(n, np.nan, dtype=np.float32)
+    confidence = np.zeros(n, dtype=np.float32)
+    content = np.empty(n, dtype=object)
+    is_punct = np.zeros(n, dtype=bool)
+    for i, it in enumerate(items):
+        alt = it["alternatives"][0]
+        content[i] = alt.get("content", "")
+        confidence[i] = float(alt.get("confidence") or 0.0)
+        is_punct[i] = it.get("type") == "punctuation"
+        if "start_time" in it:
+            start[i] = float(it["start_time"])
+            end[i] = float(it["end_time"])
+    return {
+        "text": _structure_transcript(transcript_json)["text"],
+        "start": start,
+        "end": end,
+        "content": content,
+        "confidence": confidence,
+        "is_punct": is_punct,
+    }
+
+
+def _save_columnar(s3_uri: str, columns: Dict[str, Any]) -> None:
+    """Write the columnar transcript to S3 as an .npz (content as a str array)."""
+    bucket, _, key = s3_uri[len("s3://"):].partition("/")
+    buf = io.BytesIO()
+    np.savez_compressed(
+        buf,
+        text=np.array(columns["text"]),
+        start=columns["start"],
+        end=columns["end"],
+        # object arrays would need pickle to load back; store fixed-width str
+        content=columns["content"].astype(str),
+        confidence=columns["confidence"],
+        is_punct=columns["is_punct"],
+    )
+    buf.seek(0)
+    s3_client.upload_fileobj(buf, bucket, key, ExtraArgs={"ContentType": "application/octet-stream"})
+
 
 TRANSCRIPTION_AGENT_SYSTEM_PROMPT = """
 You are a medical-grade transcription agent specialized in HCP (healthcare professional)
@@ -242,7 +449,7 @@ Your responsibilities:
    Instead, pass the extracted HCP ID to the transcribe_audio tool.
 
    The tool will automatically build the correct S3 URI:
-   s3://<AUDIO_BUCKET>/<HCP_ID>.<media_format>
+   s3://<S3_BUCKET>/<HCP_ID>.<media_format>
 
 3. Call transcribe_audio with only valid fields per schema.
    Do not add extra fields.
@@ -266,8 +473,54 @@ def create_transcription_agent() -> Agent:
 
 agent=create_transcription_agent()
 
+# Transcription jobs run server-side, so several HCPs' jobs are started and
+# awaited side by side; the bound stays well under the Transcribe job quota.
+TRANSCRIBE_BATCH_CONCURRENCY = int(os.getenv("TRANSCRIBE_BATCH_CONCURRENCY", "8"))
+# transcribe_audio arguments a batch caller may set; audio locations always
+# come from the HCP ids
+BATCH_OPTIONS = frozenset({
+    "language_code", "media_format", "enable_speaker_diarization",
+    "max_speakers", "use_medical", "save_columnar",
+})
+
+
+def run_transcription_batch(hcp_ids: list, **options) -> Dict[str, Any]:
+    """
+    Transcribe the audio of several HCPs concurrently, without the LLM.
+
+    The jobs do not depend on each other, so the batch takes about as long as
+    the slowest job instead of the sum of all of them.
+
+    Args:
+        hcp_ids (list): HCP ids whose <AUDIO_PREFIX><hcp_id>.<format> audio to transcribe.
+        **options: BATCH_OPTIONS arguments applied to every job; others are ignored.
+
+    Returns:
+        dict: hcp_id -> transcribe_audio result, or {"error": ...} for failed jobs.
+    """
+    hcp_ids = list(dict.fromkeys(hcp_ids))
+    options = {k: v for k, v in options.items() if k in BATCH_OPTIONS}
+    options["output_s3_prefix"] = None
+
+    def _run(hcp_id):
+        try:
+            return transcribe_audio(hcp_id=hcp_id, **options)
+        except Exception as e:
+            return {"error": str(e)}
+
+    if not hcp_ids:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(TRANSCRIBE_BATCH_CONCURRENCY, len(hcp_ids))) as ex:
+        return dict(zip(hcp_ids, ex.map(_run, hcp_ids)))
+
+
 @app.entrypoint
 def run_main_agent(payload: dict = {}):
+    # {"hcp_ids": [...]} skips the LLM and runs every transcription at once
+    if isinstance(payload.get("hcp_ids"), list):
+        options = payload.get("options")
+        return run_transcription_batch(payload["hcp_ids"], **(options if isinstance(options, dict) else {}))
+
     payload = payload.get("prompt", "Please transcribe audio for HCP1001 using medical mode..")
     agent_result = agent(payload)#type:ignore
     return agent_result
@@ -3,6 +3,7 @@ from strands import Agent, tool
 import boto3
 import asyncio
 import re
+from concurrent.futures import ThreadPoolExecutor
 from bedrock_agentcore.runtime import BedrockAgentCoreApp, BedrockAgentCoreContext
 from bedrock_agentcore.services.identity import IdentityClient
 from bedrock_agentcore.identity.auth import requires_access_token
@@ -29,25 +30,59 @@ def get_parameter_value(parameter_name):
         print(f"Error fetching parameter {parameter_name}: {str(e)}")
         return None
 
+def get_parameter_values(parameter_names):
+    """Fetch several parameters from AWS Systems Manager Parameter Store in one call.
+
+    Returns:
+        dict: Parameter name -> value (decrypted if needed). Parameters that could
+        not be fetched map to None, matching get_parameter_value().
+    """
+    values = dict.fromkeys(parameter_names)
+    try:
+        ssm_client = boto3.client("ssm")
+        response = ssm_client.get_parameters(Names=list(parameter_names), WithDecryption=True)
+        values.update({p["Name"]: p["Value"] for p in response["Parameters"]})
+        for name in response.get("InvalidParameters", []):
+            print(f"Error fetching parameter {name}: parameter not found")
+    except Exception as e:
+        print(f"Error fetching parameters {', '.join(parameter_names)}: {str(e)}")
+    return values
+
 def _parse_scopes(s: str) -> list[str]:
     if not s:
         return []
     parts = re.split(r"[,\s]+", s.strip())
     return [p for p in parts if p]
 
-MCP_GATEWAY_URL = get_parameter_value("MCP_GATEWAY_URL")
-OAUTH_PROVIDER_NAME = get_parameter_value("PROVIDER_NAME")
-OAUTH_SCOPE = _parse_scopes(get_parameter_value("SCOPE"))
-TABLE_NAME = get_parameter_value("SC_PRC_HCP_ACESS_FORMULARY_TABLE")
-TABLE_SCHEMA_DESCRIPTION = get_parameter_value("SC_POC_ACTION_TABLE_SCHEMA")
-
 # ---------------------------------------------------
 # 1) Identity & Access Bootstrap
 # ---------------------------------------------------
+# All configuration, including the table schema embedded in the system prompt,
+# is read once at import in a single SSM round trip; the agent below is built
+# once from it and reused for every request. The SSM read and the workload
+# token request do not depend on each other, so both run at the same time.
 identity_client = IdentityClient("us-east-1")
-workload_access_token = identity_client.get_workload_access_token(
-    workload_name="Sales-Copilet-Agents",
-)['workloadAccessToken']
+with ThreadPoolExecutor(max_workers=2) as executor:
+    params_future = executor.submit(get_parameter_values, [
+        "MCP_GATEWAY_URL",
+        "PROVIDER_NAME",
+        "SCOPE",
+        "SC_PRC_HCP_ACESS_FORMULARY_TABLE",
+        "SC_POC_ACTION_TABLE_SCHEMA",
+    ])
+    token_future = executor.submit(
+        identity_client.get_workload_access_token,
+        workload_name="Sales-Copilet-Agents",
+    )
+    _PARAMS = params_future.result()
+    workload_access_token = token_future.result()['workloadAccessToken']
+
+MCP_GATEWAY_URL = _PARAMS["MCP_GATEWAY_URL"]
+OAUTH_PROVIDER_NAME = _PARAMS["PROVIDER_NAME"]
+OAUTH_SCOPE = _parse_scopes(_PARAMS["SCOPE"])
+TABLE_NAME = _PARAMS["SC_PRC_HCP_ACESS_FORMULARY_TABLE"]
+TABLE_SCHEMA_DESCRIPTION = _PARAMS["SC_POC_ACTION_TABLE_SCHEMA"]
+
  
 if workload_access_token:
     BedrockAgentCoreContext.set_workload_access_token(workload_access_token)
@@ -85,16 +120,8 @@ def get_full_tools_list(client):
     return tools
 
 
-def create_agent():
-    """
-    Access Agent for formulary/access intelligence.
-    Role: Provide coverage status updates and actionable opportunities.
-    """
-    access_token = asyncio.run(fetch_m2m_token(access_token=""))
-    mcp_client = MCPClient(lambda: create_streamable_http_transport(MCP_GATEWAY_URL, access_token))
-    mcp_client.__enter__()
-    return Agent(
-        system_prompt=f"""
+# System prompt, built once at import from the SSM configuration above.
+ACCESS_AGENT_PROMPT = f"""
           You are the ACCESS INTELLIGENCE AGENT for pharmaceutical sales.
 
           ROLE: Provide formulary/access intelligence (wins/losses, PA/copay)
@@ -153,7 +180,19 @@ def create_agent():
           If no matching data: {{"status": "error", "message": "No matching data found."}}
 
           IMPORTANT: Your entire response must be ONLY the JSON object above. Do not add any text before or after the JSON.
-        """,
+        """
+
+
+def create_agent():
+    """
+    Access Agent for formulary/access intelligence.
+    Role: Provide coverage status updates and actionable opportunities.
+    """
+    access_token = asyncio.run(fetch_m2m_token(access_token=""))
+    mcp_client = MCPClient(lambda: create_streamable_http_transport(MCP_GATEWAY_URL, access_token))
+    mcp_client.__enter__()
+    return Agent(
+        system_prompt=ACCESS_AGENT_PROMPT,
         tools= get_full_tools_list(mcp_client),
     )
 
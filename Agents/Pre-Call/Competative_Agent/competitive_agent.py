@@ -42,6 +42,7 @@ def get_parameter_value(parameter_name):
 
 BUCKET_TO_READ_DATA = get_parameter_value("SC_CA_BUCKET")
 BUCKET_KEY = get_parameter_value("SC_CA_BUCKET_KEY")
+s3 = boto3.client("s3")
 
 def prepare_numeric_matrix(df: pd.DataFrame) -> Tuple[pd.DataFrame, List[str]]:
     """
@@ -72,7 +73,6 @@ def fetch_competitive_data_s3(bucket: str, key: str) -> Dict[str, Any]:
     Load file from S3. Supports CSV, TSV, XLSX, JSON, PARQUET, ZIP.
     Returns: {status, rows, source, ref}
     """
-    s3 = boto3.client("s3")
     ref = f"s3://{bucket}/{key}"
 
     try:
@@ -1,17 +1,17 @@
 import json
 import logging
 import re
-import os
 import boto3
+from botocore.config import Config
+import numpy as np
 import pandas as pd
-import io
-from typing import List, Any, Dict, Union
-from strands import  tool
-from typing import List, Dict, Any
-from strands import tool
-import logging
-from typing import List, Any, Dict
-from strands import Agent
+import hashlib
+import functools
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Any, Dict, Union, Optional, AsyncIterator
+from strands import Agent, tool
 from strands.models import BedrockModel
 from bedrock_agentcore.runtime import BedrockAgentCoreApp
 from opensearchpy import OpenSearch, RequestsHttpConnection, AWSV4SignerAuth
@@ -25,7 +25,15 @@ from opensearchpy import OpenSearch, RequestsHttpConnection, AWSV4SignerAuth
 REGION = "us-east-1"
 
 app = BedrockAgentCoreApp()
-model = BedrockModel()
+# Shared session and pooled client config for the model, Bedrock and S3
+BOTO_CONFIG = Config(
+    max_pool_connections=50,
+    retries={"max_attempts": 3, "mode": "adaptive"},
+    tcp_keepalive=True,
+)
+boto_session = boto3.Session(region_name=REGION)
+# Streaming lets callers start consuming HCP objects before the last token.
+model = BedrockModel(streaming=True, boto_session=boto_session, boto_client_config=BOTO_CONFIG)
 
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.INFO)
@@ -72,7 +80,11 @@ SALES_COPILOT_INDEX_NAME = get_parameter_value("SALES_COPILOT_INDEX_NAME")
 VECTOR_DIM = int("1024")
 
 # Bedrock client (for embeddings)
-bedrock = boto3.client("bedrock-runtime", region_name=REGION)
+bedrock = boto_session.client("bedrock-runtime", config=BOTO_CONFIG)
+
+# S3 client (for the personalized CSV), created once so repeat downloads reuse
+# its connection pool instead of bootstrapping a new client each time
+s3 = boto_session.client("s3", config=BOTO_CONFIG)
 
 
 def _aoss_client() -> OpenSearch:
@@ -195,83 +207,166 @@ def _is_s3_url(u: str) -> bool:
     """
     return bool(u) and u.startswith("s3://")
 
-def _extract_percent(text: str) -> float:
+# Watch percentage in KOL video summaries, e.g. "Watched 45%"
+_PCT_RE = re.compile(r"(\d{1,3})%")
+
+
+# ----------------------------
+# Personalized CSV cache
+# ----------------------------
+# Downloaded CSVs are kept in memory under a short digest of URL + ETag (the
+# "handle"). The handle is written into the system prompt, so the repeated
+# read_personalized_csv calls the LLM makes during its reasoning loop are
+# served from memory instead of fetching the object from S3 again. Once a
+# handle is older than CSV_ETAG_CHECK_SECONDS a HEAD request compares the
+# ETag, and the CSV is downloaded again only when the object has changed.
+CSV_ETAG_CHECK_SECONDS = 300
+_CSV_CACHE: Dict[str, pd.DataFrame] = {}
+# url -> (handle, etag, monotonic time of the last ETag check)
+_CSV_HANDLES: Dict[str, tuple] = {}
+
+
+def _split_s3_url(url: str) -> tuple:
+    """Split 's3://bucket/key' into (bucket, key)."""
+    if not _is_s3_url(url):
+        raise FileNotFoundError("No CSV found. Provide an S3 URL.")
+    bucket, key = url[len("s3://"):].split("/", 1)
+    return bucket, key
+
+
+def _download_personalized_csv(url: str) -> str:
     """
-    Extract a percentage value from a text string.
+    Download the personalized HCP CSV from S3, cache it and return its handle.
 
     Parameters:
-        text: A string potentially containing a percentage such as 'Watched 45%'.
+        url: S3 URL of the CSV ('s3://bucket/key').
 
     Returns:
-        The numeric percentage as a float (0–100), or 0.0 if no valid
-        percentage is found.
+        The 8-character handle under which the parsed CSV is cached.
     """
-    if not text:
-        return 0.0
+    bucket, key = _split_s3_url(url)
+    print(f"Using S3 for csv file: {url}")
 
-    m = re.search(r"(\d{1,3})%", text)
-    if m:
-        try:
-            return float(m.group(1))
-        except Exception:
-            return 0.0
+    try:
+        obj = s3.get_object(Bucket=bucket, Key=key)
+        # The streaming body is parsed as it is read, so the raw object is
+        # never held in memory next to the DataFrame. dtype=str +
+        # na_filter=False keeps empty cells as "" and skips the NaN scan.
+        df = pd.read_csv(obj["Body"], dtype=str, na_filter=False, engine="c")
+    except s3.exceptions.NoSuchKey:
+        raise FileNotFoundError(f"S3 key not found: s3://{bucket}/{key}")
+    except s3.exceptions.NoSuchBucket:
+        raise FileNotFoundError(f"S3 bucket not found: {bucket}")
+    except Exception as e:
+        raise RuntimeError(f"Error reading S3 CSV: {e}")
+
+    # The ETag identifies the object content, so it stands in for a digest
+    # of the bytes we no longer keep around.
+    etag = obj["ETag"]
+    handle = hashlib.sha1(f"{url}:{etag}".encode("utf-8")).hexdigest()[:8]
+    # Only the latest version of each URL is kept.
+    previous = _CSV_HANDLES.get(url)
+    if previous is not None and previous[0] != handle:
+        _CSV_CACHE.pop(previous[0], None)
+    _CSV_CACHE[handle] = df
+    _CSV_HANDLES[url] = (handle, etag, time.monotonic())
+    return handle
+
+
+def _personalized_csv_handle(url: str) -> str:
+    """
+    Return the cached handle for url, downloading the CSV on first use or
+    when a periodic ETag check shows the S3 object has changed.
+    """
+    entry = _CSV_HANDLES.get(url)
+    if entry is None or entry[0] not in _CSV_CACHE:
+        return _download_personalized_csv(url)
+
+    handle, etag, checked_at = entry
+    if time.monotonic() - checked_at < CSV_ETAG_CHECK_SECONDS:
+        return handle
+
+    bucket, key = _split_s3_url(url)
+    try:
+        current_etag = s3.head_object(Bucket=bucket, Key=key)["ETag"]
+    except Exception as e:
+        # Keep serving the cached copy; the check is retried after the next
+        # interval.
+        logger.warning("ETag check failed for %s: %s", url, e)
+        _CSV_HANDLES[url] = (handle, etag, time.monotonic())
+        return handle
 
-    return 0.0
+    if current_etag != etag:
+        return _download_personalized_csv(url)
+    _CSV_HANDLES[url] = (handle, etag, time.monotonic())
+    return handle
 
 
 @tool
-def read_personalized_csv(HCP_ID: Union[str, List[str], None] = None) -> List[Dict[str, Any]]:
+def read_personalized_csv(
+    HCP_ID: Union[str, List[str], None] = None,
+    handle: Optional[str] = None,
+    columns: Optional[List[str]] = None,
+) -> List[Dict[str, Any]]:
     """
+    Parameters:
+        HCP_ID: One HCP id, a comma-separated string or a list of ids.
+        handle: Data handle given in the system prompt. Known handles are
+            served from memory; unknown or stale ones fall back to the
+            current version of the CSV.
+        columns: Optional list of columns to return (hcp_id is always
+            included). Unknown names are ignored. Defaults to all columns.
+
     Returns:
      
       - Single row (if HCP_ID = "HCP1003")
       - Multiple rows (if HCP_ID = ["HCP1001","HCP1002"])
     """
-    url=get_parameter_value("CS_CONTENT_AGENT_S3_CSV_URL")
-    # --- Load from S3 ---
-    if _is_s3_url(url): # type: ignore
-        print(f"Using S3 for csv file: {url}")
-        without_prefix = url[len("s3://"):]# type: ignore
-        bucket, key = without_prefix.split("/", 1)
-
-        try:
-            s3 = boto3.client("s3", region_name=REGION)
-            obj = s3.get_object(Bucket=bucket, Key=key)
-
-            raw_bytes = obj["Body"].read()
-            df = pd.read_csv(io.BytesIO(raw_bytes), dtype=str)
-            df = df.fillna("")
-
-            # -------------------------------
-            # Apply HCP filtering logic
-            # -------------------------------
-            if HCP_ID is None or HCP_ID == "" or HCP_ID == []:
-                return df.to_dict(orient="records")#type:ignore
-
-            # Convert comma-separated string to list
-            if isinstance(HCP_ID, str):
-                if "," in HCP_ID:
-                    HCP_ID = [x.strip() for x in HCP_ID.split(",")]
-                else:
-                    HCP_ID = [HCP_ID]
-
-            # Filter using the actual column name "hcp_id"
-            filtered_df = df[df["hcp_id"].isin(HCP_ID)]
-
-            return filtered_df.to_dict(orient="records")#type:ignore
-
-        except s3.exceptions.NoSuchKey:
-            raise FileNotFoundError(f"S3 key not found: s3://{bucket}/{key}")
-        except s3.exceptions.NoSuchBucket:
-            raise FileNotFoundError(f"S3 bucket not found: {bucket}")
-        except Exception as e:
-            raise RuntimeError(f"Error reading S3 CSV: {e}")
-
-    raise FileNotFoundError("No CSV found. Provide an S3 URL.")
+    df = _CSV_CACHE.get(handle) if handle else None
+    if df is None:
+        df = _CSV_CACHE[_personalized_csv_handle(CONTENT_AGENT_S3_CSV_URL)]  # type: ignore
+
+    # Project only the requested columns before building the records
+    if columns:
+        wanted = ["hcp_id"] + [c for c in columns if c != "hcp_id"]
+        df = df[[c for c in wanted if c in df.columns]]
+
+    # -------------------------------
+    # Apply HCP filtering logic
+    # -------------------------------
+    if HCP_ID is None or HCP_ID == "" or HCP_ID == []:
+        return df.to_dict(orient="records")#type:ignore
+
+    # Convert comma-separated string to list
+    if isinstance(HCP_ID, str):
+        if "," in HCP_ID:
+            HCP_ID = [x.strip() for x in HCP_ID.split(",")]
+        else:
+            HCP_ID = [HCP_ID]
+
+    # Filter using the actual column name "hcp_id"
+    filtered_df = df[df["hcp_id"].isin(HCP_ID)]
+
+    return filtered_df.to_dict(orient="records")#type:ignore
+
+
+def _hcp_not_found(hcp_id: str) -> Dict[str, Any]:
+    """Result entry for an HCP id that has no activity record."""
+    return {
+        "hcp_id": hcp_id,
+        "rank": None,
+        "score": 0.0,
+        "reason": "HCP id not found",
+        "details": {}
+    }
 
 
 @tool
-def analyze_hcps(records: List[Dict[str, Any]], hcp_ids: List[str]) -> List[Dict[str, Any]]:
+def analyze_hcps(
+    records: Optional[List[Dict[str, Any]]] = None,
+    hcp_ids: Optional[List[str]] = None,
+    handle: Optional[str] = None,
+) -> List[Dict[str, Any]]:
     """
     Analyze, score, and rank HCPs based on their engagement with MOA emails
     and KOL video content.
@@ -289,8 +384,13 @@ def analyze_hcps(records: List[Dict[str, Any]], hcp_ids: List[str]) -> List[Dict
                 - "moa_email_summary": str (e.g., "Opened", "Delivered")
                 - "clicked_kol_video_flag": "Yes" / "No"
                 - "kol_video_summary": str containing a watch percentage like "Watched 43%"
+            Optional: when omitted, the records are read straight from the
+            in-memory CSV identified by handle (preferred - avoids passing the
+            rows returned by read_personalized_csv back in).
         hcp_ids:
             A list of HCP identifiers (string or numeric) that should be evaluated.
+        handle:
+            Data handle given in the system prompt; used when records is omitted.
 
     Scoring Logic:
         - +1.0  if "opened" appears in MOA email summary
@@ -315,71 +415,79 @@ def analyze_hcps(records: List[Dict[str, Any]], hcp_ids: List[str]) -> List[Dict
         A fully ranked list of HCP engagement analyses, sorted by score
         (descending), with missing HCPs appended last.
     """
-    rows = {str(r.get("hcp_id")): r for r in records}
-    results = []
-
-    for h in hcp_ids:
-        h = str(h)
-        r = rows.get(h)
-
-        if not r:
-            results.append({
-                "hcp_id": h,
-                "rank": None,
-                "score": 0.0,
-                "reason": "HCP id not found",
-                "details": {}
-            })
-            continue
+    # Score each HCP once even if the caller repeats ids (order preserved)
+    hcp_ids = list(dict.fromkeys(str(h) for h in hcp_ids or []))
+    fields = ["moa_email_summary", "clicked_kol_video_flag", "kol_video_summary"]
+
+    # Columnar view of the records. Without explicit records the cached CSV
+    # DataFrame is used as is, so no per-row dicts are built on either side.
+    if records is None:
+        df = _CSV_CACHE.get(handle) if handle else None
+        if df is None:
+            df = _CSV_CACHE[_personalized_csv_handle(CONTENT_AGENT_S3_CSV_URL)]  # type: ignore
+        df = df.reindex(columns=["hcp_id"] + fields, fill_value="")
+    else:
+        df = pd.DataFrame(records, columns=["hcp_id"] + fields)
+
+    # Nothing to score: every HCP takes the "not found" entry
+    if df.empty:
+        return [_hcp_not_found(h) for h in hcp_ids]
+
+    # One row per HCP id (last record wins), aligned to the requested ids so
+    # every column lines up with hcp_ids.
+    df["hcp_id"] = df["hcp_id"].astype(str)
+    df = df.drop_duplicates("hcp_id", keep="last").set_index("hcp_id")
+    found = pd.Index(hcp_ids).isin(df.index)
+    if not found.any():
+        return [_hcp_not_found(h) for h in hcp_ids]
+    df = df.reindex(hcp_ids).fillna("").astype(str)
+
+    # Normalize each text column once; every flag below reads these views.
+    moa_norm = df["moa_email_summary"].str.strip().str.lower()
+    opened = moa_norm.str.contains("opened", regex=False).to_numpy()
+    has_moa = moa_norm.ne("").to_numpy()
+    clicked = df["clicked_kol_video_flag"].str.strip().str.lower().eq("yes").to_numpy()
+    details = df[fields].to_dict(orient="records")
+    pct = (
+        df["kol_video_summary"].str.extract(_PCT_RE, expand=False)
+        .astype(float).fillna(0.0).to_numpy()
+    )
 
-        moa = r.get("moa_email_summary", "") or ""
-        clicked = (r.get("clicked_kol_video_flag", "").strip().lower() == "yes")
-        kol_summary = r.get("kol_video_summary", "") or ""
+    scores = (
+        np.where(opened, 1.0, np.where(has_moa, 0.5, 0.0))
+        + np.where(clicked, 2.0, 0.0)
+        + (pct / 100) * 2.0
+    ).round(3)
 
-        score = 0.0
+    def _reason(i: int) -> str:
         reasons = []
-
-        if "opened" in moa.lower():
-            score += 1.0
+        if opened[i]:
             reasons.append("Opened MOA email")
-        elif moa.strip():
-            score += 0.5
+        elif has_moa[i]:
             reasons.append("MOA email interaction")
-
-        if clicked:
-            score += 2.0
+        if clicked[i]:
             reasons.append("Clicked/Watched KOL video")
-
-        pct = _extract_percent(kol_summary)
-        if pct > 0:
-            add = (pct / 100) * 2.0
-            score += add
-            reasons.append(f"KOL video watched {pct}%")
-
-        results.append({
-            "hcp_id": h,
-            "score": round(score, 3),
-            "rank": None,
-            "reason": "; ".join(reasons) if reasons else "No clear engagement",
-            "details": {
-                "moa_email_summary": moa,
-                "clicked_kol_video_flag": r.get("clicked_kol_video_flag", ""),
-                "kol_video_summary": kol_summary,
-            }
-        })
-
-    # Rank by score (descending)
-    ranked = sorted(
-        [x for x in results if x["reason"] != "HCP id not found"],
-        key=lambda z: z["score"],
-        reverse=True
-    )
-
-    for i, item in enumerate(ranked, start=1):
-        item["rank"] = i
+        if pct[i] > 0:
+            reasons.append(f"KOL video watched {pct[i]}%")
+        return "; ".join(reasons) if reasons else "No clear engagement"
+
+    # Rank found HCPs by score (descending); the stable sort keeps the
+    # requested order for ties. Results are built directly in rank order.
+    found_idx = np.flatnonzero(found)
+    order = found_idx[np.argsort(-scores[found_idx], kind="stable")]
+    ranked = [
+        {
+            "hcp_id": hcp_ids[i],
+            "score": float(scores[i]),
+            "rank": rank,
+            "reason": _reason(i),
+            "details": details[i],
+        }
+        for rank, i in enumerate(order, start=1)
+    ]
 
     # Append missing HCPs
-    not_found = [x for x in results if x["reason"] == "HCP id not found"]
+    not_found = [_hcp_not_found(h) for h, ok in zip(hcp_ids, found) if not ok]
 
     return ranked + not_found
 
@@ -387,8 +495,13 @@ def analyze_hcps(records: List[Dict[str, Any]], hcp_ids: List[str]) -> List[Dict
 # ----------------------------
 # Tools
 # ----------------------------
+# Built once at import; the decorated tools carry their specs, so every agent
+# built from this tuple (one per concurrent query) reuses them as-is.
+CONTENT_TOOLS = (read_personalized_csv, analyze_hcps, rag_lookup)
+
+
 def _tools_list() -> List[Any]:
-    return [read_personalized_csv, analyze_hcps,rag_lookup]
+    return list(CONTENT_TOOLS)
 
 # ----------------------------
 # Content Agent Prompt
@@ -400,16 +513,36 @@ def create_content_agent() -> Agent:
     """
     s3_url = CONTENT_AGENT_S3_CSV_URL or "<S3_CSV_URL_NOT_CONFIGURED>"
 
-    system_prompt = f"""
+    # Load the CSV once up front so its handle can be embedded in the prompt.
+    csv_handle = ""
+    if CONTENT_AGENT_S3_CSV_URL:
+        try:
+            csv_handle = _personalized_csv_handle(CONTENT_AGENT_S3_CSV_URL)
+        except Exception as e:
+            logging.error(f"[create_content_agent] CSV preload failed: {e}")
+
+    return Agent(
+        system_prompt=_content_system_prompt(s3_url, csv_handle),
+        tools=_tools_list(),
+        model=model,
+    )
+
+
+@functools.lru_cache(maxsize=8)
+def _content_system_prompt(s3_url: str, csv_handle: str) -> str:
+    """System prompt for the given CSV location/handle, built once per handle."""
+    return f"""
     You are Content-Agent, an expert MOA & KOL engagement analyzer.
 
     DATA LOCATION:
     - The personalized HCP CSV is stored at:
       S3_URL = "{s3_url}"
+    - The CSV is already loaded in memory under:
+      DATA_HANDLE = "{csv_handle}"
 
     TOOLS:
-    - read_personalized_csv(HCP_ID)
-    - analyze_hcps(records, hcp_ids)
+    - read_personalized_csv(HCP_ID, handle, columns=None)
+    - analyze_hcps(records=None, hcp_ids, handle)
     - rag_lookup(query, top_k=5)
 
     DATA SOURCES & CITATIONS:
@@ -446,8 +579,12 @@ def create_content_agent() -> Agent:
         details.hcp_data_source = {{ "type": "s3_csv", "uri": "{s3_url}" }}
 
     Your workflow:
-    1. Call read_personalized_csv(...) using S3_URL from the instructions.
-    2. Select relevant hcp_ids and call analyze_hcps(...).
+    1. Call read_personalized_csv(HCP_ID, handle=DATA_HANDLE). Always pass
+       DATA_HANDLE back unchanged; never pass the S3 URL. When you only need
+       the engagement fields for scoring, pass
+       columns=["moa_email_summary", "clicked_kol_video_flag", "kol_video_summary"].
+    2. Select relevant hcp_ids and call analyze_hcps(hcp_ids=..., handle=DATA_HANDLE).
+       Do not pass records; the tool reads them from the loaded CSV.
     3. If the user needs MOA/KOL/disease details or content suggestions, call rag_lookup(...).
     4. Build the final JSON.
 
@@ -482,37 +619,110 @@ def create_content_agent() -> Agent:
     Return ONLY the JSON array, no extra text.
     """
 
-    return Agent(
-        system_prompt=system_prompt,
-        tools=_tools_list(),
-        model=model,
-    )
-
 
 agent = create_content_agent()
+_agent_csv_handle = _CSV_HANDLES.get(CONTENT_AGENT_S3_CSV_URL, ("",))[0]
+
+
+def _current_agent() -> Agent:
+    """Return the shared agent, rebuilt when its prompt's CSV handle is stale."""
+    global agent, _agent_csv_handle
+    handle = _agent_csv_handle
+    if CONTENT_AGENT_S3_CSV_URL:
+        try:
+            handle = _personalized_csv_handle(CONTENT_AGENT_S3_CSV_URL)
+        except Exception as e:
+            logger.warning("CSV refresh failed, keeping current agent: %s", e)
+    if handle != _agent_csv_handle:
+        agent = create_content_agent()
+        _agent_csv_handle = handle
+    return agent
+
+
+async def stream_hcp_objects(instruction: str) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Stream the agent's JSON array output and yield each HCP object as soon
+    as it is fully formed, instead of waiting for the final token.
+
+    The agent is instructed to return a bare JSON array, so every complete
+    top-level element can be decoded with ``raw_decode`` while the rest of
+    the array is still being generated.
+    """
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = -1  # index just after the opening '[' once it has been seen
+
+    async for event in _current_agent().stream_async(instruction):
+        text = event.get("data") if isinstance(event, dict) else None
+        if not text:
+            continue
+        buf += text
+
+        if pos < 0:
+            start = buf.find("[")
+            if start < 0:
+                continue
+            pos = start + 1
+
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos >= len(buf) or buf[pos] == "]":
+                break
+            try:
+                obj, pos = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError:
+                # Element not complete yet; wait for more tokens.
+                break
+            yield obj
 
 
 # ----------------------------
 # AgentCore entrypoint
 # ----------------------------
 @app.entrypoint
-def run_main_agent(payload: dict = {}) -> Dict[str, Any]:
+def run_main_agent(payload: dict = {}):
     """
     Entrypoint for Bedrock AgentCore.
 
     payload example:
     {{
-      "prompt": "Given HCP1000 provide approved materials"
+      "prompt": "Given HCP1000 provide approved materials",
+      "stream": true
     }}
+
+    With "stream": true the HCP objects are streamed one by one as they are
+    generated; otherwise the full agent result is returned at the end.
     """
     instruction = payload.get(
         "prompt", "Given HCP1000 provide approved materials"
     )
-    agent_result = agent(instruction)  # type: ignore
+    if payload.get("stream"):
+        return stream_hcp_objects(instruction)
+
+    agent_result = _current_agent()(instruction)  # type: ignore
 
     return agent_result
 
 
+def run_queries_concurrently(queries: List[str]) -> List[Any]:
+    """
+    Run several independent prompts concurrently for local testing.
+
+    Each call is dominated by Bedrock I/O, so they are fired from a thread
+    pool. A Strands Agent keeps per-conversation state and must not be
+    invoked from several threads at once, so every query gets its own agent.
+    """
+    with ThreadPoolExecutor(max_workers=max(1, min(3, len(queries)))) as ex:
+        futs = [ex.submit(lambda q: create_content_agent()(q), q) for q in queries]
+        return [f.result() for f in futs]
+
+
 if __name__ == "__main__":
-    app.run()
-    #run_main_agent()
+    # `python content_agent.py "<prompt>" ["<prompt>" ...]` runs the prompts
+    # locally in parallel; without arguments the AgentCore server starts.
+    if len(sys.argv) > 1:
+        for result in run_queries_concurrently(sys.argv[1:]):
+            print(result)
+    else:
+        app.run()
@@ -103,20 +103,22 @@ def get_full_tools_list(client):
     return tools
 
 
-def create_history_agent() -> Agent:
-    """
-    LLM-based History Agent:
-    - Interprets natural language history questions
-    - Calls execute_redshift_sql
-    - Returns ONLY raw JSON (tool output)
+def _schema_columns(schema_description: str) -> list[str]:
+    """Split the schema description from SSM into one column spec per entry.
+
+    The parameter is a single string (one column per line, or comma
+    separated), so it must not be passed to str.join directly.
     """
-    access_token = asyncio.run(fetch_m2m_token(access_token=""))
-    mcp_client = MCPClient(
-        lambda: create_streamable_http_transport(MCP_GATEWAY_URL, access_token)
-    )
-    mcp_client.__enter__()
-    return Agent(
-        system_prompt=f"""
+    if not schema_description:
+        return []
+    sep = "\n" if "\n" in schema_description.strip() else ","
+    return [c.strip() for c in schema_description.split(sep) if c.strip()]
+
+
+_SCHEMA_BLOCK = "\n            ".join(_schema_columns(SCHEMA_DISCRIPTION))
+
+# Built once at import; every agent instance shares the same prompt string.
+HISTORY_AGENT_PROMPT = f"""
         You are the **History Agent** in a multi-agent Sales Copilot system.
  
         Your job:
@@ -126,13 +128,15 @@ def create_history_agent() -> Agent:
         Rules:
             1. The table name is {TABLE_NAME}.
             2. You must only use these allowed columns:
-            {", ".join(SCHEMA_DISCRIPTION)}
+            {_SCHEMA_BLOCK}
             3. Always produce a valid Redshift SQL query.
             4. Never guess values not mentioned. If value is unclear, use placeholders:
                 {{value}}
             5. stored this SQL query in the variable `sql_query`.
             6. Pass created SQL query to the tool `execute_redshift_sql(sql_query)` for execution.
-            7. If user asks for something impossible with the schema, return:
+            7. Never emit `SELECT *`; always enumerate only the columns the user asked for.
+            8. Always end row-returning queries with `LIMIT 50` (or a smaller limit if the user asks for fewer rows).
+            9. If user asks for something impossible with the schema, return:
             {{
                 "sql_query": "UNSUPPORTED_QUERY"
             }}
@@ -148,13 +152,29 @@ def create_history_agent() -> Agent:
         - Include the data source table name also from where the data fetched
  
         Query Patterns:
-        - For general retrieval: SELECT * FROM {TABLE_NAME} LIMIT 50;
-        - For filtering: SELECT * FROM {TABLE_NAME} WHERE <condition>;
+        - For general retrieval: SELECT <explicit columns only> FROM {TABLE_NAME} LIMIT 50;
+        - For filtering: SELECT <explicit columns only> FROM {TABLE_NAME} WHERE <condition> LIMIT 50;
         - For sorting: ORDER BY <column> ASC/DESC;
         - For aggregations: SELECT <col>, COUNT(*) FROM {TABLE_NAME} GROUP BY <col>;
         - Multi-condition: Use AND / OR explicitly.
  
-    """,
+    """
+
+
+def create_history_agent() -> Agent:
+    """
+    LLM-based History Agent:
+    - Interprets natural language history questions
+    - Calls execute_redshift_sql
+    - Returns ONLY raw JSON (tool output)
+    """
+    access_token = asyncio.run(fetch_m2m_token(access_token=""))
+    mcp_client = MCPClient(
+        lambda: create_streamable_http_transport(MCP_GATEWAY_URL, access_token)
+    )
+    mcp_client.__enter__()
+    return Agent(
+        system_prompt=HISTORY_AGENT_PROMPT,
         tools=get_full_tools_list(mcp_client),
     )
 
@@ -1,9 +1,20 @@
 import os
-import json
+import orjson
 import re
+import time
 import asyncio
+import hashlib
+import functools
+import threading
+import uuid
 import boto3
+import numpy as np
+import sqlglot
+from sqlglot import exp
+from dataclasses import dataclass, field, fields, is_dataclass
+from typing import Any
 
+from pydantic import BaseModel, Field
 from strands import Agent
 from bedrock_agentcore.runtime import BedrockAgentCoreApp, BedrockAgentCoreContext
 from bedrock_agentcore.services.identity import IdentityClient
@@ -48,13 +59,32 @@ def _parse_scopes(s: str) -> list[str]:
     return [p for p in parts if p]
 
 
-HCP_SCHEMA_COLUMNS = get_parameter_value("SC_HCP_SCHEMA_COLUMNS")
+def _parse_columns(s: str) -> tuple[str, ...]:
+    if not s:
+        return ()
+    parts = re.split(r"[,\n]+", s.strip())
+    return tuple(p.strip() for p in parts if p.strip())
+
+
+# The SSM value is a single comma/newline separated string; split it once into
+# an immutable tuple (joining the raw string would interleave ", " between its
+# characters). The prompt's column lists are joined once further below.
+HCP_SCHEMA_COLUMNS = _parse_columns(get_parameter_value("SC_HCP_SCHEMA_COLUMNS"))
+HCP_SCHEMA_COLUMNS_SET = frozenset(HCP_SCHEMA_COLUMNS)
 MCP_GATEWAY_URL = get_parameter_value("MCP_GATEWAY_URL")
 OAUTH_PROVIDER_NAME = get_parameter_value("PROVIDER_NAME")
 OAUTH_SCOPE = _parse_scopes(get_parameter_value("SCOPE"))
-ALLOWED_COLUMNS = get_parameter_value("SC_HCP_SCHEMA_COLUMNS")
 PRISCRIPTION_HISTORY_TABLR_NAME = get_parameter_value("SC_PRC_HCP_TABLE")
 DATABASE_NAME = get_parameter_value("SC_RS_DATABASE")
+# Optional narrow materialized view used for single-HCP lookups, e.g.
+#   CREATE MATERIALIZED VIEW mv_prescribing_snapshot
+#   DISTKEY(hcp_id) SORTKEY(hcp_id) AUTO REFRESH YES AS
+#   SELECT <PRESCRIBING_COLUMNS> FROM <SC_PRC_HCP_TABLE>;
+# When the parameter is not set, every query runs against SC_PRC_HCP_TABLE.
+PRESCRIBING_SNAPSHOT_VIEW = get_parameter_value("SC_PRC_HCP_SNAPSHOT_VIEW")
+BEDROCK_EMBED_MODEL = get_parameter_value("SALES_COPILOT_BEDROCK_EMBED_MODEL")
+
+bedrock_client = boto3.client("bedrock-runtime", region_name="us-east-1")
 
 # ---------------------------------------------------
 # 1) Identity & Access Bootstrap
@@ -103,133 +133,582 @@ def get_full_tools_list(client):
 
 
 # ----------------------
-# Agent prompt: instructs how to build SQL from NLQ and what final JSON to produce
+# Output shaping: prescribing rows -> final JSON (deterministic, no LLM)
+# ----------------------
+ADOPTION_STAGE_LABELS = (
+    "Aware / Non-user",
+    "Considering",
+    "Trialing",
+    "Adopting",
+    "Champion",
+    "Regular User",
+)
+
+# Columns build_prescribing_json reads; the SQL agent always selects these
+PRESCRIBING_COLUMNS = (
+    "hcp_id", "first_name", "last_name", "specialty",
+    "trx_7d", "trx_28d", "trx_90d",
+    "nrx_7d", "nrx_28d", "nrx_90d", "nbrx_28d",
+    "trx_28d_wow_pct", "trx_90d_qoq_pct", "nbrx_28d_rate",
+    "gap_to_goal_28d", "potential_uplift_index",
+    "churn_risk_score", "receptivity_score",
+    "adoption_stage_ordinal", "prescribing_freshness_days",
+)
+# Required columns the table actually has (all of them if the schema list is
+# unavailable), joined once for the prompt
+_PRESCRIBING_SELECT_COLUMNS = tuple(
+    c for c in PRESCRIBING_COLUMNS
+    if not HCP_SCHEMA_COLUMNS_SET or c in HCP_SCHEMA_COLUMNS_SET
+)
+_PRESCRIBING_COLUMNS_CSV = ", ".join(_PRESCRIBING_SELECT_COLUMNS)
+# The rest of the allowed columns, so no column name appears in the prompt twice
+_OTHER_COLUMNS_CSV = ", ".join(c for c in HCP_SCHEMA_COLUMNS if c not in PRESCRIBING_COLUMNS)
+
+
+def _adoption_stage_label(value):
+    """Label for adoption_stage_ordinal (0-5); None when missing or out of range."""
+    try:
+        stage = int(value)
+    except (TypeError, ValueError):
+        return None
+    # Explicit bounds check: a negative ordinal must not index from the end
+    return ADOPTION_STAGE_LABELS[stage] if 0 <= stage < len(ADOPTION_STAGE_LABELS) else None
+
+
+def _label(text):
+    """Dataclass field carrying the key it is published under in the JSON."""
+    return field(metadata={"label": text})
+
+
+# Slotted records built per row; they are turned into the labelled JSON dict
+# only once, at the entrypoint boundary (prescribing_to_dict).
+@dataclass(slots=True)
+class PrescribingVolume:
+    last_7: Any = _label("Last 7 days")
+    last_28: Any = _label("Last 28 days")
+    last_90: Any = _label("Last 90 days")
+
+
+@dataclass(slots=True)
+class NewRx:
+    last_7: Any = _label("Last 7 days")
+    last_28: Any = _label("Last 28 days")
+    last_90: Any = _label("Last 90 days")
+    nbrx_28: Any = _label("New-to-Brand Prescriptions in last 28 days")
+
+
+@dataclass(slots=True)
+class Momentum:
+    trx_28d_wow_pct: Any = _label("Week-Over-Week % Change in TRx in last 28 days")
+    trx_90d_qoq_pct: Any = _label("Quarter-Over-Quarter % Change in TRx in last 90 days")
+    nbrx_28d_rate: Any = _label("New-to-Brand Rate in last 28 days")
+
+
+@dataclass(slots=True)
+class Opportunity:
+    gap_to_goal_28d: Any = _label("Gap to Monthly Prescription Goal")
+    potential_uplift_index: Any = _label("Potential Uplift Score")
+
+
+@dataclass(slots=True)
+class Risk:
+    churn_risk_score: Any = _label("Churn Risk Score")
+    receptivity_score: Any = _label("Receptivity Score")
+
+
+@dataclass(slots=True)
+class PrescribingBlock:
+    volume: PrescribingVolume = _label("Total Prescriptions(volume)")
+    new_rx: NewRx = _label("New Prescriptions(new_rx)")
+    momentum: Momentum = _label("Direction & Speed of change Prescriptions (momentum)")
+    opportunity: Opportunity = _label("Growth Potential (opportunity)")
+    risk: Risk = _label("Risk")
+    adoption_stage: Any = _label("Brand adoption journey")
+
+
+@dataclass(slots=True)
+class PrescribingRecord:
+    hcp_id: Any = _label("HcpId")
+    doctor_name: Any = _label("Doctor Name")
+    specialty: Any = _label("Specialty")
+    prescribing: PrescribingBlock = _label("Prescribing")
+    source: Any = _label("Source")
+    freshness_days: Any = _label("Data freshness (days)")
+
+
+@functools.lru_cache(maxsize=None)
+def _field_labels(cls) -> tuple:
+    return tuple((f.name, f.metadata["label"]) for f in fields(cls))
+
+
+def _labelled(obj) -> dict:
+    out = {}
+    for name, label in _field_labels(type(obj)):
+        value = getattr(obj, name)
+        out[label] = _labelled(value) if is_dataclass(value) else value
+    return out
+
+
+def prescribing_to_dict(record: PrescribingRecord) -> dict:
+    """Labelled JSON dict for a PrescribingRecord (freshness omitted when unknown)."""
+    result = _labelled(record)
+    if record.freshness_days is None:
+        del result["Data freshness (days)"]
+    return result
+
+
+def build_prescribing_json(row: dict) -> PrescribingRecord:
+    """Map one prescribing row to the record behind the prescribing JSON."""
+    get = row.get
+    name = ", ".join(str(row[k]) for k in ("first_name", "last_name") if get(k))
+    return PrescribingRecord(
+        get("hcp_id"),
+        name or None,
+        get("specialty"),
+        PrescribingBlock(
+            PrescribingVolume(get("trx_7d"), get("trx_28d"), get("trx_90d")),
+            NewRx(get("nrx_7d"), get("nrx_28d"), get("nrx_90d"), get("nbrx_28d")),
+            Momentum(get("trx_28d_wow_pct"), get("trx_90d_qoq_pct"), get("nbrx_28d_rate")),
+            Opportunity(get("gap_to_goal_28d"), get("potential_uplift_index")),
+            Risk(get("churn_risk_score"), get("receptivity_score")),
+            _adoption_stage_label(get("adoption_stage_ordinal")),
+        ),
+        PRISCRIPTION_HISTORY_TABLR_NAME,
+        get("prescribing_freshness_days"),
+    )
+
+
+# ----------------------
+# Agent prompt: instructs how to build SQL from NLQ (the JSON is shaped in Python)
 # ----------------------
 PRESCRIBING_AGENT_PROMPT = f"""
-You are the PrescribingAgent.
-
-Your job: given a natural-language query (NLQ) about prescribing or a request to "prepare prescribing intelligence" for an HCP,
-you must:
-  1) Convert the NLQ to a single, safe SQL statement that queries the Redshift Serverless table {PRISCRIPTION_HISTORY_TABLR_NAME} in {DATABASE_NAME}`.
-  2) Use ONLY the allowed columns list embedded in your prompt (no other columns, no metadata).
-  3) Always include a LIMIT clause when fetching multiple rows (use LIMIT {DEFAULT_SQL_LIMIT} unless NLQ specifies otherwise).
-  4) Call the tool `execute_redshift_sql(sql_query, return_results=True)` to execute the SQL.
-  5) Transform the returned rows into a single prescribing JSON object (schema defined below).
-  6) Output ONLY the final JSON object - no SQL, no logs, no explanations.
-
-Allowed columns (use only these):
-{', '.join(ALLOWED_COLUMNS)}
-
---- WORKFLOW ---
-STEP A:  From the NLQ, generate a safe SQL query that uses only the allowed columns:
-    1. The table name is `{PRISCRIPTION_HISTORY_TABLR_NAME}`.
-    2. You must only use these allowed columns:
-    {", ".join(ALLOWED_COLUMNS)}
-    3. Always produce a valid PostgreSQL SQL query.
+You are the PrescribingAgent SQL writer.
+
+Convert the natural-language query (NLQ) into a single, safe SQL statement against the
+Redshift Serverless table `{PRISCRIPTION_HISTORY_TABLR_NAME}` in `{DATABASE_NAME}` and return it as `sql_query`.
+
+Rules:
+    1. For HCP-level questions, always select these columns:
+    {_PRESCRIBING_COLUMNS_CSV}
+    2. Other columns you may use if the NLQ needs them (no columns outside rules 1-2):
+    {_OTHER_COLUMNS_CSV}
+    3. Always produce a valid PostgreSQL SQL query. Never use SELECT *.
     4. Never guess values not mentioned. If value is unclear, use placeholders:
         {{value}}
-    5. Just select specific columns needed to answer the prompt, do NOT use SELECT *.
-    6. stored this SQL query in the variable `sql_query`.
-  If the NLQ asks for aggregated or territory-level results, generate appropriate SQL but do not exceed LIMIT {DEFAULT_SQL_LIMIT} for row results and only use columns above.
-
-STEP B: After getting rows from execute_redshift_sql:
-  - If no rows returned: return JSON:
-    {{ "error": "No prescribing data found for the requested filters." }}
-  - If a single row returned: compute the following prescribing block (use values directly or compute derived fields):
-    prescribing {{
-      Total Prescriptions(volume): {{ Last 7 days (trx_7d), Last 28 days (trx_28d), Last 90 days (trx_90d) }},
-      New Prescriptions(new_rx): {{ Last 7 days (nrx_7d), Last 28 days (nrx_28d), Last 90 days (nrx_90d), New-to-Brand Prescriptions in last 28 days (nbrx_28d) }},
-      Direction & Speed of change Prescriptions (momentum): {{ Week-Over-Week % Change in TRx in last 28 days (Total Prescriptions) (trx_28d_wow_pct), Quarter-Over-Quarter % Change in TRx in last 90 days (trx_90d_qoq_pct), New-to-Brand Rate in last 28 days (nbrx_28d_rate) }},
-      pattern_classification: "<growing|declining|stable>",
-      adoption_stage: brand adoption journey (adoption_stage_ordinal),
-      Growth Potential (opportunity): {{ Gap to Monthly Prescription Goal (gap_to_goal_28d), Potential Uplift Score (potential_uplift_index) }},
-      risk: {{ Probability the HCP will reduce or stop prescribing your brand in the next period (churn_risk_score), How open the HCP is expected to be to your next interaction (receptivity_score) }}
-    }}
-
-STEP C: Output ONLY the final JSON object with top-level keys:
-- Always return only the final JSON as mentioned below and user readable short summary based on Prompt.
-- Include the data source table name also from where the data fetched
-  {{
-    "HcpId": "<id>",
-    "Doctor Name":"<first_name, last_name>",
-    "Specialty":"<specialty>",
-    "Prescribing": {{
-      Total Prescriptions(volume): {{ Last 7 days (trx_7d), Last 28 days (trx_28d), Last 90 days (trx_90d) }},
-      New Prescriptions(new_rx): {{ Last 7 days (nrx_7d), Last 28 days (nrx_28d), Last 90 days (nrx_90d), New-to-Brand Prescriptions in last 28 days (nbrx_28d) }},
-      Direction & Speed of change Prescriptions (momentum): {{ Week-Over-Week % Change in TRx in last 28 days (Total Prescriptions) (trx_28d_wow_pct), Quarter-Over-Quarter % Change in TRx in last 90 days (trx_90d_qoq_pct), New-to-Brand Rate in last 28 days (nbrx_28d_rate) }},
-      Growth Potential (opportunity): {{ Gap to Monthly Prescription Goal (gap_to_goal_28d), Potential Uplift Score (potential_uplift_index) }},
-      Risk: {{ Probability the HCP will reduce or stop prescribing your brand in the next period (churn_risk_score), How open the HCP is expected to be to your next interaction (receptivity_score) }},
-      Brand adoption journey: "<adoption_stage_ordinal> (0: "Aware / Non-user", 1: "Considering", 2: "Trialing", 3: "Adopting", 4: "Champion", 5: "Regular User") Just print labels"
-    }}
-  }}
-
-
---- Query Patterns ---
-- For general retrieval: SELECT * FROM {PRISCRIPTION_HISTORY_TABLR_NAME} LIMIT 50;
-- For filtering: SELECT * FROM {PRISCRIPTION_HISTORY_TABLR_NAME} WHERE <condition>;
-- For sorting: ORDER BY <column> ASC/DESC;
-- For aggregations: SELECT <col>, COUNT(*) FROM {PRISCRIPTION_HISTORY_TABLR_NAME} GROUP BY <col>;
-- Multi-condition: Use AND / OR explicitly.
-
---- SAFETY & CONSTRAINTS ---
-- Never leak raw SQL in agent output.
-- Never call tools other than execute_redshift_sql.
-- If returned data is stale (prescribing_freshness_days is large), include that value in the JSON but do not append commentary.
+    5. Always include a LIMIT clause (use LIMIT {DEFAULT_SQL_LIMIT} unless the NLQ specifies otherwise).
+    6. Multi-condition filters: use AND / OR explicitly; sorting: ORDER BY <column> ASC/DESC.
+    7. If the NLQ asks for an average, total, count, a breakdown by territory/specialty or a
+       top N, emit a single aggregate SQL (SUM / AVG / COUNT with GROUP BY, or ORDER BY ... LIMIT N /
+       RANK() OVER) so Redshift does the aggregation; do not return the individual rows.
+"""
 
 
-"""
+class PrescribingSQL(BaseModel):
+    """SQL generated for a prescribing NLQ."""
+    sql_query: str = Field(description="Single PostgreSQL SELECT statement answering the NLQ")
 
 
-def create_prescribing_agent():
+# ----------------------
+# SQL validation: reject bad SQL locally instead of paying a Redshift round trip
+# ----------------------
+SQL_REPAIR_ATTEMPTS = 1
+_PRESCRIBING_TABLE = (PRISCRIPTION_HISTORY_TABLR_NAME or "").split(".")[-1].lower()
+_ALLOWED_COLUMN_NAMES = frozenset(c.lower() for c in HCP_SCHEMA_COLUMNS_SET)
+_SNAPSHOT_COLUMN_NAMES = frozenset(PRESCRIBING_COLUMNS)
+_TABLE_COLUMN_NAMES = _ALLOWED_COLUMN_NAMES | _SNAPSHOT_COLUMN_NAMES
+# NLQs whose answer must be aggregated (or ranked) in Redshift, not in the agent
+_AGGREGATE_NLQ_RE = re.compile(
+    r"\b(?:average|avg|mean|total|sum|count|how many|(?:by|per) (?:territory|specialty|region))\b",
+    re.IGNORECASE,
+)
+_RANKING_NLQ_RE = re.compile(r"\b(?:top \d+|rank(?:ed|ing)?)\b", re.IGNORECASE)
+
+
+def validate_prescribing_sql(sql_query: str, nlq: str = "") -> tuple[str, str | None]:
+    """Check generated SQL against the prescribing table and allowed columns.
+
+    Row queries without a LIMIT get LIMIT DEFAULT_SQL_LIMIT appended;
+    single-HCP lookups are limited to one row. Cohort-level NLQs (totals,
+    averages, top N) must be answered by an aggregate/ranked query.
+
+    Returns:
+        (sql, error): the SQL to run and None, or the SQL as given and a
+        message describing what the agent must fix.
+    """
+    try:
+        tree = sqlglot.parse_one(sql_query, read="redshift")
+    except sqlglot.errors.ParseError as e:
+        return sql_query, f"SQL could not be parsed: {e}"
+    if not isinstance(tree, exp.Select):
+        return sql_query, "Only a single SELECT statement is allowed."
+    # SELECT * / t.* (COUNT(*) sits inside a function and is not matched here)
+    if any(isinstance(e, exp.Star) or (isinstance(e, exp.Column) and e.is_star) for e in tree.expressions):
+        return sql_query, "SELECT * is not allowed; list only the columns you need."
+
+    ctes = {cte.alias_or_name.lower() for cte in tree.find_all(exp.CTE)}
+    tables = {t.name.lower() for t in tree.find_all(exp.Table)} - ctes
+    if _PRESCRIBING_TABLE and tables - {_PRESCRIBING_TABLE}:
+        return sql_query, (
+            f"Unknown table(s) {', '.join(sorted(tables - {_PRESCRIBING_TABLE}))}; "
+            f"query only {PRISCRIPTION_HISTORY_TABLR_NAME}."
+        )
+
+    aliases = {a.alias.lower() for a in tree.find_all(exp.Alias)}
+    columns = {c.name.lower() for c in tree.find_all(exp.Column)} - aliases
+    if _ALLOWED_COLUMN_NAMES and columns - _ALLOWED_COLUMN_NAMES:
+        return sql_query, (
+            f"Unknown column(s) {', '.join(sorted(columns - _ALLOWED_COLUMN_NAMES))}; "
+            "use only the allowed columns."
+        )
+
+    is_aggregate = tree.args.get("group") is not None or tree.find(exp.AggFunc) is not None
+    is_single_hcp = _is_single_hcp_lookup(tree)
+    if nlq and not is_single_hcp:
+        is_ranked = tree.find(exp.Window) is not None or (
+            tree.args.get("order") is not None and tree.args.get("limit") is not None
+        )
+        if _AGGREGATE_NLQ_RE.search(nlq) and not (is_aggregate or tree.find(exp.Window)):
+            return sql_query, (
+                "The question asks for a total/average/grouping; compute it in SQL with "
+                "SUM/AVG/COUNT and GROUP BY instead of returning rows."
+            )
+        if _RANKING_NLQ_RE.search(nlq) and not (is_ranked or is_aggregate):
+            return sql_query, (
+                "The question asks for a top N / ranking; use ORDER BY with LIMIT N "
+                "or RANK() OVER in SQL instead of returning all rows."
+            )
+    if not is_aggregate and is_single_hcp:
+        # Point lookups that only touch snapshot columns read the sorted,
+        # narrow view instead of the wide base table
+        if PRESCRIBING_SNAPSHOT_VIEW and columns <= _SNAPSHOT_COLUMN_NAMES:
+            for table in [t for t in tree.find_all(exp.Table) if t.name.lower() == _PRESCRIBING_TABLE]:
+                view = exp.to_table(PRESCRIBING_SNAPSHOT_VIEW)
+                if table.args.get("alias"):
+                    view.set("alias", table.args["alias"])
+                table.replace(view)
+        # build_prescribing_json only needs the one row; don't ship up to
+        # DEFAULT_SQL_LIMIT rows back through the Data API and the gateway
+        sql_query = tree.limit(1).sql(dialect="redshift")
+    elif tree.args.get("limit") is None and not is_aggregate:
+        sql_query = tree.limit(DEFAULT_SQL_LIMIT).sql(dialect="redshift")
+    return sql_query, None
+
+
+def _is_single_hcp_lookup(tree: exp.Select) -> bool:
+    """True when the WHERE clause pins hcp_id to one literal value."""
+    where = tree.args.get("where")
+    if where is None:
+        return False
+    return any(
+        isinstance(eq.left, exp.Column) and eq.left.name.lower() == "hcp_id"
+        and isinstance(eq.right, exp.Literal)
+        for eq in where.find_all(exp.EQ)
+    ) and where.find(exp.Or) is None
+
+
+# The agent and the MCP session are built on first use rather than at import,
+# so a cold start pays for them only when a prescribing request arrives.
+@functools.lru_cache(maxsize=1)
+def _get_mcp_session():
+    """Open the MCP gateway session once; returns (client, execute_redshift_sql tool name)."""
     access_token = asyncio.run(fetch_m2m_token(access_token=""))
     mcp_client = MCPClient(
         lambda: create_streamable_http_transport(MCP_GATEWAY_URL, access_token)
     )
     mcp_client.__enter__()
-    return Agent(
-        system_prompt=PRESCRIBING_AGENT_PROMPT,
-        tools=get_full_tools_list(mcp_client),
+    # Gateway tool names carry a target prefix ("<target>___execute_redshift_sql")
+    tool_name = next(
+        (t.mcp_tool.name for t in get_full_tools_list(mcp_client)
+         if t.mcp_tool.name.endswith("execute_redshift_sql")),
+        "execute_redshift_sql",
+    )
+    return mcp_client, tool_name
+
+
+def create_prescribing_agent():
+    return Agent(system_prompt=PRESCRIBING_AGENT_PROMPT)
+
+
+@functools.lru_cache(maxsize=1)
+def _get_agent():
+    return create_prescribing_agent()
+
+
+# Distinct NLQs often produce the same SQL; results are reused for a short
+# time, keyed on the SQL as regenerated by sqlglot (so whitespace and keyword
+# casing differences map to the same entry).
+SQL_RESULT_CACHE_TTL_SECONDS = int(os.getenv("SQL_RESULT_CACHE_TTL_SECONDS", "300"))
+SQL_RESULT_CACHE_MAXSIZE = int(os.getenv("SQL_RESULT_CACHE_MAXSIZE", "256"))
+_sql_result_cache = {}
+_sql_result_cache_lock = threading.Lock()
+
+
+def _sql_cache_key(sql_query: str) -> str:
+    try:
+        normalized = sqlglot.parse_one(sql_query, read="redshift").sql(dialect="redshift")
+    except sqlglot.errors.ParseError:
+        normalized = " ".join(sql_query.split())
+    return hashlib.blake2b(normalized.encode("utf-8"), digest_size=16).hexdigest()
+
+
+def execute_redshift_sql(sql_query: str) -> dict:
+    """Run SQL (or reuse a recent identical result) and return the executor's body."""
+    key = _sql_cache_key(sql_query)
+    now = time.monotonic()
+    with _sql_result_cache_lock:
+        entry = _sql_result_cache.get(key)
+        if entry is not None and entry[0] >= now:
+            return entry[1]
+
+    response = _execute_redshift_sql_uncached(sql_query)
+    if response.get("status") == "finished":
+        with _sql_result_cache_lock:
+            _sql_result_cache.pop(key, None)
+            while len(_sql_result_cache) >= SQL_RESULT_CACHE_MAXSIZE:
+                del _sql_result_cache[next(iter(_sql_result_cache))]
+            _sql_result_cache[key] = (now + SQL_RESULT_CACHE_TTL_SECONDS, response)
+    return response
+
+
+def _execute_redshift_sql_uncached(sql_query: str) -> dict:
+    """Run SQL through the gateway's execute_redshift_sql tool and return its body."""
+    mcp_client, tool_name = _get_mcp_session()
+    result = mcp_client.call_tool_sync(
+        tool_use_id=f"prescribe-{uuid.uuid4()}",
+        name=tool_name,
+        arguments={"sql_query": sql_query, "return_results": True},
     )
+    text = "".join(c.get("text", "") for c in result.get("content", []))
+    response = orjson.loads(text) if text else {}
+    # The Lambda wraps its payload as {"statusCode": ..., "body": "<json>"}
+    body = response.get("body", response)
+    return orjson.loads(body) if isinstance(body, str) else body
+
+
+# ----------------------
+# NLQ response cache
+# ----------------------
+# Two tiers in front of the agent: an exact match on the normalized NLQ, then
+# a semantic match (cosine similarity of NLQ embeddings). Semantic matches
+# are only considered between NLQs that mention exactly the same ids and
+# numbers, so "HCP1001" never reuses the answer for "HCP1002".
+NLQ_CACHE_TTL_SECONDS = int(os.getenv("NLQ_CACHE_TTL_SECONDS", "3600"))
+NLQ_CACHE_MAXSIZE = int(os.getenv("NLQ_CACHE_MAXSIZE", "1024"))
+NLQ_SEMANTIC_THRESHOLD = float(os.getenv("NLQ_SEMANTIC_THRESHOLD", "0.92"))
+# NLQs asking for the newest data always go to the agent
+_FRESHNESS_RE = re.compile(r"\b(?:today|latest|now|current|real[- ]?time)\b", re.IGNORECASE)
+_NLQ_ENTITY_RE = re.compile(r"\b\w*\d\w*\b")
+
+_nlq_cache = {}
+_nlq_cache_lock = threading.Lock()
+NLQ_CACHE_STATS = {"exact_hits": 0, "semantic_hits": 0, "misses": 0}
+
+
+def _normalize_nlq(nlq: str) -> str:
+    return " ".join(nlq.lower().split())
+
+
+def _embed_nlq(text: str):
+    """Return the unit-length embedding of text, or None if embedding fails."""
+    if not BEDROCK_EMBED_MODEL:
+        return None
+    try:
+        response = bedrock_client.invoke_model(
+            modelId=BEDROCK_EMBED_MODEL,
+            body=orjson.dumps({"inputText": text}),
+        )
+        body = orjson.loads(response["body"].read())
+        vector = body.get("embedding") or body.get("outputTextEmbedding", {}).get("embedding")
+    except Exception as e:
+        print(f"Error embedding NLQ for cache lookup: {str(e)}")
+        return None
+    if not vector:
+        return None
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else None
 
 
-agent = create_prescribing_agent()
+def _nlq_cache_lookup(key: str, entities: frozenset, embedding):
+    """Return (tier, response) for a cache hit, or (None, None).
+
+    Responses are stored serialized, so every hit gets its own copy and a
+    caller mutating it cannot change what later hits see.
+    """
+    now = time.monotonic()
+    with _nlq_cache_lock:
+        entry = _nlq_cache.get(key)
+        if entry is not None and entry[0] >= now:
+            return "exact_hits", orjson.loads(entry[3])
+        if embedding is None:
+            return None, None
+        candidates = [
+            entry for entry in _nlq_cache.values()
+            if entry[0] >= now and entry[1] == entities and entry[2] is not None
+        ]
+    if not candidates:
+        return None, None
+    scores = np.stack([entry[2] for entry in candidates]) @ embedding
+    best = int(np.argmax(scores))
+    if scores[best] >= NLQ_SEMANTIC_THRESHOLD:
+        return "semantic_hits", orjson.loads(candidates[best][3])
+    return None, None
+
+
+def _nlq_cache_put(key: str, entities: frozenset, embedding, response, ttl: int) -> None:
+    data = orjson.dumps(response)
+    now = time.monotonic()
+    with _nlq_cache_lock:
+        if len(_nlq_cache) >= NLQ_CACHE_MAXSIZE:
+            # Expired entries go first, then the oldest ones
+            for k in [k for k, entry in _nlq_cache.items() if entry[0] < now]:
+                del _nlq_cache[k]
+        while len(_nlq_cache) >= NLQ_CACHE_MAXSIZE:
+            del _nlq_cache[next(iter(_nlq_cache))]
+        _nlq_cache.pop(key, None)
+        _nlq_cache[key] = (now + ttl, entities, embedding, data)
+
+
+def llm_cache(ttl: int = NLQ_CACHE_TTL_SECONDS):
+    """Serve repeated or paraphrased NLQs from the NLQ response cache.
+
+    Error responses are never cached, and NLQs with freshness words
+    ("today", "latest", ...) always reach the wrapped entrypoint.
+    """
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(payload: dict = {}):
+            nlq = payload.get("prompt")
+            if not isinstance(nlq, str) or not nlq.strip() or _FRESHNESS_RE.search(nlq):
+                return fn(payload)
+
+            normalized = _normalize_nlq(nlq)
+            key = hashlib.sha256(
+                orjson.dumps({"nlq": normalized}, option=orjson.OPT_SORT_KEYS)
+            ).hexdigest()
+            entities = frozenset(_NLQ_ENTITY_RE.findall(normalized))
+
+            tier, response = _nlq_cache_lookup(key, entities, None)
+            embedding = None
+            if tier is None:
+                embedding = _embed_nlq(normalized)
+                tier, response = _nlq_cache_lookup(key, entities, embedding)
+            with _nlq_cache_lock:
+                NLQ_CACHE_STATS[tier or "misses"] += 1
+            if tier is not None:
+                return response
+
+            response = fn(payload)
+            if isinstance(response, dict) and "error" not in response and response.get("status") != "error":
+                _nlq_cache_put(key, entities, embedding, response, ttl)
+            return response
+        return wrapper
+    return decorator
 
 
 # ----------------------
 # Runner
 # ----------------------
-@app.entrypoint
+@llm_cache()
 def run_prescribing_agent(payload: dict = {}):
     """
-    Entrypoint: Pass an NLQ string describing the desired prescribing information.
-    The agent will construct SQL, call execute_redshift_sql, and return the prescribing JSON.
+    NLQ path: pass an NLQ string describing the desired prescribing information.
+    The agent constructs the SQL; it is executed with execute_redshift_sql and
+    each returned row is shaped by build_prescribing_json and labelled at return.
     """
     instruction = payload.get("prompt", "Show be the priscribing behaviour of HCP1001")
-    result = agent(instruction)
-    # agent returns structured data from the LLM -> but per our system prompt the agent must return only the JSON object
-    # Depending on Strands Agent implementation, result might be a string - ensure we parse/normalize:
+
+    # Phase 1: the LLM only writes the SQL; invalid SQL goes back to the agent
+    # (which keeps the conversation) instead of failing in Redshift
+    prompt = instruction
+    for _ in range(SQL_REPAIR_ATTEMPTS + 1):
+        try:
+            sql_query = _get_agent()(prompt, structured_output_model=PrescribingSQL).structured_output.sql_query
+        except Exception as e:
+            return {"status": "error", "message": "Agent did not return a SQL query", "error": str(e)}
+        sql_query, error = validate_prescribing_sql(sql_query, instruction)
+        if error is None:
+            break
+        prompt = f"The SQL you returned was rejected: {error} Return a corrected sql_query."
+    else:
+        return {"status": "error", "message": "Generated SQL failed validation", "error": error}
+
+    # Phase 2: run it and shape the rows in Python
     try:
-        text = result.message["content"][0]["text"]
-    except (AttributeError, KeyError, IndexError) as e:
-        # structure missing or malformed
-        return {
-            "status": "error",
-            "message": "AgentResult structure is missing expected fields",
-            "error": str(e),
-            "raw": str(result),
-        }
+        response = execute_redshift_sql(sql_query)
+    except Exception as e:
+        return {"status": "error", "message": "execute_redshift_sql call failed", "error": str(e)}
+    if response.get("status") != "finished":
+        return {"status": "error", "message": response.get("message") or response.get("error")}
+
+    rows = response.get("rows", [])
+    if not rows:
+        return {"error": "No prescribing data found for the requested filters."}
+    if not rows[0].keys() <= _TABLE_COLUMN_NAMES:
+        # A column that is not a table column was computed in SQL (e.g.
+        # SUM(trx_90d) AS total_trx per hcp_id, RANK() OVER ...):
+        # build_prescribing_json would drop it, so return the rows as computed
+        return {"rows": rows, "Source": PRISCRIPTION_HISTORY_TABLR_NAME}
+    records = [build_prescribing_json(row) for row in rows]
+    if len(records) == 1:
+        return prescribing_to_dict(records[0])
+    return [prescribing_to_dict(record) for record in records]
+
+
+def build_batch_prescribing_sql(hcp_ids: list[str]) -> str:
+    """One SELECT of the prescribing columns for every HCP in hcp_ids.
+
+    Reads the snapshot view when it is configured; the ids are rendered as
+    quoted literals by sqlglot, never interpolated into the SQL text.
+    """
+    table = PRESCRIBING_SNAPSHOT_VIEW or PRISCRIPTION_HISTORY_TABLR_NAME
+    return (
+        exp.select(*_PRESCRIBING_SELECT_COLUMNS)
+        .from_(exp.to_table(table))
+        .where(exp.column("hcp_id").isin(*hcp_ids))
+        .limit(len(hcp_ids))
+        .sql(dialect="redshift")
+    )
+
+
+def run_prescribing_agent_batch(hcp_ids: list[str]):
+    """
+    Prescribing JSON for a list of HCP ids (e.g. a territory view) from one
+    Redshift query and no LLM call. Results follow the order of hcp_ids;
+    ids without data get an error entry.
+    """
+    if not isinstance(hcp_ids, list) or not all(isinstance(i, (str, int)) for i in hcp_ids):
+        return {"status": "error", "message": "hcp_ids must be a list of HCP ids"}
+    hcp_ids = list(dict.fromkeys(str(i).strip() for i in hcp_ids if str(i).strip()))
+    if not hcp_ids:
+        return {"status": "error", "message": "hcp_ids is empty"}
+    if len(hcp_ids) > DEFAULT_SQL_LIMIT:
+        return {"status": "error", "message": f"At most {DEFAULT_SQL_LIMIT} hcp_ids per request"}
 
     try:
-        parsed = json.loads(text)
-        return parsed
-    except json.JSONDecodeError as e:
-        # JSON exists but is invalid
-        return {
-            "status": "error",
-            "message": "Agent returned invalid JSON",
-            "error": str(e),
-            "raw_json_text": text,
-        }
+        response = execute_redshift_sql(build_batch_prescribing_sql(hcp_ids))
+    except Exception as e:
+        return {"status": "error", "message": "execute_redshift_sql call failed", "error": str(e)}
+    if response.get("status") != "finished":
+        return {"status": "error", "message": response.get("message") or response.get("error")}
+
+    rows_by_id = {str(row.get("hcp_id")): row for row in response.get("rows", [])}
+    return [
+        prescribing_to_dict(build_prescribing_json(rows_by_id[hcp_id])) if hcp_id in rows_by_id
+        else {"HcpId": hcp_id, "error": "No prescribing data found for the requested filters."}
+        for hcp_id in hcp_ids
+    ]
+
+
+@app.entrypoint
+def handle_prescribing_request(payload: dict = {}):
+    """
+    Entrypoint: {"hcp_ids": [...]} runs the batch lookup; anything else is
+    an NLQ in "prompt" for run_prescribing_agent.
+    """
+    if "hcp_ids" in payload:
+        return run_prescribing_agent_batch(payload["hcp_ids"])
+    return run_prescribing_agent(payload)
 
 
 # ----------------------
@@ -2,7 +2,9 @@ import re
 import os
 import asyncio
 import boto3
+from botocore.config import Config
 from strands import Agent, tool
+from strands.models import BedrockModel
 from bedrock_agentcore.runtime import (
     BedrockAgentCoreApp, BedrockAgentCoreContext
     )
@@ -15,6 +17,13 @@ from opensearchpy import OpenSearch, RequestsHttpConnection
 import json
 
 AWS_REGION = "us-east-1"
+# Shared session and pooled client config for the model and AWS clients
+BOTO_CONFIG = Config(
+    max_pool_connections=50,
+    retries={"max_attempts": 3, "mode": "adaptive"},
+    tcp_keepalive=True,
+)
+boto_session = boto3.Session(region_name=AWS_REGION)
 
 app = BedrockAgentCoreApp()
 
@@ -48,7 +57,7 @@ def get_parameter_value(parameter_name):
 
 BEDROCK_EMBED_MODEL = get_parameter_value("SALES_COPILOT_BEDROCK_EMBED_MODEL")
 
-bedrock_client = boto3.client(service_name="bedrock-runtime", region_name=AWS_REGION)
+bedrock_client = boto_session.client("bedrock-runtime", config=BOTO_CONFIG)
 
 app = BedrockAgentCoreApp()
 
@@ -190,16 +199,10 @@ def retrieve_profile_context(query: str, top_k: int = 10, size: int = 100) -> di
 # def _tools_list():
 #     return [execute_redshift_sql]
 
-
-def create_profile_agent():
-    """Agent that generates PostgreSQL queries from natural language."""
-    access_token = asyncio.run(fetch_m2m_token(access_token=""))
-    mcp_client = MCPClient(
-        lambda: create_streamable_http_transport(MCP_GATEWAY_URL, access_token)
-    )
-    mcp_client.__enter__()
-    return Agent(
-        system_prompt=f"""
+# Built once at import and passed unchanged to the agent, so the system prompt
+# is an identical prefix on every call and Bedrock can serve it from the
+# prompt cache (cache point placed right after the system prompt).
+PROFILE_AGENT_PROMPT = """
             ##Role:
             You are the ProfileAgent.
             Your task is to generate PostgreSQL SELECT queries from natural-language user prompts.
@@ -220,6 +223,7 @@ def create_profile_agent():
             - **Use retrieve_territory_context tool to understand table schema based on NLQ and build the query 
             - Always produce a valid PostgreSQL SQL query.
             - Pass created SQL query to the tool `execute_redshift_sql(sql_query)` for execution.
+            - Never emit `SELECT *`; always enumerate only the columns the user asked for.
 
             ##Strict Output Rules:
             - Always return the final answer as a simple JSON object as per user request.
@@ -227,14 +231,28 @@ def create_profile_agent():
             - No other columns except those requested,No SQL, no logs.
 
             ##Query Patterns:
-            - For general retrieval: SELECT * FROM table name LIMIT 50;
-            - For filtering: SELECT * FROM table name WHERE <condition>;
+            - For general retrieval: SELECT <explicit columns only> FROM table name LIMIT 50;
+            - For filtering: SELECT <explicit columns only> FROM table name WHERE <condition>;
             - For sorting: ORDER BY <column> ASC/DESC;
             - For aggregations: SELECT <col>, COUNT(*) FROM table name GROUP BY <col>;
             - Multi-condition: Use AND / OR explicitly.
             
             You must always generate the most reasonable SQL based on the user's text.
-        """,
+        """
+
+model = BedrockModel(cache_prompt="default", boto_session=boto_session, boto_client_config=BOTO_CONFIG)
+
+
+def create_profile_agent():
+    """Agent that generates PostgreSQL queries from natural language."""
+    access_token = asyncio.run(fetch_m2m_token(access_token=""))
+    mcp_client = MCPClient(
+        lambda: create_streamable_http_transport(MCP_GATEWAY_URL, access_token)
+    )
+    mcp_client.__enter__()
+    return Agent(
+        model=model,
+        system_prompt=PROFILE_AGENT_PROMPT,
         tools= get_full_tools_list(mcp_client) + [retrieve_profile_context]
     )
 
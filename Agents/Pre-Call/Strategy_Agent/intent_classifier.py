@@ -0,0 +1,234 @@
+"""
+Intent Classifier Module
+
+Deterministic, keyword-based intent classification for the Strategy Agent.
+Queries that clearly match one of the STEP 1 intents of the strategy prompt
+are routed without an LLM classification turn; anything else is returned as
+FALLBACK_INTENT so the LLM orchestrator can classify it.
+
+All keywords of all intents are compiled into a single regular expression
+with one named group per intent, so a query is scanned once regardless of
+how many intents or keywords there are.
+"""
+
+import re
+
+FALLBACK_INTENT = "fallback_unsupported"
+
+# Keyword tables taken from INTENT_CATALOG.md (STEP 1), ordered from the
+# most specific intent to the most general one. A query is only routed by
+# keywords when a single intent matches it decisively (see WEAK_KEYWORDS).
+INTENT_KEYWORDS = [
+    ("call_objective_recommendation", [
+        "call objective", "main ask", "key ask", "desired outcome", "goal of this meeting",
+        "biggest priority for this hcp", "what should i push", "primary objective", "main objective",
+    ]),
+    ("pre_call_brief", [
+        "prepare me for", "pre-call", "pre call", "call brief", "brief", "get ready",
+        "meeting with", "visit prep", "what should i discuss", "biggest priority",
+        "what to talk about", "today's call", "field intelligence",
+    ]),
+    ("territory_prioritization", [
+        "territory", "territories", "where should i focus", "hcp targeting", "priority hcp",
+        "priority hcps", "call first", "identify hcps", "next best hcp", "target list",
+        "competitor rise", "competitive increase", "good access", "strong access",
+        "access opportunity", "uplift", "growth potential", "prioritize",
+    ]),
+    ("topic_similarity", [
+        "similar topics", "similar objections", "related discussions", "who else discussed",
+        "who else talked", "same concerns", "same objections",
+    ]),
+    ("profile_with_history", [
+        "profile and history", "profile + history", "profile and past interactions",
+        "doctor info and past interactions", "previous conversations",
+        "relationship with this doctor", "past concerns", "previous objections",
+    ]),
+    ("clinical_or_priority_insights", [
+        "clinical priorities", "clinical priority", "what does this hcp care about",
+        "patient focus", "therapy focus", "disease focus", "disease areas", "interest areas",
+    ]),
+    ("relationship_mapping", [
+        "related doctors", "peer", "peers", "network", "influence", "relationships",
+        "spillover", "referrals", "connected to",
+    ]),
+    ("access_intelligence", [
+        "access", "formulary", "coverage", "copay", "pa", "prior auth", "prior authorization",
+        "step therapy", "tier", "payer", "insurance plans", "which plans cover",
+        "affordability", "barriers", "non-covered plans",
+    ]),
+    ("competitive_intel", [
+        "competitor", "competitors", "competitive", "threat", "highest severity", "share loss",
+        "launch", "launches", "competitive pressure", "signals", "signal reasoning",
+        "sample activity", "event activity", "loss driver", "severity signals",
+    ]),
+    ("prescribing_trends", [
+        "prescribing", "rx trends", "trx", "nrx", "adoption", "momentum", "share",
+        "volume", "trend", "trends", "script", "scripts", "behavior", "growth", "growing",
+        "decline", "declining",
+    ]),
+    ("content_materials", [
+        "content", "material", "materials", "asset", "assets", "approved", "pdf", "slide",
+        "slides", "references", "video", "what content should i use",
+    ]),
+    ("history_interactions", [
+        "history", "interaction", "interactions", "call notes", "previous meeting",
+        "past objections", "objections", "last discussion", "last meet", "engagement",
+        "topics discussed", "channel",
+    ]),
+    ("hcp_profile", [
+        "profile", "demographics", "specialty", "who is", "practice details", "background",
+        "about this doctor",
+    ]),
+]
+
+# Example NLQs per intent, taken from INTENT_CATALOG.md. Queries that match
+# no keyword are compared with these by embedding similarity (see
+# route_intent in strategy_agent.py) before falling back to the LLM.
+INTENT_EXAMPLES = {
+    "pre_call_brief": [
+        "Prepare me for my call with Dr. Rao",
+        "What should I discuss with Dr. Patel today?",
+        "Give me a full pre-call brief for H123",
+        "What's the objective for my visit with Dr. X?",
+    ],
+    "hcp_profile": [
+        "Give me the profile for HCP H123",
+        "Who is Dr. Mehta?",
+        "What is Dr. Singh's specialty?",
+    ],
+    "profile_with_history": [
+        "Show me Dr. Sharma's profile and past interactions",
+        "What have we discussed with Dr. X before?",
+    ],
+    "prescribing_trends": [
+        "How has Dr. Patel's prescribing changed?",
+        "Show me momentum trends for H345",
+        "What is the adoption stage of Dr. X?",
+        "Is Dr. Mehta growing or declining?",
+    ],
+    "access_intelligence": [
+        "Which plans cover our product for Dr. Rao?",
+        "What's the copay burden for this HCP?",
+        "Give me access insights for Dr. X",
+        "Does Dr. X have PA requirements?",
+        "Identify any coverage gaps or non-covered plans for HCP1000 across all products",
+        "Show plans with severe access friction or high alert severity for HCP1001",
+    ],
+    "competitive_intel": [
+        "What are competitors doing around Dr. Sharma?",
+        "Is Dr. Patel facing competitive pressure?",
+        "Any competitor launches affecting this HCP?",
+        "Explain the signal reasoning for row 10.",
+        "List HCPs with medium severity signals.",
+        "Show me the highest severity HCP signals.",
+    ],
+    "content_materials": [
+        "Which approved materials should I show Dr. Verma?",
+        "What content works best for this HCP?",
+        "Give me recommended content for H456",
+    ],
+    "history_interactions": [
+        "When did I last meet Dr. X?",
+        "What objections has Dr. Rao raised before?",
+        "What channel did we use for the last interaction?",
+    ],
+    "clinical_or_priority_insights": [
+        "What are the top clinical priorities for Dr. Sharma?",
+        "What disease areas does Dr. X focus on?",
+    ],
+    "call_objective_recommendation": [
+        "What is the main objective for my call with Dr. Y?",
+        "What action should I aim for with Dr. Patel?",
+        "What is the key ask for today's visit?",
+    ],
+    "relationship_mapping": [
+        "Which doctors influence Dr. Mehta?",
+        "Who is connected to Dr. Rao?",
+    ],
+    "topic_similarity": [
+        "Which other HCPs had similar objections?",
+        "Who else talked about efficacy concerns last month?",
+        "Which other doctors had similar topics with Dr. Y?",
+    ],
+    "territory_prioritization": [
+        "Today on which territory should I focus?",
+        "Identify HCPs in my territory with rising competitor prescriptions but good access.",
+        "Which HCPs and territories have the best opportunity for my new diabetes drug?",
+        "Show me top doctors I should call first based on competitor pressure.",
+        "Find HCPs with increasing competitor activity but strong access to our brand.",
+        "Who are the highest priority HCPs right now?",
+    ],
+}
+
+
+def _build_intent_pattern(intent_keywords: list) -> re.Pattern:
+    """
+    Compile every intent's keywords into one alternation of named groups.
+
+    Keywords are matched on whole words only and longest first within an
+    intent, so "prior authorization" wins over "prior auth" and "pa" does not
+    match inside "Patel".
+
+    Args:
+        intent_keywords (list): (intent, keywords) pairs in priority order.
+
+    Returns:
+        re.Pattern: Pattern whose matching group name is the intent.
+    """
+    groups = []
+    for rank, (_, keywords) in enumerate(intent_keywords):
+        alternation = "|".join(re.escape(k) for k in sorted(keywords, key=len, reverse=True))
+        groups.append(f"(?P<i{rank}>{alternation})")
+    return re.compile(rf"(?<!\w)(?:{'|'.join(groups)})(?!\w)")
+
+
+_INTENT_PATTERN = _build_intent_pattern(INTENT_KEYWORDS)
+
+# Keywords too generic to route on their own ("brief summary of prescribing"
+# is a prescribing question, "strong access" a targeting criterion). A weak
+# keyword alone does not count as a decisive match for its intent; it selects
+# that intent only when no other intent matches the query at all.
+WEAK_KEYWORDS = frozenset({
+    "brief", "meeting with", "get ready", "biggest priority", "who is",
+    "access", "share", "volume", "network", "peer", "peers", "approved",
+    "channel", "behavior", "territory", "territories",
+})
+
+
+def match_intents(nlq: str) -> tuple[str, ...]:
+    """
+    Return the intents an NLQ matches decisively, in priority order.
+
+    An intent matches decisively when the query contains one of its keywords
+    outside WEAK_KEYWORDS, or several of its keywords. Weak keywords alone
+    count only when no other intent matches the query at all.
+
+    Args:
+        nlq (str): The user's natural language query.
+
+    Returns:
+        tuple: Decisively matched intents; empty when no keyword matches.
+    """
+    hits = {}
+    for match in _INTENT_PATTERN.finditer(nlq.lower()):
+        rank = int(match.lastgroup[1:])
+        hits.setdefault(rank, set()).add(match.group())
+    decisive = sorted(r for r in hits if len(hits[r]) > 1 or not hits[r] <= WEAK_KEYWORDS)
+    if not decisive and len(hits) == 1:
+        decisive = list(hits)
+    return tuple(INTENT_KEYWORDS[r][0] for r in decisive)
+
+
+def classify_intent(nlq: str) -> str:
+    """
+    Classify an NLQ into one of the strategy intents without calling the LLM.
+
+    Args:
+        nlq (str): The user's natural language query.
+
+    Returns:
+        str: The intent when exactly one intent matches decisively (see
+             match_intents), otherwise FALLBACK_INTENT.
+    """
+    matched = match_intents(nlq)
+    return matched[0] if len(matched) == 1 else FALLBACK_INTENT
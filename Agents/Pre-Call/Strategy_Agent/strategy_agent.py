@@ -10,58 +10,191 @@ The agent follows a strict CLOSED WORLD model where only 7 agents are available
 and used only when required by the classified intent.
 """
 
+import os
+import argparse
+import re
 import json
+import orjson
+import asyncio
 import uuid
+import hashlib
 import boto3
+from botocore.config import Config
 import time
+import threading
+import contextvars
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
 from enum import Enum
+from pathlib import Path
 from strands import Agent, tool
+from strands.models import BedrockModel
+from strands.tools.executors import ConcurrentToolExecutor
 from bedrock_agentcore.runtime import BedrockAgentCoreApp
+from intent_classifier import FALLBACK_INTENT, INTENT_EXAMPLES, classify_intent, match_intents
 
 # =====================================================================
 # AWS Configuration
 # =====================================================================
 AWS_REGION = "us-east-1"
-agentcore_client = boto3.client("bedrock-agentcore", region_name=AWS_REGION)
+
+# Shared session and pooled client config for AgentCore, SSM and the model
+BOTO_CONFIG = Config(
+    max_pool_connections=64,
+    retries={"max_attempts": 3, "mode": "adaptive"},
+    tcp_keepalive=True,
+)
+boto_session = boto3.Session(region_name=AWS_REGION)
+agentcore_client = boto_session.client("bedrock-agentcore", config=BOTO_CONFIG)
+s3_client = boto_session.client("s3", config=BOTO_CONFIG)
 app = BedrockAgentCoreApp()
 
 
-def get_parameter_value(parameter_name):
+def get_parameter_values(parameter_names):
     """
-    Fetch an individual parameter by name from AWS Systems Manager Parameter Store.
+    Fetch several parameters from AWS Systems Manager Parameter Store in one call.
     
     This helper reads configuration from SSM Parameter Store to retrieve runtime
     ARNs for various agents deployed in AWS Bedrock.
 
     Args:
-        parameter_name (str): The name of the parameter to fetch from SSM.
+        parameter_names (list): Names of the parameters to fetch (at most 10).
 
     Returns:
-        str or None: The parameter value (decrypted if needed) or None if an error occurs.
+        dict or None: Parameter name mapped to its value (decrypted if needed).
+              Parameters that do not exist are left out of the dict; None is
+              returned if the call itself fails.
     """
     try:
-        ssm_client = boto3.client("ssm", region_name=AWS_REGION)
-        response = ssm_client.get_parameter(Name=parameter_name, WithDecryption=True)
-        return response["Parameter"]["Value"]
+        ssm_client = boto_session.client("ssm", config=BOTO_CONFIG)
+        response = ssm_client.get_parameters(Names=list(parameter_names), WithDecryption=True)
     except Exception as e:
+        print(f"Error fetching parameters {list(parameter_names)}: {str(e)}")
         return None
+    if response.get("InvalidParameters"):
+        print(f"Parameters not found: {response['InvalidParameters']}")
+    return {p["Name"]: p["Value"] for p in response["Parameters"]}
 
 
 # =====================================================================
 # Agent Runtime ARNs - Fetched from AWS Systems Manager Parameter Store
 # =====================================================================
-SC_PRC_HISTORY_AGENT_RUNTIME_ARN = get_parameter_value("SC_PRC_HISTORY_AGENT_ARN")
-SC_PRC_PRESCRIBE_AGENT_RUNTIME_ARN = get_parameter_value("SC_PRC_PRESCRIBE_AGENT_ARN")
-SC_PRC_PROFILE_AGENT_RUNTIME_ARN = get_parameter_value("SC_PRC_PROFILE_AGENT_ARN")
-SC_PRC_CONTENT_AGENT_RUNTIME_ARN = get_parameter_value("SC_PRC_CONTENT_AGENT_ARN")
-SC_PRC_COMPETITIVE_AGENT_RUNTIME_ARN = get_parameter_value("SC_PRC_COMPETITIVE_AGENT_ARN")
-SC_PRC_TERRITORY_AGENT_RUNTIME_ARN = get_parameter_value("SC_PRC_TERRITORY_AGENT_ARN")
-SC_PRC_ACCESS_AGENT_RUNTIME_ARN = get_parameter_value("SC_PRC_ACCESS_AGENT_ARN")
+# SSM parameter names of the sub-agent runtime ARNs. The ARNs are fetched
+# together on the first sub-agent call instead of one request per ARN at
+# import time, which keeps SSM round trips off the cold-start path.
+SC_PRC_HISTORY_AGENT_ARN = "SC_PRC_HISTORY_AGENT_ARN"
+SC_PRC_PRESCRIBE_AGENT_ARN = "SC_PRC_PRESCRIBE_AGENT_ARN"
+SC_PRC_PROFILE_AGENT_ARN = "SC_PRC_PROFILE_AGENT_ARN"
+SC_PRC_CONTENT_AGENT_ARN = "SC_PRC_CONTENT_AGENT_ARN"
+SC_PRC_COMPETITIVE_AGENT_ARN = "SC_PRC_COMPETITIVE_AGENT_ARN"
+SC_PRC_TERRITORY_AGENT_ARN = "SC_PRC_TERRITORY_AGENT_ARN"
+SC_PRC_ACCESS_AGENT_ARN = "SC_PRC_ACCESS_AGENT_ARN"
+
+RUNTIME_ARN_PARAMETERS = (
+    SC_PRC_HISTORY_AGENT_ARN,
+    SC_PRC_PRESCRIBE_AGENT_ARN,
+    SC_PRC_PROFILE_AGENT_ARN,
+    SC_PRC_CONTENT_AGENT_ARN,
+    SC_PRC_COMPETITIVE_AGENT_ARN,
+    SC_PRC_TERRITORY_AGENT_ARN,
+    SC_PRC_ACCESS_AGENT_ARN,
+)
+
+_runtime_arns = {}
+_runtime_arns_lock = threading.Lock()
+
+
+def get_runtime_arn(parameter_name):
+    """
+    Return a sub-agent runtime ARN, loading all ARNs from SSM on first use.
+
+    Args:
+        parameter_name (str): SSM parameter name holding the runtime ARN.
+
+    Returns:
+        str or None: The runtime ARN, or None if it could not be fetched.
+    """
+    if parameter_name not in _runtime_arns:
+        with _runtime_arns_lock:
+            if parameter_name not in _runtime_arns:
+                # On an SSM error nothing is cached, so the next call retries
+                _runtime_arns.update(get_parameter_values(RUNTIME_ARN_PARAMETERS) or {})
+    return _runtime_arns.get(parameter_name)
 
 
 # =====================================================================
 # Strategy Agent Prompt
 # =====================================================================
+# The STEP 1 intent catalog lives in INTENT_CATALOG.md. Routed queries are
+# classified in Python (intent_classifier.py) and never see it; it is only
+# part of the orchestrator prompt used for queries the classifier cannot route.
+INTENT_CATALOG = (Path(__file__).parent / "INTENT_CATALOG.md").read_text(encoding="utf-8")
+
+# ---------------------------------------------------------------------
+# Shared prompt fragments. The orchestrator and merge prompts are assembled
+# from these so the capability list and output rules exist exactly once.
+# ---------------------------------------------------------------------
+AGENT_CAPABILITIES_PROMPT = """
+============================================================
+AGENT CAPABILITIES (KNOWLEDGE BASE)
+============================================================
+1. ProfileAgent: HCP demographics, specialty, practice details, influence markers.
+2. HistoryAgent: Past interactions, call notes, objections, samples, content shared.
+3. PrescribingAgent: TRx/NRx trends, share shifts, patient mix, therapy switches.
+4. AccessAgent: Formulary status, wins/losses, PA requirements, coverage, copay.
+5. CompetitiveAgent: Competitor presence, share threats, loss drivers.
+6. ContentAgent: Approved materials, approved messaging blocks.
+7. TerritoryAgent: Territory-level and HCP-level prioritization using
+   prescribing momentum, competitive pressure indicators, access quality,
+   engagement freshness, uplift potential, and network influence metrics.
+   Dynamically ranks territories or HCPs based on NLQ intent without
+   requiring explicit territory_id or hcp_id. Generates SQL filters for
+   competitor-rise signals, access opportunity conditions, and business
+   potential to identify which territories or HCPs should be prioritized
+   and in what order.
+
+No other capabilities exist. Do not infer extra functions.
+"""
+
+OUTPUT_FORMAT_PROMPT = """
+=======================================================================
+OUTPUT FORMAT (STRICT)
+======================================================================= 
+Output Rules:
+- Use MARKDOWN format ONLY.
+- An agent output shaped like {"ref": "s3://...", "schema": ..., "sample": [...]} is a
+  handle to a large payload. Work from the sample; call resolve_handle(ref) ONLY when
+  the full payload is needed to answer the question.
+- Structure output into these sections:
+
+### 1. DISCRIPTIONS
+   - Give the small discription of Doctor first.
+ 
+### 2. SUMMARY  
+   - Write a 5-7 lines of summary ONLY based on the data that you fetch from DB.  
+   - No external reasoning or added information.
+   - NO need to used explicitely another tables, just used tables that mentioned in agents itself.
+ 
+### 3. KEY POINTS 
+   - No need to print explicitely. If needed then prints because in other section we used same details.
+   - When you print any key points print it in meaningful format so user can understand.
+ 
+###4. KEY INSIGHTS 
+   - Give insights in 2-3 lines.
+   - Provide insights ONLY from the table and the user's request.  
+   - Do not invent or add anything beyond the table content.
+
+### 5. CITATION
+   - Provide the source of data from which you fetched the information in citation key.
+
+
+###  Table heading (If needed to show data in table format)
+| hcp_id | territory_id | total_rx_28d | comp_share_28d_delta | formulary_tier_score | priority_score | reason_codes |
+|--------|--------------|--------------|----------------------|---------------------|----------------|--------------|
+| HCP009 | T-215        | 132          | +2.1%                | 2                   | 92             | GOOD_ACCESS, HIGH_RX |
+
+"""
+
 STRATEGY_AGENT_PROMPT = """
 You are the Strategy Agent. You intelligently classify user intent and call ONLY the necessary agents.
 You NEVER call agents that are not required for the specific user question.
@@ -88,237 +221,7 @@ Rules:
 - Do not modify the output from the agents.
 
 
-============================================================
-STEP 1: INTENT CLASSIFICATION (DO THIS FIRST)
-============================================================
-    Before calling any agent, CLASSIFY the user's NLQ into ONE of these categories.
-    Use keyword matching + semantic understanding.
-    -------------------------------------------------------------------
-    1. **pre_call_brief**  (FULL PRE-CALL PREP)
-    -------------------------------------------------------------------
-    Purpose:
-    User wants the full pre-call preparation package.
-    Keywords:
-    "prepare me for", "brief", "call brief", "get ready", 
-    "meeting with", "visit prep", "pre-call", 
-    "what should I discuss", "biggest priority", "call objective",
-    "what to talk about", "today's call", "field intelligence"
-    Call Agents:
-    Profile → History → Prescribing → Access → Competitive → Content
-    Example NLQs:
-    - "Prepare me for my call with Dr. Rao"
-    - "What should I discuss with Dr. Patel today?"
-    - "Give me a full pre-call brief for H123"
-    - "What's the objective for my visit with Dr. X?"
-    -------------------------------------------------------------------
-    2. **hcp_profile**  (BASIC HCP OVERVIEW)
-    -------------------------------------------------------------------
-    Purpose:
-    User wants demographic / specialty / practice info only.
-    Keywords:
-    "profile", "demographics", "specialty", "who is", 
-    "practice details", "background", "about this doctor"
-    Call Agents:
-    Profile Agent ONLY
-    Examples:
-    - "Give me the profile for HCP H123"
-    - "Who is Dr. Mehta?"
-    - "What is Dr. Singh's specialty?"
-    -------------------------------------------------------------------
-    3. **profile_with_history**  (PROFILE + INTERACTIONS)
-    -------------------------------------------------------------------
-    Purpose:
-    User wants a snapshot of the HCP and past encounters.
-    Keywords:
-    "profile and history", "profile + history", 
-    "doctor info and past interactions", "previous conversations",
-    "similar topics", "relationship with this doctor",
-    "past concerns", "previous objections"
-    Call Agents:
-    Profile Agent + History Agent
-    Examples:
-    - "Show me Dr. Sharma's profile and past interactions"
-    - "What have we discussed with Dr. X before?"
-    - "Which other doctors had similar topics with Dr. Y?"
-    -------------------------------------------------------------------
-    4. **prescribing_trends**  (PRESCRIBING SPECIFIC)
-    -------------------------------------------------------------------
-    Purpose:
-    User wants TRx/NRx/share/momentum/adoption intel.
-    Keywords:
-    "prescribing", "rx trends", "trx", "nrx", 
-    "adoption", "momentum", "share", 
-    "volume", "trend", "script", "behavior", "growth", "decline"
-    Call Agents:
-    Prescribing Agent ONLY
-    Examples:
-    - "How has Dr. Patel's prescribing changed?"
-    - "Show me momentum trends for H345"
-    - "What is the adoption stage of Dr. X?"
-    - "Is Dr. Mehta growing or declining?"
-    -------------------------------------------------------------------
-    5. **access_intelligence**  (FORMULARY & COVERAGE)
-    -------------------------------------------------------------------
-    Purpose:
-    User wants payer/access/PA info.
-    Keywords:
-    "access", "formulary", "coverage", "copay", "PA and copay information", "coverage gaps", "non-covered plans",
-    "pa", "prior auth", "step therapy", "tier", "payer", "insurance plans", "prior authorization (PA)",
-    "which plans cover", "affordability", "barriers", "affordability risk"
-    Call Agents:
-    Access Agent ONLY
-    Examples:
-    - "Which plans cover our product for Dr. Rao?"
-    - "What's the copay burden for this HCP?"
-    - "Give me access insights for Dr. X"
-    - "Does Dr. X have PA requirements?"
-    - "Identify any coverage gaps or non-covered plans for HCP1000 across all products"
-    - "Show plans with severe access friction or high alert severity for HCP1001"
-    -------------------------------------------------------------------
-    6. **competitive_intel**  (COMPETITOR ACTIVITY)
-    -------------------------------------------------------------------
-    Purpose:
-    User wants competitor threats and share pressure.
-    Keywords:
-    "competitor", "competitive", "threat", "highest severity"
-    "share loss", "launch", "competitive pressure", "signals", "reasoning",
-    "sample activity", "event activity", "loss driver", "severity signals"
-    Call Agents:
-    Competitive Agent ONLY
-    Examples:
-    - "What are competitors doing around Dr. Sharma?"
-    - "Is Dr. Patel facing competitive pressure?"
-    - "Any competitor launches affecting this HCP?"
-    - "Explain the signal reasoning for row 10."
-    - "List HCPs with medium severity signals."
-    - "Show me the highest severity HCP signals.
-    -------------------------------------------------------------------
-    7. **content_materials**  (NEXT BEST CONTENT)
-    -------------------------------------------------------------------
-    Purpose:
-    User wants suggestions of approved materials.
-    Keywords:
-    "content", "material", "asset", "approved", 
-    "pdf", "slide", "references", "video", 
-    "what content should I use"
-    Call Agents:
-    Content Agent ONLY
-    Examples:
-    - "Which approved materials should I show Dr. Verma?"
-    - "What content works best for this HCP?"
-    - "Give me recommended content for H456"
-    -------------------------------------------------------------------
-    8. **history_interactions**  (LAST INTERACTIONS & OBJECTIONS)
-    -------------------------------------------------------------------
-    Purpose:
-    User wants interaction history, notes, objections, channels.
-    Keywords:
-    "history", "interaction", "call notes", "previous meeting",
-    "past objections", "last discussion", "engagement", "topics discussed"
-    Call Agents:
-    History Agent ONLY
-    Examples:
-    - "When did I last meet Dr. X?"
-    - "What objections has Dr. Rao raised before?"
-    - "What channel did we use for the last interaction?"
-    -------------------------------------------------------------------
-    9. **clinical_or_priority_insights**  
-    (What matters most to the HCP clinically)
-    -------------------------------------------------------------------
-    Purpose:
-    User wants to know clinical priorities, interests, disease focus.
-    Keywords:
-    "clinical priorities", "what does this HCP care about", 
-    "patient focus", "therapy focus", "disease focus", "interest areas"
-    Call Agents:
-    Profile Agent + Prescribing Agent + Content Agent
-    Examples:
-    - "What are the top clinical priorities for Dr. Sharma?"
-    - "What disease areas does Dr. X focus on?"
-    -------------------------------------------------------------------
-    10. **call_objective_recommendation**  
-        (The ONE recommended action for the call)
-    -------------------------------------------------------------------
-    Purpose:
-    User wants the single most important call objective.
-    Keywords:
-    "call objective", "main ask", "desired outcome", 
-    "goal of this meeting", "biggest priority for this HCP", 
-    "what should I push", "primary objective"
-    Call Agents:
-    Prescribing + Access + Competitive + History + Content  
-    (Then Strategy Agent synthesizes)
-    Examples:
-    - "What is the main objective for my call with Dr. Y?"
-    - "What action should I aim for with Dr. Patel?"
-    - "What is the key ask for today's visit?"
-    -------------------------------------------------------------------
-    11. **relationship_mapping** (Doctors related to each other)
-    -------------------------------------------------------------------Purpose:
-    User wants peer-to-peer influence and network structure.
-    Keywords:
-    "related doctors", "peer", "network", 
-    "influence", "relationships", "spillover", "referrals"
-    Call Agents:
-    Profile Agent ONLY  
-    (because network metrics live in profile table)
-    Examples:
-    - "Which doctors influence Dr. Mehta?"
-    - "Who is connected to Dr. Rao?"
-    -------------------------------------------------------------------
-    12. **topic_similarity** (Doctors discussing similar topics)
-    -------------------------------------------------------------------
-    Purpose:
-    Find doctors where similar discussions occurred.
-    Keywords:
-    "similar topics", "related discussions", "who else discussed this",
-    "same concerns", "same objections"
-    Call Agents:
-    History Agent ONLY
-    Examples:
-    - "Which other HCPs had similar objections?"
-    - "Who else talked about efficacy concerns last month?"
-    -------------------------------------------------------------------
-    13. **fallback_unsupported**
-    -------------------------------------------------------------------
-    Purpose:
-    NLQ doesn't match anything above.
-    Action:
-    Return:
-    {{ "error": "Unsupported pre-call request. Please rephrase." }}
-    -------------------------------------------------------------------
-    14. **territory_prioritization**  (NEXT-BEST TERRITORY & HCP TARGETING)
-    -------------------------------------------------------------------
-    Purpose:
-    User wants to identify which territories or HCPs to prioritize based on
-    prescribing trends, competitor momentum, access quality, or business
-    opportunity. Territory or HCP may or may not be provided explicitly.
-    This covers both territory-level and HCP-level prioritization.
-    Keywords:
-    "territory", "which territory", "where should I focus",
-    "hcp targeting", "priority hcp", "call first", 
-    "identify hcps", "next best hcp", "target list",
-    "competitor rise", "competitive increase", 
-    "good access", "access opportunity",
-    "uplift", "growth potential", "prioritize"
-    When NLQ mentions:
-    - competitor increase, pressure, or rising competitor scripts
-    - access being good or favorable
-    - need to identify HCPs to call first
-    - need to rank territories or HCPs without specifying IDs
-    - need to discover which segment/cluster to focus on
-    then classify as **territory_prioritization**.
-    Call Agent:
-    Territory Agent ONLY  
-    (uses dynamic SQL and Redshift retrieval)
-    Examples:
-    - "Today on which territory should I focus?"
-    - "Identify HCPs in my territory with rising competitor prescriptions but good access."
-    - "Which HCPs and territories have the best opportunity for my new diabetes drug?"
-    - "Show me top doctors I should call first based on competitor pressure."
-    - "Find HCPs with increasing competitor activity but strong access to our brand."
-    - "Who are the highest priority HCPs right now?"
-    -------------------------------------------------------------------
+""" + INTENT_CATALOG + """
 ============================================================
 STEP 2: EXTRACT REQUIRED PARAMETERS
 ============================================================
@@ -328,12 +231,15 @@ Based on the NLQ, extract:
 - territory_id (optional, for regional context)
 - days_lookback (optional, default 90)
 
-If critical parameters are missing, return: {{"status": "missing_parameters", "required": ["hcp_id", ...]}}
+If critical parameters are missing, return: {"status": "missing_parameters", "required": ["hcp_id", ...]}
 
 ============================================================
 STEP 3: CALL ONLY NECESSARY AGENTS
 ============================================================
 IMPORTANT: Do NOT call agents outside your classified intent.
+PARALLEL CALLS: Emit ALL tool calls required by the intent together in a
+SINGLE response. The agents are independent and run in parallel; never wait
+for one agent's output before calling the next.
 Example:
   - If user asks "Tell me about Dr. Smith's profile" → Call ONLY Profile Agent
   - If user asks "What are the prescribing trends?" → Call ONLY Prescribing Agent
@@ -358,26 +264,7 @@ STRICT NEGATIVE RULES (NON-NEGOTIABLE)
 • If something is absent in tool output, mark it absent. No guessing.
 • Do NOT call all 6 agents. Call ONLY what the intent requires.
 
-============================================================
-AGENT CAPABILITIES (KNOWLEDGE BASE)
-============================================================
-1. ProfileAgent: HCP demographics, specialty, practice details, influence markers.
-2. HistoryAgent: Past interactions, call notes, objections, samples, content shared.
-3. PrescribingAgent: TRx/NRx trends, share shifts, patient mix, therapy switches.
-4. AccessAgent: Formulary status, wins/losses, PA requirements, coverage, copay.
-5. CompetitiveAgent: Competitor presence, share threats, loss drivers.
-6. ContentAgent: Approved materials, approved messaging blocks.
-7. TerritoryAgent: Territory-level and HCP-level prioritization using
-   prescribing momentum, competitive pressure indicators, access quality,
-   engagement freshness, uplift potential, and network influence metrics.
-   Dynamically ranks territories or HCPs based on NLQ intent without
-   requiring explicit territory_id or hcp_id. Generates SQL filters for
-   competitor-rise signals, access opportunity conditions, and business
-   potential to identify which territories or HCPs should be prioritized
-   and in what order.
-
-No other capabilities exist. Do not infer extra functions.
-
+""" + AGENT_CAPABILITIES_PROMPT + """
 ============================================================
 FAIL-SAFE LOGIC
 ============================================================
@@ -386,87 +273,394 @@ FAIL-SAFE LOGIC
 • Never substitute your own invented values.
 • Never fabricate fallback "insights."
 
-=======================================================================
-OUTPUT FORMAT (STRICT)
-======================================================================= 
-Output Rules:
-- Use MARKDOWN format ONLY.
-- Structure output into these sections:
+""" + OUTPUT_FORMAT_PROMPT
 
-### 1. DISCRIPTIONS
-   - Give the small discription of Doctor first.
- 
-### 2. SUMMARY  
-   - Write a 5-7 lines of summary ONLY based on the data that you fetch from DB.  
-   - No external reasoning or added information.
-   - NO need to used explicitely another tables, just used tables that mentioned in agents itself.
- 
-### 3. KEY POINTS 
-   - No need to print explicitely. If needed then prints because in other section we used same details.
-   - When you print any key points print it in meaningful format so user can understand.
- 
-###4. KEY INSIGHTS 
-   - Give insights in 2-3 lines.
-   - Provide insights ONLY from the table and the user's request.  
-   - Do not invent or add anything beyond the table content.
-
-### 5. CITATION
-   - Provide the source of data from which you fetched the information in citation key.
 
+MERGE_AGENT_PROMPT = """
+You are the Strategy Agent. The user's intent has already been classified and
+the required sub-agents have already been called for you.
+You receive the user question, the classified intent and the raw output of each
+called agent. Merge ONLY those outputs into the final answer.
 
-###  Table heading (If needed to show data in table format)
-| hcp_id | territory_id | total_rx_28d | comp_share_28d_delta | formulary_tier_score | priority_score | reason_codes |
-|--------|--------------|--------------|----------------------|---------------------|----------------|--------------|
-| HCP009 | T-215        | 132          | +2.1%                | 2                   | 92             | GOOD_ACCESS, HIGH_RX |
-
-"""
+Rules:
+- Do NOT invent data. All facts come from the agent outputs provided.
+- If something is absent in an agent output, mark it absent. No guessing.
+- Do not modify the values returned by the agents.
+- Add citation also in the final agent responce in citetion key e.g. ('citation':'source of data from which agent')
+""" + AGENT_CAPABILITIES_PROMPT + OUTPUT_FORMAT_PROMPT
 
 
 # =====================================================================
 # Tool Definitions - Orchestrate Sub-agents
 # =====================================================================
 
+# Maximum number of sub-agent runtimes invoked at the same time. The LLM
+# emits all tool calls for an intent in one turn and the concurrent tool
+# executor runs them in parallel; this bound keeps the fan-out in check.
+TOOL_CONCURRENCY_LIMIT = int(os.getenv("TOOL_CONCURRENCY_LIMIT", "6"))
+_sub_agent_slots = threading.BoundedSemaphore(TOOL_CONCURRENCY_LIMIT)
+
+# Sub-agent responses are cached for a short time so dashboard refreshes,
+# retries and successive questions about the same HCP do not re-run the
+# sub-agent runtimes. Only successful responses are cached. A request with
+# "force_refresh": true bypasses the cache reads (see _force_refresh).
+SUB_AGENT_CACHE_TTL = int(os.getenv("SUB_AGENT_CACHE_TTL", "300"))
+SUB_AGENT_CACHE_MAXSIZE = int(os.getenv("SUB_AGENT_CACHE_MAXSIZE", "10000"))
+DEFAULT_DAYS_LOOKBACK = 90
+_sub_agent_cache = {}
+_sub_agent_cache_lock = threading.Lock()
+# Set per request from the payload; worker threads started with
+# asyncio.to_thread inherit it with the rest of the context.
+_force_refresh = contextvars.ContextVar("force_refresh", default=False)
+
+_HCP_ID_RE = re.compile(r"\b(HCP[_-]?\d+|H\d{3,})\b", re.IGNORECASE)
+_PRODUCT_ID_RE = re.compile(r"\b(?:product|prd|brand)[\s_:#-]*(?:id\s*)?([A-Z0-9][\w-]*\d[\w-]*)\b", re.IGNORECASE)
+_TERRITORY_ID_RE = re.compile(r"\b(T-?\d{2,})\b", re.IGNORECASE)
+_DAYS_LOOKBACK_RE = re.compile(r"\b(?:last|past)\s+(\d+)\s+days?\b", re.IGNORECASE)
+_WHITESPACE_RE = re.compile(r"\s+")
+
+
+def _normalize_nlq(nlq: str) -> str:
+    """Lowercased NLQ with whitespace collapsed, used in cache keys."""
+    return _WHITESPACE_RE.sub(" ", nlq).strip().lower()
+
+
+def extract_query_params(nlq: str) -> dict:
+    """
+    Extract the STEP 2 parameters from an NLQ without calling the LLM.
+
+    Args:
+        nlq (str): The user's natural language query.
+
+    Returns:
+        dict: hcp_id, product_id and territory_id (upper-cased, or None when
+              absent) and days_lookback (defaults to DEFAULT_DAYS_LOOKBACK).
+    """
+    def _match(pattern):
+        m = pattern.search(nlq)
+        return m.group(1).upper() if m else None
+
+    days = _DAYS_LOOKBACK_RE.search(nlq)
+    return {
+        "hcp_id": _match(_HCP_ID_RE),
+        "product_id": _match(_PRODUCT_ID_RE),
+        "territory_id": _match(_TERRITORY_ID_RE),
+        "days_lookback": int(days.group(1)) if days else DEFAULT_DAYS_LOOKBACK,
+    }
+
+
+def _sub_agent_cache_key(tool_name: str, intent: str):
+    """Cache key for a sub-agent call, or None when the query is not cacheable.
+
+    Queries without an HCP or territory id are too open-ended to share a
+    cached answer, so they always go to the sub-agent. The key includes the
+    normalized instruction, so a differently worded question to the same
+    sub-agent about the same HCP is answered afresh.
+    """
+    params = extract_query_params(intent)
+    if not params["hcp_id"] and not params["territory_id"]:
+        return None
+    return (
+        tool_name,
+        classify_intent(intent),
+        _normalize_nlq(intent),
+        params["hcp_id"],
+        params["product_id"],
+        params["territory_id"],
+        params["days_lookback"],
+    )
+
+
+def _cache_get(key, store=_sub_agent_cache):
+    with _sub_agent_cache_lock:
+        entry = store.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del store[key]
+            return None
+        return value
+
+
+def _cache_put(key, value, store=_sub_agent_cache, ttl=SUB_AGENT_CACHE_TTL,
+               maxsize=SUB_AGENT_CACHE_MAXSIZE) -> None:
+    with _sub_agent_cache_lock:
+        if len(store) >= maxsize:
+            # Drop expired entries first, then the oldest insertions
+            now = time.monotonic()
+            for k in [k for k, (exp, _) in store.items() if exp < now]:
+                del store[k]
+            while len(store) >= maxsize:
+                del store[next(iter(store))]
+        store[key] = (time.monotonic() + ttl, value)
+
+
+# Final answers of routed queries, keyed by (intent, normalized NLQ, hcp_id,
+# product_id, territory_id, days_lookback), so asking the same question again
+# during a shift skips both the sub-agent fan-out and the merge LLM call.
+# Differently worded questions about the same HCP are answered afresh. Shares
+# _cache_get/_cache_put (and their lock) with the sub-agent cache.
+ANSWER_CACHE_TTL = int(os.getenv("ANSWER_CACHE_TTL", "900"))
+ANSWER_CACHE_MAXSIZE = int(os.getenv("ANSWER_CACHE_MAXSIZE", "4096"))
+_answer_cache = {}
+
+
+def _answer_cache_key(intent: str, nlq: str):
+    """Cache key for a routed answer, or None when the NLQ names no HCP or territory."""
+    params = extract_query_params(nlq)
+    if not params["hcp_id"] and not params["territory_id"]:
+        return None
+    return (
+        intent,
+        _normalize_nlq(nlq),
+        params["hcp_id"],
+        params["product_id"],
+        params["territory_id"],
+        params["days_lookback"],
+    )
+
+
+# Large Content/History payloads are stored in S3 and replaced by a compact
+# handle, so they are not pasted in full into the merge/orchestrator LLM call.
+# Disabled when SUB_AGENT_HANDLE_BUCKET is not set.
+SUB_AGENT_HANDLE_BUCKET = os.getenv("SUB_AGENT_HANDLE_BUCKET")
+SUB_AGENT_HANDLE_PREFIX = os.getenv("SUB_AGENT_HANDLE_PREFIX", "strategy-agent/handles/")
+SUB_AGENT_HANDLE_MIN_BYTES = int(os.getenv("SUB_AGENT_HANDLE_MIN_BYTES", "4096"))
+HANDLE_SCHEMAS = {
+    "content_agent_tool": "content.v1",
+    "history_agent_tool": "history.v1",
+}
+HANDLE_SAMPLE_ITEMS = 3
+HANDLE_SAMPLE_CHARS = 1000
+
+
+def _to_handle(tool_name: str, intent: str, result: any) -> any:
+    """
+    Replace a large sub-agent result with an S3 handle.
+
+    Args:
+        tool_name (str): Name of the tool that produced the result.
+        intent (str): The query the result answers, part of the object key.
+        result (any): Parsed sub-agent response.
+
+    Returns:
+        any: {"ref", "schema", "sample"} when the result was offloaded,
+             otherwise the result unchanged.
+    """
+    schema = HANDLE_SCHEMAS.get(tool_name)
+    if not SUB_AGENT_HANDLE_BUCKET or schema is None:
+        return result
+
+    body = orjson.dumps(result, default=str)
+    if len(body) < SUB_AGENT_HANDLE_MIN_BYTES:
+        return result
+
+    key = f"{SUB_AGENT_HANDLE_PREFIX}{hashlib.sha256(tool_name.encode() + intent.encode() + body).hexdigest()}.json"
+    try:
+        s3_client.put_object(
+            Bucket=SUB_AGENT_HANDLE_BUCKET, Key=key, Body=body, ContentType="application/json"
+        )
+    except Exception:
+        # Fall back to the inline payload rather than losing the result
+        return result
+
+    if isinstance(result, list):
+        sample = result[:HANDLE_SAMPLE_ITEMS]
+    elif isinstance(result, str):
+        sample = result[:HANDLE_SAMPLE_CHARS]
+    else:
+        sample = body[:HANDLE_SAMPLE_CHARS].decode("utf-8", errors="ignore")
+    return {"ref": f"s3://{SUB_AGENT_HANDLE_BUCKET}/{key}", "schema": schema, "sample": sample}
+
+
 @tool
-def profile_agent_tool(intent: str) -> any:
+def resolve_handle(ref: str) -> any:
     """
-    Invoke the Profile Agent to retrieve HCP demographic and profile information.
-    
-    The Profile Agent returns information about healthcare provider demographics,
-    specialty, practice details, and network influence metrics.
+    Load the full payload behind a sub-agent handle.
+
+    Call this only when the "sample" of a handle is not enough to answer.
 
     Args:
-        intent (str): Natural language query to be processed by the Profile Agent.
+        ref (str): The "ref" value of a handle, e.g. s3://bucket/key.json.
 
     Returns:
-        dict: Response from the Profile Agent containing profile data or error details.
+        any: The full sub-agent payload, or error details if it cannot be read.
     """
+    bucket, _, key = ref.removeprefix("s3://").partition("/")
+    if bucket != SUB_AGENT_HANDLE_BUCKET or not key.startswith(SUB_AGENT_HANDLE_PREFIX):
+        return {"error": f"Unknown handle: {ref}", "status": "error"}
+    try:
+        obj = s3_client.get_object(Bucket=bucket, Key=key)
+        return orjson.loads(obj["Body"].read())
+    except Exception as e:
+        return {"error": f"resolve_handle failed: {str(e)}", "status": "error"}
+
+
+def _cached_sub_agent_result(cache_key):
+    """Cached sub-agent response for cache_key, or None (always None on force_refresh)."""
+    if cache_key is None or _force_refresh.get():
+        return None
+    return _cache_get(cache_key)
+
+
+def _invoke_sub_agent(arn_parameter: str, intent: str, tool_name: str) -> any:
+    """
+    Invoke a sub-agent deployed on Bedrock AgentCore Runtime.
+
+    Successful responses for queries that name an HCP or territory are served
+    from a short-lived cache keyed by (tool, intent, normalized
+    instruction, hcp_id, product_id, territory_id, days_lookback); see
+    _sub_agent_cache_key. Large Content/History responses are returned as S3
+    handles (see _to_handle).
+
+    Args:
+        arn_parameter (str): SSM parameter name of the sub-agent's runtime ARN.
+        intent (str): Natural language query forwarded to the sub-agent.
+        tool_name (str): Name of the calling tool, used in error messages.
+
+    Returns:
+        dict: Parsed sub-agent response, the raw body if it is not valid JSON,
+              or error details if the invocation failed.
+    """
+    cache_key = _sub_agent_cache_key(tool_name, intent)
+    cached = _cached_sub_agent_result(cache_key)
+    if cached is not None:
+        return cached
+
+    result = _call_sub_agent_runtime(get_runtime_arn(arn_parameter), intent, tool_name)
+    if isinstance(result, dict) and result.get("status") == "error":
+        return result
+
+    # Offloaded results are cached as their handle, so cache hits stay small
+    result = _to_handle(tool_name, intent, result)
+    if cache_key is not None:
+        _cache_put(cache_key, result)
+    return result
+
+
+_JSON_FENCE_RE = re.compile(r"```(?:json)?\s*(.*?)\s*```", re.DOTALL)
+
+
+def _extract_json(value):
+    """
+    Recover the JSON a sub-agent embedded in its text output.
+
+    Sub-agents are told to answer with bare JSON but often wrap it in ```json
+    fences or a line of prose; passing that text on as-is makes the merge step
+    work from a string instead of structured data.
+
+    Args:
+        value: Decoded sub-agent response.
+
+    Returns:
+        The parsed JSON object/array, or value unchanged if it is not a
+        string or contains no parseable JSON.
+    """
+    if not isinstance(value, str):
+        return value
+    text = value.strip()
+    fenced = _JSON_FENCE_RE.search(text)
+    if fenced:
+        text = fenced.group(1)
+    # Try the outermost object/array, whichever opens first
+    spans = sorted(
+        (text.find(open_ch), text.rfind(close_ch))
+        for open_ch, close_ch in (("{", "}"), ("[", "]"))
+    )
+    for start, end in spans:
+        if not 0 <= start < end:
+            continue
+        candidate = text[start:end + 1]
+        try:
+            return orjson.loads(candidate)
+        except orjson.JSONDecodeError:
+            pass
+        try:
+            # Tolerates raw control characters (e.g. newlines) inside strings
+            return json.loads(candidate, strict=False)
+        except ValueError:
+            pass
+    return value
+
+
+def _read_event_stream(stream) -> str:
+    """
+    Decode a server-sent event stream from a sub-agent runtime.
+
+    Args:
+        stream: botocore StreamingBody of an event-stream response.
+
+    Returns:
+        str: The concatenated data of all events.
+    """
+    parts = []
+    for line in stream.iter_lines():
+        if not line.startswith(b"data: "):
+            continue
+        data = line[6:]
+        try:
+            data = orjson.loads(data)
+        except orjson.JSONDecodeError:
+            data = data.decode("utf-8")
+        parts.append(data if isinstance(data, str) else orjson.dumps(data).decode("utf-8"))
+    return "".join(parts)
+
+
+def _call_sub_agent_runtime(runtime_arn: str, intent: str, tool_name: str) -> any:
+    """Call the sub-agent runtime once, without caching."""
     # Generate unique session identifier for tracking and audit purposes
     session_id = f"nl-{uuid.uuid4().hex}{uuid.uuid4().hex[:8]}"
-    payload = json.dumps({"prompt": intent, "session_id": session_id})
+    payload = orjson.dumps({"prompt": intent, "session_id": session_id})
     
     # Prepare invocation parameters for Bedrock Agent Runtime
     kwargs = {
-        "agentRuntimeArn": SC_PRC_PROFILE_AGENT_RUNTIME_ARN,
+        "agentRuntimeArn": runtime_arn,
         "runtimeSessionId": session_id,
         "payload": payload,
     }
     body = None
     
     try:
-        # Invoke the Profile Agent via AWS Bedrock
-        resp = agentcore_client.invoke_agent_runtime(**kwargs)
-        body = resp["response"].read()
-        return json.loads(body.decode("utf-8") if isinstance(body, (bytes, bytearray)) else body)
+        # Invoke the sub-agent via AWS Bedrock, bounded by the concurrency limit
+        with _sub_agent_slots:
+            resp = agentcore_client.invoke_agent_runtime(**kwargs)
+            if resp.get("contentType", "").startswith("text/event-stream"):
+                # Streaming sub-agents: decode each event as it arrives
+                # instead of buffering the whole stream first.
+                return _extract_json(_read_event_stream(resp["response"]))
+            body = resp["response"].read()
+        # orjson parses the raw response bytes directly, no decode pass needed
+        return _extract_json(orjson.loads(body))
     except Exception as e:
         # Handle errors gracefully and return error response
         if body:
-            return {"result": body.decode("utf-8") if isinstance(body, (bytes, bytearray)) else str(body)}
+            text = body.decode("utf-8") if isinstance(body, (bytes, bytearray)) else str(body)
+            extracted = _extract_json(text)
+            return extracted if extracted is not text else {"result": text}
         else:
-            return {"error": f"profile_agent_tool failed: {str(e)}", "status": "error"}
+            return {"error": f"{tool_name} failed: {str(e)}", "status": "error"}
 
 
 @tool
-def prescribe_agent_tool(intent: str) -> any:
+async def profile_agent_tool(intent: str) -> any:
+    """
+    Invoke the Profile Agent to retrieve HCP demographic and profile information.
+    
+    The Profile Agent returns information about healthcare provider demographics,
+    specialty, practice details, and network influence metrics.
+
+    Args:
+        intent (str): Natural language query to be processed by the Profile Agent.
+
+    Returns:
+        dict: Response from the Profile Agent containing profile data or error details.
+    """
+    return await asyncio.to_thread(_invoke_sub_agent, SC_PRC_PROFILE_AGENT_ARN, intent, "profile_agent_tool")
+
+
+@tool
+async def prescribe_agent_tool(intent: str) -> any:
     """
     Invoke the Prescribing Agent to retrieve prescribing trends and behavior data.
     
@@ -479,33 +673,11 @@ def prescribe_agent_tool(intent: str) -> any:
     Returns:
         dict: Response from the Prescribing Agent containing prescribing analytics or error details.
     """
-    # Generate unique session identifier for tracking and audit purposes
-    session_id = f"nl-{uuid.uuid4().hex}{uuid.uuid4().hex[:8]}"
-    payload = json.dumps({"prompt": intent, "session_id": session_id})
-    
-    # Prepare invocation parameters for Bedrock Agent Runtime
-    kwargs = {
-        "agentRuntimeArn": SC_PRC_PRESCRIBE_AGENT_RUNTIME_ARN,
-        "runtimeSessionId": session_id,
-        "payload": payload,
-    }
-    body = None
-    
-    try:
-        # Invoke the Prescribing Agent via AWS Bedrock
-        resp = agentcore_client.invoke_agent_runtime(**kwargs)
-        body = resp["response"].read()
-        return json.loads(body.decode("utf-8") if isinstance(body, (bytes, bytearray)) else body)
-    except Exception as e:
-        # Handle errors gracefully and return error response
-        if body:
-            return {"result": body.decode("utf-8") if isinstance(body, (bytes, bytearray)) else str(body)}
-        else:
-            return {"error": f"prescribe_agent_tool failed: {str(e)}", "status": "error"}
+    return await asyncio.to_thread(_invoke_sub_agent, SC_PRC_PRESCRIBE_AGENT_ARN, intent, "prescribe_agent_tool")
 
 
 @tool
-def history_agent_tool(intent: str) -> any:
+async def history_agent_tool(intent: str) -> any:
     """
     Invoke the History Agent to retrieve interaction history and engagement data.
     
@@ -518,33 +690,11 @@ def history_agent_tool(intent: str) -> any:
     Returns:
         dict: Response from the History Agent containing interaction history or error details.
     """
-    # Generate unique session identifier for tracking and audit purposes
-    session_id = f"nl-{uuid.uuid4().hex}{uuid.uuid4().hex[:8]}"
-    payload = json.dumps({"prompt": intent, "session_id": session_id})
-    
-    # Prepare invocation parameters for Bedrock Agent Runtime
-    kwargs = {
-        "agentRuntimeArn": SC_PRC_HISTORY_AGENT_RUNTIME_ARN,
-        "runtimeSessionId": session_id,
-        "payload": payload,
-    }
-    body = None
-    
-    try:
-        # Invoke the History Agent via AWS Bedrock
-        resp = agentcore_client.invoke_agent_runtime(**kwargs)
-        body = resp["response"].read()
-        return json.loads(body.decode("utf-8") if isinstance(body, (bytes, bytearray)) else body)
-    except Exception as e:
-        # Handle errors gracefully and return error response
-        if body:
-            return {"result": body.decode("utf-8") if isinstance(body, (bytes, bytearray)) else str(body)}
-        else:
-            return {"error": f"history_agent_tool failed: {str(e)}", "status": "error"}
+    return await asyncio.to_thread(_invoke_sub_agent, SC_PRC_HISTORY_AGENT_ARN, intent, "history_agent_tool")
 
 
 @tool
-def access_agent_tool(intent: str) -> any:
+async def access_agent_tool(intent: str) -> any:
     """
     Invoke the Access Agent to retrieve formulary and coverage information.
     
@@ -557,33 +707,11 @@ def access_agent_tool(intent: str) -> any:
     Returns:
         dict: Response from the Access Agent containing access/formulary data or error details.
     """
-    # Generate unique session identifier for tracking and audit purposes
-    session_id = f"nl-{uuid.uuid4().hex}{uuid.uuid4().hex[:8]}"
-    payload = json.dumps({"prompt": intent, "session_id": session_id})
-    
-    # Prepare invocation parameters for Bedrock Agent Runtime
-    kwargs = {
-        "agentRuntimeArn": SC_PRC_ACCESS_AGENT_RUNTIME_ARN,
-        "runtimeSessionId": session_id,
-        "payload": payload,
-    }
-    body = None
-    
-    try:
-        # Invoke the Access Agent via AWS Bedrock
-        resp = agentcore_client.invoke_agent_runtime(**kwargs)
-        body = resp["response"].read()
-        return json.loads(body.decode("utf-8") if isinstance(body, (bytes, bytearray)) else body)
-    except Exception as e:
-        # Handle errors gracefully and return error response
-        if body:
-            return {"result": body.decode("utf-8") if isinstance(body, (bytes, bytearray)) else str(body)}
-        else:
-            return {"error": f"access_agent_tool failed: {str(e)}", "status": "error"}
+    return await asyncio.to_thread(_invoke_sub_agent, SC_PRC_ACCESS_AGENT_ARN, intent, "access_agent_tool")
 
 
 @tool
-def competitive_agent_tool(intent: str) -> any:
+async def competitive_agent_tool(intent: str) -> any:
     """
     Invoke the Competitive Agent to retrieve competitive threat intelligence.
     
@@ -596,33 +724,11 @@ def competitive_agent_tool(intent: str) -> any:
     Returns:
         dict: Response from the Competitive Agent containing competitive intelligence or error details.
     """
-    # Generate unique session identifier for tracking and audit purposes
-    session_id = f"nl-{uuid.uuid4().hex}{uuid.uuid4().hex[:8]}"
-    payload = json.dumps({"prompt": intent, "session_id": session_id})
-    
-    # Prepare invocation parameters for Bedrock Agent Runtime
-    kwargs = {
-        "agentRuntimeArn": SC_PRC_COMPETITIVE_AGENT_RUNTIME_ARN,
-        "runtimeSessionId": session_id,
-        "payload": payload,
-    }
-    body = None
-    
-    try:
-        # Invoke the Competitive Agent via AWS Bedrock
-        resp = agentcore_client.invoke_agent_runtime(**kwargs)
-        body = resp["response"].read()
-        return json.loads(body.decode("utf-8") if isinstance(body, (bytes, bytearray)) else body)
-    except Exception as e:
-        # Handle errors gracefully and return error response
-        if body:
-            return {"result": body.decode("utf-8") if isinstance(body, (bytes, bytearray)) else str(body)}
-        else:
-            return {"error": f"competitive_agent_tool failed: {str(e)}", "status": "error"}
+    return await asyncio.to_thread(_invoke_sub_agent, SC_PRC_COMPETITIVE_AGENT_ARN, intent, "competitive_agent_tool")
 
 
 @tool
-def content_agent_tool(intent: str) -> any:
+async def content_agent_tool(intent: str) -> any:
     """
     Invoke the Content Agent to retrieve recommended approved materials.
     
@@ -635,33 +741,11 @@ def content_agent_tool(intent: str) -> any:
     Returns:
         dict: Response from the Content Agent containing content recommendations or error details.
     """
-    # Generate unique session identifier for tracking and audit purposes
-    session_id = f"nl-{uuid.uuid4().hex}{uuid.uuid4().hex[:8]}"
-    payload = json.dumps({"prompt": intent, "session_id": session_id})
-    
-    # Prepare invocation parameters for Bedrock Agent Runtime
-    kwargs = {
-        "agentRuntimeArn": SC_PRC_CONTENT_AGENT_RUNTIME_ARN,
-        "runtimeSessionId": session_id,
-        "payload": payload,
-    }
-    body = None
-    
-    try:
-        # Invoke the Content Agent via AWS Bedrock
-        resp = agentcore_client.invoke_agent_runtime(**kwargs)
-        body = resp["response"].read()
-        return json.loads(body.decode("utf-8") if isinstance(body, (bytes, bytearray)) else body)
-    except Exception as e:
-        # Handle errors gracefully and return error response
-        if body:
-            return {"result": body.decode("utf-8") if isinstance(body, (bytes, bytearray)) else str(body)}
-        else:
-            return {"error": f"content_agent_tool failed: {str(e)}", "status": "error"}
+    return await asyncio.to_thread(_invoke_sub_agent, SC_PRC_CONTENT_AGENT_ARN, intent, "content_agent_tool")
 
 
 @tool
-def territory_agent_tool(intent: str) -> any:
+async def territory_agent_tool(intent: str) -> any:
     """
     Invoke the Territory Agent to identify territory and HCP prioritization.
     
@@ -675,56 +759,305 @@ def territory_agent_tool(intent: str) -> any:
     Returns:
         dict: Response from the Territory Agent containing territory/HCP prioritization or error details.
     """
-    # Generate unique session identifier for tracking and audit purposes
-    session_id = f"nl-{uuid.uuid4().hex}{uuid.uuid4().hex[:8]}"
-    payload = json.dumps({"prompt": intent, "session_id": session_id})
-    
-    # Prepare invocation parameters for Bedrock Agent Runtime
-    kwargs = {
-        "agentRuntimeArn": SC_PRC_TERRITORY_AGENT_RUNTIME_ARN,
-        "runtimeSessionId": session_id,
-        "payload": payload,
-    }
-    body = None
-    
-    try:
-        # Invoke the Territory Agent via AWS Bedrock
-        resp = agentcore_client.invoke_agent_runtime(**kwargs)
-        body = resp["response"].read()
-        return json.loads(body.decode("utf-8") if isinstance(body, (bytes, bytearray)) else body)
-    except Exception as e:
-        # Handle errors gracefully and return error response
-        if body:
-            return {"result": body.decode("utf-8") if isinstance(body, (bytes, bytearray)) else str(body)}
+    return await asyncio.to_thread(_invoke_sub_agent, SC_PRC_TERRITORY_AGENT_ARN, intent, "territory_agent_tool")
+
+
+# Sub-agent name -> (runtime ARN parameter, tool name), used for direct fan-out
+SUB_AGENTS = {
+    "profile": (SC_PRC_PROFILE_AGENT_ARN, "profile_agent_tool"),
+    "history": (SC_PRC_HISTORY_AGENT_ARN, "history_agent_tool"),
+    "prescribing": (SC_PRC_PRESCRIBE_AGENT_ARN, "prescribe_agent_tool"),
+    "access": (SC_PRC_ACCESS_AGENT_ARN, "access_agent_tool"),
+    "competitive": (SC_PRC_COMPETITIVE_AGENT_ARN, "competitive_agent_tool"),
+    "content": (SC_PRC_CONTENT_AGENT_ARN, "content_agent_tool"),
+    "territory": (SC_PRC_TERRITORY_AGENT_ARN, "territory_agent_tool"),
+}
+
+
+async def fan_out_sub_agents(agent_names: list, instruction: str):
+    """
+    Invoke several sub-agents concurrently with the same instruction.
+
+    Each blocking runtime invocation runs in a worker thread, so the HTTP
+    latencies of all sub-agents overlap instead of adding up.
+
+    Args:
+        agent_names (list): Keys of SUB_AGENTS to invoke.
+        instruction (str): Natural language query forwarded to every sub-agent.
+
+    Yields:
+        tuple: (sub-agent name, response, served from cache), cache hits
+               first, then the invoked sub-agents in completion order.
+    """
+    async def _call(name):
+        arn_parameter, tool_name = SUB_AGENTS[name]
+        return name, await asyncio.to_thread(_invoke_sub_agent, arn_parameter, instruction, tool_name), False
+
+    pending = []
+    for name in agent_names:
+        cached = _cached_sub_agent_result(_sub_agent_cache_key(SUB_AGENTS[name][1], instruction))
+        if cached is not None:
+            yield name, cached, True
         else:
-            return {"error": f"territory_agent_tool failed: {str(e)}", "status": "error"}
+            pending.append(name)
+    for finished in asyncio.as_completed([_call(name) for name in pending]):
+        yield await finished
 
 
 # =====================================================================
-# Agent Initialization
+# Deterministic Intent Classification
 # =====================================================================
+# Sub-agents each intent needs (STEP 1 "Call Agents" of the prompt)
+INTENT_AGENTS = {
+    "pre_call_brief": ["profile", "history", "prescribing", "access", "competitive", "content"],
+    "hcp_profile": ["profile"],
+    "profile_with_history": ["profile", "history"],
+    "prescribing_trends": ["prescribing"],
+    "access_intelligence": ["access"],
+    "competitive_intel": ["competitive"],
+    "content_materials": ["content"],
+    "history_interactions": ["history"],
+    "clinical_or_priority_insights": ["profile", "prescribing", "content"],
+    "call_objective_recommendation": ["prescribing", "access", "competitive", "history", "content"],
+    "relationship_mapping": ["profile"],
+    "topic_similarity": ["history"],
+    "territory_prioritization": ["territory"],
+}
+
+
+# ---------------------------------------------------------------------
+# Semantic routing. NLQs that match no keyword are embedded and compared
+# with the catalog's example NLQs (INTENT_EXAMPLES); a close enough match is
+# routed like a keyword match. Only NLQs below the threshold reach the LLM
+# orchestrator and its full intent-catalog prompt.
+# ---------------------------------------------------------------------
+SEMANTIC_ROUTER_THRESHOLD = float(os.getenv("SEMANTIC_ROUTER_THRESHOLD", "0.75"))
+EMBED_MODEL_PARAMETER = "SALES_COPILOT_BEDROCK_EMBED_MODEL"
+bedrock_runtime_client = boto_session.client("bedrock-runtime", config=BOTO_CONFIG)
+
+# (embed model id, unit-row exemplar matrix, intent per row); built on the
+# first NLQ that needs it
+_exemplar_index = None
+_exemplar_index_lock = threading.Lock()
+# When the model id could not be read or no example could be embedded (e.g.
+# SSM or Bedrock throttling), the build is not retried before this monotonic
+# time, so keyword misses do not each re-embed every example while holding
+# the lock
+EXEMPLAR_INDEX_RETRY_SECONDS = 60
+_exemplar_index_retry_at = 0.0
+
+
+def _embed_text(model_id: str, text: str):
+    """Return the unit-length embedding of text, or None if embedding fails."""
+    try:
+        response = bedrock_runtime_client.invoke_model(
+            modelId=model_id, body=orjson.dumps({"inputText": text})
+        )
+        body = orjson.loads(response["body"].read())
+        vector = body.get("embedding") or body.get("outputTextEmbedding", {}).get("embedding")
+    except Exception:
+        return None
+    if not vector:
+        return None
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else None
+
+
+def _get_exemplar_index():
+    """Embed the example NLQs once; returns None if they are unavailable."""
+    global _exemplar_index, _exemplar_index_retry_at
+    if _exemplar_index is None and time.monotonic() >= _exemplar_index_retry_at:
+        with _exemplar_index_lock:
+            if _exemplar_index is None and time.monotonic() >= _exemplar_index_retry_at:
+                parameters = get_parameter_values([EMBED_MODEL_PARAMETER])
+                if parameters is None:
+                    # SSM error: retry later rather than giving up on embeddings
+                    _exemplar_index_retry_at = time.monotonic() + EXEMPLAR_INDEX_RETRY_SECONDS
+                    return None
+                model_id = parameters.get(EMBED_MODEL_PARAMETER)
+                if not model_id:
+                    # Not configured: route by keywords only from now on
+                    _exemplar_index = ()
+                    return None
+                pairs = [(intent, text) for intent, texts in INTENT_EXAMPLES.items() for text in texts]
+                with ThreadPoolExecutor(max_workers=TOOL_CONCURRENCY_LIMIT) as executor:
+                    vectors = list(executor.map(lambda p: _embed_text(model_id, p[1]), pairs))
+                # Examples that failed to embed are left out of the index
+                kept = [(intent, v) for (intent, _), v in zip(pairs, vectors) if v is not None]
+                if not kept:
+                    _exemplar_index_retry_at = time.monotonic() + EXEMPLAR_INDEX_RETRY_SECONDS
+                    return None
+                _exemplar_index = (model_id, np.stack([v for _, v in kept]), tuple(intent for intent, _ in kept))
+    return _exemplar_index or None
+
+
+def route_intent(nlq: str) -> str:
+    """
+    Classify an NLQ by keywords, then by similarity to the example NLQs.
+
+    Queries whose keywords decisively match several intents skip the
+    similarity step: the nearest example would pick just one of them, while
+    the LLM orchestrator can answer every part of the question.
+
+    Args:
+        nlq (str): The user's natural language query.
 
-def _tools_list():
+    Returns:
+        str: The routed intent, or FALLBACK_INTENT when neither the keywords
+             nor the nearest example (cosine >= SEMANTIC_ROUTER_THRESHOLD)
+             identify one.
     """
-    Return the list of available tool functions for the Strategy Agent.
-    
-    This function maintains a single source of truth for all available tools
-    that the Strategy Agent can invoke. The order reflects no priority but
-    aids in maintainability.
+    matched = match_intents(nlq)
+    if len(matched) == 1:
+        return matched[0]
+    if matched:
+        return FALLBACK_INTENT
+    index = _get_exemplar_index()
+    if index is None:
+        return FALLBACK_INTENT
+    model_id, exemplars, intents = index
+    query = _embed_text(model_id, nlq)
+    if query is None:
+        return FALLBACK_INTENT
+    scores = exemplars @ query
+    best = int(np.argmax(scores))
+    return intents[best] if scores[best] >= SEMANTIC_ROUTER_THRESHOLD else FALLBACK_INTENT
+
+
+def _build_merge_instruction(nlq: str, intent: str, outputs: dict) -> str:
+    """
+    Build the merge-agent instruction from the sub-agent outputs.
+
+    Args:
+        nlq (str): The user's natural language query.
+        intent (str): The classified intent.
+        outputs (dict): Sub-agent name mapped to its response.
 
     Returns:
-        list: List of tool functions (profile, prescribing, history, territory,
-              access, content, and competitive agent tools).
-    """
-    return [
-        profile_agent_tool,
-        prescribe_agent_tool,
-        history_agent_tool,
-        territory_agent_tool,
-        access_agent_tool,
-        content_agent_tool,
-        competitive_agent_tool,
+        str: Instruction containing the question and every agent output.
+    """
+    sections = [
+        f"User question: {nlq}",
+        f"Intent `{intent}` selected by router; use only the outputs of the agents "
+        f"listed: {', '.join(outputs)}.",
+        "",
+        "Agent outputs:",
     ]
+    for name, result in outputs.items():
+        text = result if isinstance(result, str) else orjson.dumps(
+            result, default=str, option=orjson.OPT_NON_STR_KEYS
+        ).decode("utf-8")
+        sections.append(f"### {name} agent\n{text}")
+    return "\n".join(sections)
+
+
+# Routed intents whose answer needs an LLM pass over the agent outputs (the
+# call objective is synthesized from five agents). Other intents that call
+# several agents are rendered from the outputs in Python, so the merge LLM
+# is not on their path at all.
+SYNTHESIS_INTENTS = frozenset({"call_objective_recommendation"})
+
+AGENT_TITLES = {
+    "profile": "Profile",
+    "history": "History",
+    "prescribing": "Prescribing",
+    "access": "Access",
+    "competitive": "Competitive",
+    "content": "Content",
+    "territory": "Territory",
+}
+_CITATION_KEYS = ("citation", "Source", "source")
+
+
+# Escapes for a markdown table cell, applied in one str.translate pass
+_CELL_ESCAPES = str.maketrans({"|": "\\|", "\n": " "})
+
+
+def _cell(value) -> str:
+    text = value if isinstance(value, str) else orjson.dumps(value, default=str).decode("utf-8")
+    return text.translate(_CELL_ESCAPES)
+
+
+def _render_output(result) -> str:
+    """Markdown for one agent output: a table when it is tabular, else JSON."""
+    if isinstance(result, dict) and {"ref", "sample"} <= result.keys():
+        # Offloaded payload: show the sample and where the rest lives
+        return f"{_render_output(result['sample'])}\n\nFull output: {result['ref']}"
+    rows = result if isinstance(result, list) else [result] if isinstance(result, dict) else None
+    if rows and all(
+        isinstance(row, dict) and not any(isinstance(v, (dict, list)) for v in row.values())
+        for row in rows
+    ):
+        if len(rows) == 1:
+            lines = ["| Field | Value |", "|-------|-------|"]
+            lines += [f"| {_cell(k)} | {_cell(v)} |" for k, v in rows[0].items()]
+        else:
+            columns = list(dict.fromkeys(k for row in rows for k in row))
+            lines = [
+                "| " + " | ".join(_cell(c) for c in columns) + " |",
+                "|" + "|".join("---" for _ in columns) + "|",
+            ]
+            lines += ["| " + " | ".join(_cell(row.get(c, "")) for c in columns) + " |" for row in rows]
+        return "\n".join(lines)
+    if isinstance(result, str):
+        return result
+    return "```json\n" + orjson.dumps(result, default=str, option=orjson.OPT_INDENT_2).decode("utf-8") + "\n```"
+
+
+def _render_agent_outputs(intent: str, outputs: dict) -> str:
+    """
+    Render sub-agent outputs as markdown without an LLM call.
+
+    Args:
+        intent (str): The classified intent.
+        outputs (dict): Sub-agent name mapped to its response, in call order.
+
+    Returns:
+        str: One section per agent followed by the citations found in the outputs.
+    """
+    sections = [f"_Intent: {intent}_"]
+    citations = []
+    for name, result in outputs.items():
+        title = AGENT_TITLES.get(name, name)
+        sections.append(f"### {title}\n{_render_output(result)}")
+        if isinstance(result, dict):
+            source = next((result[k] for k in _CITATION_KEYS if result.get(k)), None)
+            if source:
+                citations.append(f"- {title}: {_cell(source)}")
+    if citations:
+        sections.append("### CITATION\n" + "\n".join(citations))
+    return "\n\n".join(sections) + "\n"
+
+
+# =====================================================================
+# Agent Initialization
+# =====================================================================
+
+# The system prompts are static (the NLQ is only ever sent as the user
+# message), so a cache point is placed right after the system prompt and
+# Bedrock reuses the cached prefix across requests instead of re-reading it.
+model = BedrockModel(
+    streaming=True,
+    cache_prompt="default",
+    boto_session=boto_session,
+    boto_client_config=BOTO_CONFIG,
+)
+
+
+# Single source of truth for the tools the orchestrator can invoke. Built once
+# at import; queries routed by route_intent() bypass the orchestrator and
+# never send these tool schemas to the model.
+STRATEGY_TOOLS = (
+    profile_agent_tool,
+    prescribe_agent_tool,
+    history_agent_tool,
+    territory_agent_tool,
+    access_agent_tool,
+    content_agent_tool,
+    competitive_agent_tool,
+    resolve_handle,
+)
 
 
 def create_strategy_agent():
@@ -733,17 +1066,35 @@ def create_strategy_agent():
     
     The Strategy Agent operates as an orchestrator that classifies user intents
     and selectively invokes only the necessary sub-agents based on the CLOSED WORLD
-    model defined in the system prompt.
+    model defined in the system prompt. Tool calls emitted in the same turn are
+    executed concurrently (bounded by TOOL_CONCURRENCY_LIMIT).
 
     Returns:
         Agent: Configured Strategy Agent ready to process user queries.
     """
     return Agent(
+        model=model,
         system_prompt=STRATEGY_AGENT_PROMPT,
-        tools=_tools_list(),
+        tools=list(STRATEGY_TOOLS),
+        tool_executor=ConcurrentToolExecutor(),
     )
 
 
+def create_merge_agent():
+    """
+    Create an agent that merges pre-fetched sub-agent outputs.
+
+    Used when route_intent() has already routed the query, so the only LLM
+    call left is the final merge/summarize pass. A fresh agent is created per
+    request so no conversation state leaks between users.
+
+    Returns:
+        Agent: Agent configured with the merge prompt and only the
+               resolve_handle tool for expanding offloaded payloads.
+    """
+    return Agent(model=model, system_prompt=MERGE_AGENT_PROMPT, tools=[resolve_handle])
+
+
 # Instantiate the Strategy Agent globally for use in endpoints
 agent = create_strategy_agent()
 # =====================================================================
@@ -770,57 +1121,242 @@ def create_chunk(chunk_type: ChunkType, data: str):
     else:
         return f"[LOG] {data}\n"
 
+async def _stream_agent(agent_instance, prompt: str, start_time: float):
+    """Stream one agent run as content and log chunks.
+
+    Args:
+        agent_instance (Agent): The agent to run.
+        prompt (str): The instruction passed to the agent.
+        start_time (float): Request start time used for the metrics summary.
+
+    Yields:
+        str: Structured chunks of log or content data.
+    """
+    tool_calls = {}
+    # Stream deltas carry no tool id, so track the block currently open.
+    current_tool_id = None
+    stream = agent_instance.stream_async(prompt)
+    
+    async for chunk in stream:
+        parsed_result = parse_chunk(chunk)
+        
+        if parsed_result["type"] == "content":
+            yield create_chunk(ChunkType.CONTENT, parsed_result["data"])
+        elif parsed_result["type"] == "tool_start":
+            current_tool_id = parsed_result["tool_id"]
+            tool_calls[current_tool_id] = {
+                "name": parsed_result["tool_name"],
+                # Input deltas are buffered and joined once when the block
+                # closes instead of re-concatenating the string per delta.
+                "input_parts": [],
+                "start_time": time.time()
+            }
+            yield create_chunk(ChunkType.LOG, f"🔧 {parsed_result['tool_name']} starting...")
+        elif parsed_result["type"] == "tool_input":
+            if current_tool_id in tool_calls:
+                tool_calls[current_tool_id]["input_parts"].append(parsed_result["input_part"])
+        elif parsed_result["type"] == "tool_complete":
+            if current_tool_id in tool_calls:
+                tool_call = tool_calls[current_tool_id]
+                tool_input = "".join(tool_call.pop("input_parts"))
+                try:
+                    tool_input = orjson.loads(tool_input).get("intent", tool_input)
+                except (orjson.JSONDecodeError, AttributeError):
+                    pass
+                duration = time.time() - tool_call["start_time"]
+                yield create_chunk(ChunkType.LOG, f"✅ {tool_call['name']} completed")
+                yield create_chunk(ChunkType.LOG, f"   Input: {tool_input}")
+                yield create_chunk(ChunkType.LOG, f"   Duration: {duration:.3f}s")
+            current_tool_id = None
+        elif parsed_result["type"] == "tool_result":
+            result = parsed_result["result"]
+            yield create_chunk(ChunkType.LOG, f"   Result: {result}")
+        elif parsed_result["type"] == "metrics":
+            total_time = time.time() - start_time
+            metrics_summary = format_metrics(parsed_result["data"], len(tool_calls), total_time)
+            yield create_chunk(ChunkType.LOG, metrics_summary)
+
+
+async def _answer_prompt(orchestrator, prompt: str, start_time: float):
+    """Answer one NLQ, yielding log and content chunks.
+
+    Queries that route_intent() can route (by keyword or by similarity to the
+    example NLQs) call the required sub-agents directly. Multi-agent intents
+    outside SYNTHESIS_INTENTS are rendered in Python; the rest use the LLM
+    only to merge the agent outputs.
+    All other queries go through the LLM orchestrator.
+
+    Args:
+        orchestrator (Agent): Strategy agent used for queries that cannot be routed.
+        prompt (str): The user's natural language query.
+        start_time (float): Request start time used for the metrics summary.
+
+    Yields:
+        str: Structured chunks of log or content data.
+    """
+    intent = await asyncio.to_thread(route_intent, prompt)
+    if intent == FALLBACK_INTENT:
+        async for chunk in _stream_agent(orchestrator, prompt, start_time):
+            yield chunk
+        return
+
+    agent_names = INTENT_AGENTS[intent]
+    yield create_chunk(ChunkType.LOG, f"🧭 Intent: {intent} → {', '.join(agent_names)}")
+    cache_key = _answer_cache_key(intent, prompt)
+    if cache_key is not None and not _force_refresh.get():
+        cached = _cache_get(cache_key, _answer_cache)
+        if cached is not None:
+            # ~4 characters per token; the tokens the skipped LLM pass would have written
+            yield create_chunk(
+                ChunkType.LOG, f"♻️ cached=true (answer cache hit, ~{len(cached) // 4} output tokens saved)"
+            )
+            yield create_chunk(ChunkType.CONTENT, cached)
+            return
+
+    completed = {}
+    async for name, result, cached in fan_out_sub_agents(agent_names, prompt):
+        completed[name] = result
+        if cached:
+            yield create_chunk(ChunkType.LOG, f"♻️ {name} agent served from cache")
+            continue
+        yield create_chunk(
+            ChunkType.LOG, f"✅ {name} agent completed ({time.time() - start_time:.3f}s)"
+        )
+    outputs = {name: completed[name] for name in agent_names}
+
+    # Answers built from a failed sub-agent call are not cached
+    cacheable = cache_key is not None and not any(
+        isinstance(r, dict) and r.get("status") == "error" for r in outputs.values()
+    )
+    if len(agent_names) > 1 and intent not in SYNTHESIS_INTENTS:
+        answer = _render_agent_outputs(intent, outputs)
+        if cacheable:
+            _cache_put(cache_key, answer, _answer_cache, ANSWER_CACHE_TTL, ANSWER_CACHE_MAXSIZE)
+        yield create_chunk(ChunkType.CONTENT, answer)
+        yield create_chunk(ChunkType.LOG, f"Total time: {time.time() - start_time:.3f}s")
+        return
+
+    merge_instruction = _build_merge_instruction(prompt, intent, outputs)
+    content = []
+    async for chunk in _stream_agent(create_merge_agent(), merge_instruction, start_time):
+        if not chunk.startswith("[LOG] "):
+            content.append(chunk)
+        yield chunk
+    if cacheable and content:
+        _cache_put(cache_key, "".join(content), _answer_cache, ANSWER_CACHE_TTL, ANSWER_CACHE_MAXSIZE)
+
+
+PROMPT_MIN_LENGTH = 3
+PROMPT_MAX_LENGTH = 2048
+
+
+def _validate_prompt(prompt) -> dict:
+    """
+    Check a prompt before any model or sub-agent call is made.
+
+    Args:
+        prompt (any): The "prompt" value from the payload.
+
+    Returns:
+        dict or None: Error details if the prompt is unusable, otherwise None.
+    """
+    if not isinstance(prompt, str) or not prompt.strip():
+        return {"error": "No prompt", "status": "missing_parameters", "required": ["prompt"]}
+    if not PROMPT_MIN_LENGTH <= len(prompt.strip()) <= PROMPT_MAX_LENGTH:
+        return {
+            "error": f"Prompt must be {PROMPT_MIN_LENGTH}-{PROMPT_MAX_LENGTH} characters",
+            "status": "invalid_parameters",
+        }
+    return None
+
+
+# Maximum number of batch prompts answered at the same time. Each prompt can
+# fan out to several sub-agents (bounded separately by TOOL_CONCURRENCY_LIMIT),
+# so this keeps a large batch from queueing hundreds of model calls at once.
+BATCH_CONCURRENCY_LIMIT = int(os.getenv("BATCH_CONCURRENCY_LIMIT", "4"))
+
+
+def _batch_dispatch_key(prompt) -> tuple:
+    """Group batch prompts that will call the same agents.
+
+    Prompts routed to the same sub-agents (and fallback prompts, which all go
+    through the orchestrator) are dispatched back to back, so each agent's
+    fixed system prompt is still in the model's prompt cache for the next one.
+    """
+    intent = classify_intent(prompt) if isinstance(prompt, str) else FALLBACK_INTENT
+    return (tuple(INTENT_AGENTS.get(intent, ())), intent)
+
+
+async def run_batch(prompts: list):
+    """Answer a list of NLQs concurrently.
+
+    Args:
+        prompts (list): Natural language queries to answer.
+
+    Yields:
+        str: One JSON line per prompt, {"index", "prompt", "response"} or
+             {"index", "prompt", "error"}, in completion order.
+    """
+    slots = asyncio.Semaphore(BATCH_CONCURRENCY_LIMIT)
+
+    async def _run_one(index: int, prompt: str) -> dict:
+        error = _validate_prompt(prompt)
+        if error:
+            return {"index": index, "prompt": prompt, **error}
+        async with slots:
+            try:
+                # Agents keep conversation state, so every fallback prompt
+                # gets its own orchestrator instead of sharing the global one.
+                content = []
+                async for chunk in _answer_prompt(create_strategy_agent(), prompt, time.time()):
+                    if not chunk.startswith("[LOG] "):
+                        content.append(chunk)
+                return {"index": index, "prompt": prompt, "response": "".join(content)}
+            except Exception as e:
+                return {"index": index, "prompt": prompt, "error": str(e)}
+
+    # Tasks are started in dispatch-key order and the semaphore admits them
+    # first come, first served, so same-agent prompts run next to each other.
+    # Results still carry their original index.
+    dispatch_order = sorted(enumerate(prompts), key=lambda item: _batch_dispatch_key(item[1]))
+    tasks = [asyncio.create_task(_run_one(i, p)) for i, p in dispatch_order]
+    for finished in asyncio.as_completed(tasks):
+        yield orjson.dumps(await finished).decode("utf-8") + "\n"
+
+
 @app.entrypoint
 async def invoke(payload: dict = {}):
     """Main entry point for invoking the strategy agent.
 
+    A payload with a "prompts" list is answered as a batch (see run_batch);
+    otherwise the single "prompt" is streamed. "force_refresh": true skips the
+    answer and sub-agent caches and re-runs the sub-agents.
+
     Args:
-        payload (dict): The input payload containing the prompt for the agent.
+        payload (dict): The input payload containing the prompt (or prompts) for the agent.
 
     Yields:
         str: Structured chunks of log or content data as the agent processes the request.
     """
-    prompt = payload.get("prompt", "")
-    tool_calls = {}
+    _force_refresh.set(bool(payload.get("force_refresh")))
+    if isinstance(payload.get("prompts"), list):
+        async for line in run_batch(payload["prompts"]):
+            yield line
+        return
+
+    prompt = payload.get("prompt")
+    error = _validate_prompt(prompt)
+    if error:
+        yield orjson.dumps(error).decode("utf-8")
+        return
+
     start_time = time.time()
     
     yield create_chunk(ChunkType.LOG, "Agent started")
 
     try:
-        stream = agent.stream_async(prompt)
-        
-        async for chunk in stream:
-            parsed_result = parse_chunk(chunk)
-            
-            if parsed_result["type"] == "content":
-                yield create_chunk(ChunkType.CONTENT, parsed_result["data"])
-            elif parsed_result["type"] == "tool_start":
-                tool_id = parsed_result["tool_id"]
-                tool_calls[tool_id] = {
-                    "name": parsed_result["tool_name"],
-                    "input": "",
-                    "start_time": time.time()
-                }
-                yield create_chunk(ChunkType.LOG, f"🔧 {parsed_result['tool_name']} starting...")
-            elif parsed_result["type"] == "tool_input":
-                tool_id = parsed_result["tool_id"]
-                if tool_id in tool_calls:
-                    tool_calls[tool_id]["input"] += parsed_result["input_part"]
-            elif parsed_result["type"] == "tool_complete":
-                tool_id = parsed_result["tool_id"]
-                if tool_id in tool_calls:
-                    tool_call = tool_calls[tool_id]
-                    duration = time.time() - tool_call["start_time"]
-                    yield create_chunk(ChunkType.LOG, f"✅ {tool_call['name']} completed")
-                    yield create_chunk(ChunkType.LOG, f"   Input: {tool_call['input']}")
-                    yield create_chunk(ChunkType.LOG, f"   Duration: {duration:.3f}s")
-            elif parsed_result["type"] == "tool_result":
-                result = parsed_result["result"]
-                yield create_chunk(ChunkType.LOG, f"   Result: {result}")
-            elif parsed_result["type"] == "metrics":
-                total_time = time.time() - start_time
-                metrics_summary = format_metrics(parsed_result["data"], len(tool_calls), total_time)
-                yield create_chunk(ChunkType.LOG, metrics_summary)
+        async for chunk in _answer_prompt(agent, prompt, start_time):
+            yield chunk
                 
     except Exception as e:
         yield create_chunk(ChunkType.LOG, f"❌ Error: {str(e)}")
@@ -867,7 +1403,7 @@ def parse_chunk(chunk):
                 if 'text' in delta:
                     return {"type": "content", "data": delta['text']}
                 elif 'toolUse' in delta:
-                    return {"type": "tool_input", "tool_id": "current", "input_part": delta['toolUse'].get('input', '')}
+                    return {"type": "tool_input", "input_part": delta['toolUse'].get('input', '')}
             elif 'contentBlockStart' in event:
                 start = event['contentBlockStart']['start']
                 if 'toolUse' in start:
@@ -878,10 +1414,10 @@ def parse_chunk(chunk):
                         "tool_name": tool_use['name']
                     }
             elif 'contentBlockStop' in event:
-                return {"type": "tool_complete", "tool_id": "current"}
+                return {"type": "tool_complete"}
             elif 'metadata' in event:
                 return {"type": "metrics", "data": event['metadata']}
-        elif 'message' in chunk and 'toolResult' in str(chunk):
+        elif 'message' in chunk:
             # Extract tool results
             content = chunk['message'].get('content', [])
             for item in content:
@@ -913,6 +1449,25 @@ def parse_chunk(chunk):
 # Local Development and Testing
 # =====================================================================
 
+async def _run_local(prompt: str, repeat: int) -> None:
+    """Answer a prompt locally `repeat` times, printing the answer and latency."""
+    for run in range(1, repeat + 1):
+        start = time.time()
+        async for chunk in invoke({"prompt": prompt}):
+            print(chunk, end="", flush=True)
+        print(f"\n[run {run}/{repeat}] {time.time() - start:.2f}s")
+
+
 if __name__ == "__main__":
-    # Start the application server when run locally
-    app.run()
+    # `python strategy_agent.py "<prompt>" [--repeat N]` answers the prompt
+    # locally (useful for latency checks); without a prompt the server starts.
+    parser = argparse.ArgumentParser(description="Strategy Agent")
+    parser.add_argument("prompt", nargs="?", help="NLQ to answer locally instead of starting the server")
+    parser.add_argument("--repeat", type=int, default=1, help="Number of times to run the prompt")
+    args = parser.parse_args()
+
+    if args.prompt:
+        asyncio.run(_run_local(args.prompt, args.repeat))
+    else:
+        # Start the application server when run locally
+        app.run()
@@ -306,33 +306,8 @@ def retrieve_territory_context(query: str, top_k: int = 10, size: int = 100) ->
 # ---------------------------------------------------
 # 2) Agent Definition
 # ---------------------------------------------------
-def create_agent():
-    """
-    Create and configure the Territory Agent with system prompt and tools.
-
-    The Territory Agent is designed to:
-    1. Interpret natural language questions about HCP targeting and territory strategy
-    2. Use RAG to retrieve schema context from OpenSearch Serverless
-    3. Generate precise SQL queries against Redshift
-    4. Execute queries using the execute_redshift_sql tool
-    5. Return ranked and prioritized results with reason codes
-
-    The agent combines MCP-provided tools (execute_redshift_sql, etc.) with 
-    the retrieve_territory_context RAG tool for comprehensive data access.
-
-    Returns:
-        Agent: Configured Territory Agent instance ready to process user queries.
-    """
-    # Fetch M2M access token for MCP Gateway authentication
-    access_token = asyncio.run(fetch_m2m_token(access_token=""))
-    
-    # Initialize MCP client with streamable HTTP transport
-    mcp_client = MCPClient(lambda: create_streamable_http_transport(MCP_GATEWAY_URL, access_token))
-    mcp_client.__enter__()
-    
-    # Create and return the Agent with comprehensive system prompt and tools
-    return Agent(
-        system_prompt=f"""
+# System prompt, built once at import from the SSM configuration above.
+TERRITORY_AGENT_PROMPT = f"""
 ##Role:
 You are the Territory Agent.
 Your job is to interpret the user's natural language request about HCP targeting, 
@@ -409,7 +384,36 @@ query to fetch data from Redshift using the registered execute_redshift_sql tool
 ##Error Handling:
 - If retrieve_territory_context fails, proceed with basic schema knowledge
 - If execute_redshift_sql fails, return "Unable to fetch data, please try again"
-        """,
+        """
+
+
+def create_agent():
+    """
+    Create and configure the Territory Agent with system prompt and tools.
+
+    The Territory Agent is designed to:
+    1. Interpret natural language questions about HCP targeting and territory strategy
+    2. Use RAG to retrieve schema context from OpenSearch Serverless
+    3. Generate precise SQL queries against Redshift
+    4. Execute queries using the execute_redshift_sql tool
+    5. Return ranked and prioritized results with reason codes
+
+    The agent combines MCP-provided tools (execute_redshift_sql, etc.) with 
+    the retrieve_territory_context RAG tool for comprehensive data access.
+
+    Returns:
+        Agent: Configured Territory Agent instance ready to process user queries.
+    """
+    # Fetch M2M access token for MCP Gateway authentication
+    access_token = asyncio.run(fetch_m2m_token(access_token=""))
+    
+    # Initialize MCP client with streamable HTTP transport
+    mcp_client = MCPClient(lambda: create_streamable_http_transport(MCP_GATEWAY_URL, access_token))
+    mcp_client.__enter__()
+    
+    # Create and return the Agent with comprehensive system prompt and tools
+    return Agent(
+        system_prompt=TERRITORY_AGENT_PROMPT,
         tools=get_full_tools_list(mcp_client) + [retrieve_territory_context],
         tool_executor=SequentialToolExecutor()
     )
@@ -46,6 +46,7 @@ SECRET_ARN = (
 DEFAULT_SQL_LIMIT = 1000
 SQL_POLL_INTERVAL_SECONDS = 1.0
 SQL_POLL_MAX_SECONDS = 300.0
+redshift_client = boto3.client("redshift-data", region_name="us-east-1")
 
 # ----------------------
 # Helper: Redshift Data API tool
@@ -59,7 +60,7 @@ def execute_redshift_sql(sql_query: str, return_results: bool = True) -> Dict[st
     - sql_query: SQL string to execute (caller is responsible for safety/validation).
     - return_results: when False, only returns execution status.
     """
-    client = boto3.client("redshift-data",region_name="us-east-1")
+    client = redshift_client
     try:
         resp = client.execute_statement(
             WorkgroupName=WORKGROUP,
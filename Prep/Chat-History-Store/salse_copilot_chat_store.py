@@ -1,3 +1,5 @@
+import os
+import time
 import json
 import boto3
 import decimal
@@ -6,6 +8,10 @@ from datetime import datetime, timezone
 from boto3.dynamodb.conditions import Key, Attr
 import base64
 from typing import NamedTuple
+try:
+    import orjson
+except ImportError:  # plain-json fallback where the layer does not ship orjson
+    orjson = None
 
 # ---------- Logging Setup ----------
 LOGGER = logging.getLogger()
@@ -32,8 +38,10 @@ def get_parameter_value(parameter_name: str, decrypt: bool = True) -> str | None
         return None
 
 def log_event(event, note="event"):
+    if not LOGGER.isEnabledFor(logging.DEBUG):
+        return
     try:
-        snippet = json.dumps(event)[:2000]
+        snippet = _dumps(event)[:2000]
         LOGGER.debug(f"{note}: {snippet}")
     except Exception as e:
         LOGGER.debug(f"{note}: <unserializable> - {e}")
@@ -48,6 +56,19 @@ if not SESSION_TABLE_NAME or not MESSAGE_TABLE_NAME:
 sessions = dynamodb.Table(SESSION_TABLE_NAME)
 messages = dynamodb.Table(MESSAGE_TABLE_NAME)
 
+# Session lists are cached per warm container for a short time so the UI's
+# repeated GET /sessions calls skip the GSI query. Writes through this
+# container drop the user's entries; other containers catch up within the TTL
+# unless the request asks for ?fresh=1 (see handle_get_sessions).
+SESSION_LIST_CACHE_TTL_SECONDS = int(os.getenv("SESSION_LIST_CACHE_TTL_SECONDS", "30"))
+_session_list_cache = {}
+
+# Messages are never edited once written, so a session's history is kept per
+# warm container and only messages newer than the last cached timestamp are
+# read on the next GET; replaying a long chat fetches just the new turns.
+MESSAGE_CACHE_MAX_SESSIONS = int(os.getenv("MESSAGE_CACHE_MAX_SESSIONS", "256"))
+_message_cache = {}
+
 # -------- Utilities ---------
 
 def now_iso():
@@ -61,6 +82,15 @@ def json_default(obj):
         return int(obj) if obj == int(obj) else float(obj)
     return str(obj)
 
+def _dumps(obj) -> str:
+    if orjson is not None:
+        return orjson.dumps(obj, default=json_default).decode("utf-8")
+    return json.dumps(obj, default=json_default)
+
+def _loads(raw):
+    # orjson.JSONDecodeError subclasses json.JSONDecodeError
+    return orjson.loads(raw) if orjson is not None else json.loads(raw)
+
 def response(code, body):
     LOGGER.info(f"Response status={code}")
     return {
@@ -71,7 +101,7 @@ def response(code, body):
             "Access-Control-Allow-Headers": "*",
             "Access-Control-Allow-Methods": "GET,POST,DELETE,OPTIONS"
         },
-        "body": json.dumps(body, default=json_default)
+        "body": _dumps(body)
     }
 
 # -------- HTTP API v1 Parsing ---------
@@ -128,7 +158,7 @@ def parse_event(event) -> ParsedEvent:
         except Exception as e:
             LOGGER.warning(f"Failed to decode base64 body: {e}")
     try:
-        body = json.loads(body_raw) if body_raw else {}
+        body = _loads(body_raw) if body_raw else {}
     except json.JSONDecodeError as e:
         LOGGER.warning(f"Failed to parse JSON body: {e}")
         body = {}
@@ -167,12 +197,23 @@ def create_session(session_id, user_id, agent_id, title):
         "last_message_preview": ""
     }
     sessions.put_item(Item=item)
+    invalidate_session_list(user_id)
     LOGGER.info(f"Session created session_id={session_id} user_id={user_id} agent_id={agent_id}")
     return item
 
-def list_sessions(user_id, agent_id=None):
+def invalidate_session_list(user_id):
+    for key in [k for k in _session_list_cache if k[0] == user_id]:
+        del _session_list_cache[key]
+
+def list_sessions(user_id, agent_id=None, fresh=False):
     if not user_id:
         raise ValueError("user_id is required")
+
+    cache_key = (user_id, agent_id)
+    cached = _session_list_cache.get(cache_key)
+    if cached and not fresh and cached[0] > time.monotonic():
+        LOGGER.info(f"Listed {len(cached[1])} sessions for user_id={user_id} agent_id={agent_id} (cached)")
+        return cached[1]
     
     params = {
         "IndexName": "user_id-index",
@@ -196,6 +237,7 @@ def list_sessions(user_id, agent_id=None):
         if not last_key:
             break
     
+    _session_list_cache[cache_key] = (time.monotonic() + SESSION_LIST_CACHE_TTL_SECONDS, all_items)
     LOGGER.info(f"Listed {len(all_items)} sessions for user_id={user_id} agent_id={agent_id}")
     return all_items
 
@@ -240,13 +282,31 @@ def add_message(session_id, role, content):
 def fetch_messages(session_id):
     if not session_id:
         return []
-    
-    resp = messages.query(
-        KeyConditionExpression=Key("session_id").eq(session_id),
-        ScanIndexForward=True
-    )
-    LOGGER.info(f"Fetched {len(resp.get('Items', []))} messages session_id={session_id}")
-    return resp.get("Items", [])
+
+    cached = _message_cache.pop(session_id, [])
+    condition = Key("session_id").eq(session_id)
+    if cached:
+        condition = condition & Key("message_timestamp").gt(cached[-1]["message_timestamp"])
+    # Strongly consistent: an eventually consistent read could miss a
+    # just-written message, and once a newer one is cached the gt() condition
+    # would never fetch the missed one again
+    params = {"KeyConditionExpression": condition, "ScanIndexForward": True, "ConsistentRead": True}
+
+    new_items = []
+    while True:
+        resp = messages.query(**params)
+        new_items.extend(resp.get("Items", []))
+        last_key = resp.get("LastEvaluatedKey")
+        if not last_key:
+            break
+        params["ExclusiveStartKey"] = last_key
+
+    items = cached + new_items
+    while len(_message_cache) >= MESSAGE_CACHE_MAX_SESSIONS:
+        del _message_cache[next(iter(_message_cache))]
+    _message_cache[session_id] = items
+    LOGGER.info(f"Fetched {len(items)} messages session_id={session_id} new={len(new_items)}")
+    return items
 
 def delete_session_cascade(session_id, user_id):
     if not session_id or not user_id:
@@ -284,6 +344,8 @@ def delete_session_cascade(session_id, user_id):
             break
     
     sessions.delete_item(Key={"session_id": session_id})
+    invalidate_session_list(user_id)
+    _message_cache.pop(session_id, None)
     LOGGER.info(f"Session cascade deleted session_id={session_id} messages_count={total_deleted}")
     return True
 
@@ -310,8 +372,13 @@ def handle_get_sessions(user_id, qs):
     if not user_id:
         return response(400, {"error": "user_id required"})
     
+    # The list can be up to SESSION_LIST_CACHE_TTL_SECONDS stale when the
+    # session was created or updated through another warm container. Clients
+    # that need to see their own write right away (e.g. the first read after
+    # creating a session) pass ?fresh=1 to bypass the cache.
+    fresh = qs.get("fresh") in ("1", "true")
     try:
-        items = list_sessions(user_id, qs.get("agent_id"))
+        items = list_sessions(user_id, qs.get("agent_id"), fresh=fresh)
         return response(200, {"sessions": items})
     except ValueError as e:
         return response(400, {"error": str(e)})
@@ -344,6 +411,8 @@ def handle_post_messages(user_id, path, body):
     
     try:
         add_message(session_id, body["role"], body["content"])
+        # The session's updated_at and last_message_preview changed
+        invalidate_session_list(user_id)
         return response(201, {"ok": True})
     except ValueError as e:
         return response(400, {"error": str(e)})
@@ -1,4 +1,6 @@
+import hashlib
 import json
+import re
 import time
 import boto3
 
@@ -30,12 +32,54 @@ DATABASE = get_parameter_value("SC_REDSHIFT_DATABASE")
 # Redshift secret ARN for authentication retrieved from Parameter Store
 SECRET_ARN = get_parameter_value("SC_REDSHIFT_SECRET_ARN")
 
+# Reused by warm invocations
+redshift_client = boto3.client("redshift-data")
+
 # Default maximum number of rows to return from SQL queries
 DEFAULT_SQL_LIMIT = 1000
 # Interval (in seconds) between polling for query execution status
 SQL_POLL_INTERVAL_SECONDS = 0.5
 # Maximum time (in seconds) to wait for query execution to complete
 SQL_POLL_MAX_SECONDS = 30.0
+# Matches a star projection (SELECT *, SELECT DISTINCT *, SELECT t.*); COUNT(*) is not matched
+SELECT_STAR_PATTERN = re.compile(r"\bSELECT\s+(?:DISTINCT\s+)?(?:\w+\.)?\*", re.IGNORECASE)
+# Read-only statements whose results may be served from the result cache
+READ_ONLY_PATTERN = re.compile(r"^\s*(?:SELECT|WITH)\b", re.IGNORECASE)
+# How long (in seconds) a cached result stays valid in a warm Lambda container
+RESULT_CACHE_TTL_SECONDS = 60.0
+# Maximum number of cached results kept per container
+RESULT_CACHE_MAXSIZE = 256
+
+# Results of recent read-only queries keyed by SHA-1 of the SQL text, so
+# identical queries (e.g. repeated UI refreshes) skip the Data API round trips
+_result_cache = {}
+
+
+def _result_cache_get(key):
+    """
+    Return the cached response for key, or None if missing or expired.
+    """
+    entry = _result_cache.get(key)
+    if entry is None:
+        return None
+    expires_at, response = entry
+    if expires_at < time.monotonic():
+        del _result_cache[key]
+        return None
+    return response
+
+
+def _result_cache_put(key, response):
+    """
+    Cache a response, evicting expired entries and then the oldest ones when full.
+    """
+    if len(_result_cache) >= RESULT_CACHE_MAXSIZE:
+        now = time.monotonic()
+        for k in [k for k, (exp, _) in _result_cache.items() if exp < now]:
+            del _result_cache[k]
+        while len(_result_cache) >= RESULT_CACHE_MAXSIZE:
+            del _result_cache[next(iter(_result_cache))]
+    _result_cache[key] = (time.monotonic() + RESULT_CACHE_TTL_SECONDS, response)
 
 
 def lambda_handler(event, context):
@@ -67,8 +111,27 @@ def lambda_handler(event, context):
             "body": json.dumps({"error": "Missing 'sql_query' in request"})
         }
 
-    # Initialize Redshift Data API client
-    client = boto3.client("redshift-data")
+    # Reject star projections so only the requested columns are scanned and returned;
+    # the message is surfaced to the calling agent so it can regenerate the query
+    if SELECT_STAR_PATTERN.search(sql_query):
+        return {
+            "statusCode": 400,
+            "body": json.dumps({
+                "status": "error",
+                "message": "SELECT * is not allowed. Rewrite the query listing only the columns the user asked for."
+            })
+        }
+
+    # Serve repeated read-only queries from the result cache
+    cache_key = None
+    if return_results and READ_ONLY_PATTERN.match(sql_query):
+        cache_key = hashlib.sha1(sql_query.strip().encode("utf-8")).hexdigest()
+        cached = _result_cache_get(cache_key)
+        if cached is not None:
+            return cached
+
+    # Reuse the container-wide Redshift Data API client
+    client = redshift_client
 
     # Execute the SQL statement and retrieve statement ID
     try:
@@ -183,11 +246,14 @@ def lambda_handler(event, context):
         records.append(parsed_row)
 
     # Return successful execution response with results
-    return {
+    response = {
         "statusCode": 200,
         "body": json.dumps({
             "status": "finished",
             "rows": records,
             "statement_id": stmt_id
         })
-    }
\ No newline at end of file
+    }
+    if cache_key:
+        _result_cache_put(cache_key, response)
+    return response
\ No newline at end of file